@@ -0,0 +1,151 @@
+"""\
+:mod:`cli.aio` -- asyncio applications
+--------------------------------------
+
+Applications in this module run their :attr:`main` coroutine on an
+:mod:`asyncio` event loop. They require Python 3.4 or later.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import asyncio
+
+from cli.app import Abort, Application, CommandLineMixin
+
+__all__ = ["AsyncApplication", "AsyncCommandLineApp", "AsyncMixin"]
+
+def isawaitable(obj):
+    """Return True if *obj* can be run by an :mod:`asyncio` event loop."""
+    return (asyncio.iscoroutine(obj) or isinstance(obj, asyncio.Future) or
+        hasattr(obj, "__await__"))
+
+class AsyncMixin(object):
+    """A mixin for applications whose :attr:`main` is a coroutine.
+
+    :attr:`main` should be a coroutine function (or any callable returning
+    an awaitable object). :meth:`cli.app.Application.run` works as usual:
+    it calls :meth:`pre_run` first, so command line parsing and other
+    configuration happen before the event loop starts. Then
+    :meth:`call_main` creates a new event loop, stores it at :attr:`loop`
+    and runs :attr:`main` on it until it completes, and the result is
+    handed to :meth:`post_run`. Arguments are:
+
+    *cancel_status* is the exit status used when the :attr:`main` task is
+    cancelled: the cancellation is passed to :meth:`post_run` as an
+    :class:`cli.app.Abort` with this status.
+    """
+
+    loop = None
+    """The running :mod:`asyncio` event loop, or ``None``."""
+
+    def __init__(self, cancel_status=1, **kwargs):
+        self.cancel_status = cancel_status
+
+    def call_main(self, *args):
+        """Run :attr:`main` on a new event loop, returning its return value.
+
+        If :attr:`main` returns something that isn't awaitable, it is
+        returned directly. On :exc:`KeyboardInterrupt`, the :attr:`main`
+        task is cancelled and allowed to clean up before the interrupt is
+        raised again. Any other tasks still pending when :attr:`main`
+        finishes are cancelled, and the loop is closed before
+        :meth:`post_run` is called. Everything else (including timing the
+        ``main`` phase, which includes running the loop) is left to
+        :meth:`cli.app.Application.run`.
+        """
+        loop = asyncio.new_event_loop()
+        self.loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            try:
+                return self.run_main(loop, args)
+            except asyncio.CancelledError:
+                return Abort(self.cancel_status)
+        finally:
+            if self.loop is not None:
+                self.close_loop()
+
+    def run_main(self, loop, args):
+        """Call :attr:`main` and run the result on *loop* if it's awaitable."""
+        returned = self.main(*args)
+        if isawaitable(returned):
+            task = asyncio.ensure_future(returned, loop=loop)
+            try:
+                returned = loop.run_until_complete(task)
+            except KeyboardInterrupt:
+                task.cancel()
+                self.wait(task)
+                raise
+        return returned
+
+    def wait(self, *tasks):
+        """Run :attr:`loop` until *tasks* are done, ignoring their results."""
+        if tasks:
+            self.loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True))
+
+    def close_loop(self):
+        """Cancel any pending tasks and close :attr:`loop`."""
+        loop = self.loop
+        all_tasks = getattr(asyncio, "all_tasks", None)
+        if all_tasks is None:
+            all_tasks = asyncio.Task.all_tasks
+        try:
+            pending = [task for task in all_tasks(loop) if not task.done()]
+            for task in pending:
+                task.cancel()
+            self.wait(*pending)
+            shutdown_asyncgens = getattr(loop, "shutdown_asyncgens", None)
+            if shutdown_asyncgens is not None:
+                loop.run_until_complete(shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+            self.loop = None
+
+class AsyncApplication(AsyncMixin, Application):
+    """An application whose :attr:`main` is a coroutine.
+
+    This class simply glues together the base :class:`cli.app.Application`
+    and :class:`AsyncMixin`.
+    """
+
+    def __init__(self, main=None, **kwargs):
+        AsyncMixin.__init__(self, **kwargs)
+        Application.__init__(self, main, **kwargs)
+
+class AsyncCommandLineApp(AsyncMixin, CommandLineMixin, Application):
+    """A command line application whose :attr:`main` is a coroutine.
+
+    This class simply glues together the base :class:`cli.app.Application`,
+    :class:`cli.app.CommandLineMixin` and :class:`AsyncMixin`.
+    """
+
+    def __init__(self, main=None, **kwargs):
+        AsyncMixin.__init__(self, **kwargs)
+        CommandLineMixin.__init__(self, **kwargs)
+        Application.__init__(self, main, **kwargs)
+
+    def setup(self):
+        Application.setup(self)
+        CommandLineMixin.setup(self)
+
+    def reset(self, **kwargs):
+        Application.reset(self, **kwargs)
+        CommandLineMixin.reset(self, **kwargs)
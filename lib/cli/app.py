@@ -26,13 +26,20 @@ OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 __todo__ = """\
 """.split(" * ")
 
+import gc
 import os
 import sys
+import time
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    resource = None
 
 from cli._ext import argparse
-from cli.util import ifelse, ismethodof
+from cli.util import StringIO, environ_index, ifelse, ismethodof
 
-__all__ = ["Application", "CommandLineApp", "CommandLineMixin"]
+__all__ = ["Application", "CommandLineApp", "CommandLineMixin", "Path", "PathType"]
 
 class Error(Exception):
     pass
@@ -51,6 +58,24 @@ class Abort(Error):
         message = "Application terminated (%s)" % self.status
         super(Abort, self).__init__(message, self.status)
 
+clock = getattr(time, "monotonic", time.time)
+
+def snapshot():
+    """Return the current wall clock time, CPU times and peak RSS.
+
+    The result is a tuple of seconds on a monotonic clock, user and system
+    CPU seconds and the peak resident set size in bytes. The last three are
+    ``None`` if the :mod:`resource` module isn't available.
+    """
+    if resource is None: # pragma: no cover
+        return clock(), None, None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss = usage.ru_maxrss
+    # Linux reports kilobytes; Mac OS X reports bytes.
+    if sys.platform != "darwin":
+        rss *= 1024
+    return clock(), usage.ru_utime, usage.ru_stime, rss
+
 class Application(object):
     """An application.
     
@@ -98,6 +123,52 @@ class Application(object):
     propagated upwards by :attr:`post_run`; otherwise it will just
     cause :attr:`post_run` to exit with return code 1.
 
+    *buffered* replaces :attr:`stdout` with a
+    :class:`cli.streams.OutputWriter`, which collects many small writes into
+    few large ones and keeps writes from different threads from
+    interleaving. If *buffered* is an integer, it is the writer's buffer
+    size. The writer is flushed when the application finishes, even if it
+    aborts.
+
+    *stats* enables timing of the application's phases (see
+    :attr:`timings`). If *stats* is True, a report is written to
+    :attr:`stderr` when the application finishes (command line
+    applications only write it if the :option:`--stats` flag is given). If
+    *stats* is callable, it is called with the application instead. By
+    default, nothing is measured.
+
+    *sync* is the policy used to get the files opened with
+    :meth:`open_output` to disk: ``"file"`` (the default), ``"batch"``
+    (cheaper for many small files) or ``None``. See
+    :class:`cli.streams.OutputFiles`.
+
+    *cache* turns on cached runs: if it is True (or a
+    :class:`cli.cache.RunCache`), a run whose parameters and input files
+    match an earlier one replays that run's output and exit status
+    without calling :attr:`main`. *cache_inputs* lists the input files;
+    it may also be a callable, which is called with the application
+    (after :meth:`pre_run`) and returns the paths. Only applications whose
+    output depends on nothing else should be cached. See
+    :meth:`use_cache`.
+
+    *checkpoint* makes the application resumable: it is the path of a
+    file (or a :class:`cli.checkpoint.Checkpoint`) in which progress
+    through the items returned by :meth:`checkpointed` is saved. If
+    :attr:`resume` is True (command line applications accept a
+    :option:`--resume` flag for it), a run starts from the saved progress.
+    The checkpoint is removed when a run succeeds.
+
+    *fast_exit* makes :meth:`post_run` leave the interpreter with
+    :func:`os._exit` instead of :func:`sys.exit` (when
+    :attr:`exit_after_main` is True), skipping the garbage collection and
+    module teardown that can take seconds after :attr:`main` has built a
+    large heap. See :meth:`exit_now`.
+
+    *tune_gc* adjusts the garbage collector while :attr:`main` runs: objects
+    created until then are frozen (where :func:`gc.freeze` is available)
+    and the collection thresholds are raised, to *tune_gc* if it is a
+    tuple. See :meth:`setup_gc`.
+
     In all but a very few cases, subclasses that override the constructor
     should call :meth:`Application.__init__` at the end of the
     overridden method to ensure that the :meth:`setup` method is
@@ -107,12 +178,19 @@ class Application(object):
 
     def __init__(self, main=None, name=None, exit_after_main=True, stdin=None, stdout=None,
             stderr=None, version=None, description=None, argv=None,
-            profiler=None, reraise=(Exception,), **kwargs):
+            profiler=None, reraise=(Exception,), stats=False, buffered=False,
+            sync="file", cache=None, cache_inputs=(), checkpoint=None,
+            fast_exit=False, tune_gc=False, **kwargs):
         self._name = name
         self.exit_after_main = exit_after_main
         self.stdin = stdin and stdin or sys.stdin
         self.stdout = stdout and stdout or sys.stdout
         self.stderr = stderr and stderr or sys.stderr
+        self.buffered = buffered
+        if buffered:
+            from cli.streams import OutputWriter, WRITESIZE
+            size = ifelse(WRITESIZE, buffered is True, buffered)
+            self.stdout = OutputWriter(self.stdout, size=size)
         self.version = version
         self.argv = argv
         if argv is None:
@@ -121,12 +199,28 @@ class Application(object):
 
         self.profiler = profiler
         self.reraise = reraise
+        self.cleanups = []
+        self.status = None
+        self.stats = stats
+        self.show_stats = stats is True
+        self.timings = {}
+        self.sync = sync
+        self.outputs = None
+        self.cache = cache
+        self.cache_inputs = cache_inputs
+        if isinstance(checkpoint, basestring):
+            from cli.checkpoint import Checkpoint
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        self.resume = False
+        self.fast_exit = fast_exit
+        self.tune_gc = tune_gc
         
         if main is not None:
             self.main = main
 
         if getattr(self, "main", None) is not None:
-            self.setup()
+            self.timed("setup", self.setup)
 
     def __call__(self, main):
         """Wrap the *main* callable and return an :class:`Application` instance.
@@ -144,7 +238,7 @@ class Application(object):
         """
         self.main = main
 
-        self.setup()
+        self.timed("setup", self.setup)
 
         return self
 
@@ -203,6 +297,13 @@ class Application(object):
         :meth:`post_run` decides whether to call :func:`sys.exit` (based on the
         value of the :attr:`exit_after_main` attribute) or pass the value back
         to :meth:`run`. Subclasses should probably preserve this behavior.
+
+        .. versionchanged:: 1.1.2
+            The interpreted return value is stored at :attr:`status` (or
+            ``None`` if an exception is being raised again) and then the
+            functions registered with :meth:`add_cleanup` are called. If
+            *fast_exit* was given, the application exits with
+            :meth:`exit_now`.
         """
         # Interpret the returned value in the same way sys.exit() does.
         if returned is None:
@@ -210,6 +311,8 @@ class Application(object):
         elif isinstance(returned, Abort):
             returned = returned.status
         elif isinstance(returned, self.reraise):
+            self.status = None
+            self.run_cleanups()
             # raising the last exception preserves traceback
             raise
         else:
@@ -217,8 +320,12 @@ class Application(object):
                 returned = int(returned)
             except:
                 returned = 1
-            
+
+        self.status = returned
+        self.run_cleanups()
         if self.exit_after_main:
+            if self.fast_exit:
+                self.exit_now(returned)
             sys.exit(returned)
         else:
             return returned
@@ -231,18 +338,720 @@ class Application(object):
         argument. The return value (or :class:`Exception` instance raised) is
         then passed to :meth:`post_run` which may modify it (or terminate the
         application entirely).
+
+        .. versionchanged:: 1.1.2
+            If :attr:`main` is interrupted by :exc:`KeyboardInterrupt`, the
+            functions registered with :meth:`add_cleanup` are called before
+            the interrupt is raised again. If *stats* was given, each phase
+            is timed and the results are reported when the application
+            finishes. If *cache* was given, a cached run is replayed instead
+            of calling :attr:`main`. If *checkpoint* was given, it is
+            loaded (or reset) before :attr:`main` is called. If *tune_gc*
+            was given, the garbage collector is set up for :attr:`main`
+            (see :meth:`setup_gc`) and restored afterwards (unless the
+            application is about to exit with :meth:`exit_now`). If
+            :meth:`pre_run` raises, the cleanup functions are still called.
+        """
+        try:
+            self.timed("pre_run", self.pre_run)
+
+            if self.cache:
+                status = self.use_cache()
+                if status is not None:
+                    return self.timed("post_run", self.post_run, status)
+            if self.checkpoint is not None:
+                self.start_checkpoint()
+
+            args = (self,)
+            if ismethodof(self.main, self):
+                args = ()
+            thresholds = None
+            if self.tune_gc:
+                thresholds = self.setup_gc()
+            try:
+                returned = self.timed("main", self.call_main, *args)
+            except Exception, e:
+                returned = e
+            except KeyboardInterrupt:
+                self.status = None
+                self.run_cleanups()
+                raise
+            finally:
+                # Restoring the thresholds can set off a full collection,
+                # which is wasted on a process that's about to _exit.
+                fast = self.fast_exit and self.exit_after_main
+                if thresholds is not None and not fast:
+                    gc.set_threshold(*thresholds)
+                    unfreeze = getattr(gc, "unfreeze", None)
+                    if unfreeze is not None:
+                        unfreeze()
+
+            return self.timed("post_run", self.post_run, returned)
+        finally:
+            # pre_run can end the run early (on --help or a usage error, for
+            # example); clean up, and flush buffered output, on every path.
+            self.run_cleanups()
+            if self.stats:
+                self.report_stats()
+
+    def call_main(self, *args):
+        """Call :attr:`main` with *args* and return its return value.
+
+        :meth:`run` calls :attr:`main` through this method, so that
+        subclasses (like :class:`cli.aio.AsyncMixin`) can change how it is
+        run while keeping everything else :meth:`run` does.
+
+        .. versionadded:: 1.1.2
+        """
+        return self.main(*args)
+
+    def setup_gc(self):
+        """Prepare the garbage collector for :attr:`main`.
+
+        Objects that already exist (modules, configuration, parsed
+        parameters) are moved to the collector's permanent generation with
+        :func:`gc.freeze` (on Python 3.7 and later), so collections during
+        :attr:`main` don't traverse them again. The collection thresholds
+        are raised to *tune_gc* (if it is a tuple) or to thresholds suited
+        to building large numbers of long-lived objects. Returns the
+        previous thresholds; :meth:`run` restores them (and unfreezes the
+        frozen objects) after :attr:`main`.
+
+        .. versionadded:: 1.1.2
+        """
+        thresholds = gc.get_threshold()
+        freeze = getattr(gc, "freeze", None)
+        if freeze is not None:
+            freeze()
+        tuned = self.tune_gc
+        if not isinstance(tuned, tuple):
+            tuned = (50000, 20, 100)
+        gc.set_threshold(*tuned)
+        return thresholds
+
+    def exit_now(self, status):
+        """Exit immediately with *status*, skipping interpreter teardown.
+
+        :attr:`stdout` and :attr:`stderr` are flushed, the functions
+        registered with :mod:`atexit` are called and the :mod:`logging`
+        handlers are flushed and closed (as they would be by
+        :func:`sys.exit`); then the process ends with :func:`os._exit`.
+        Objects are not garbage collected or finalized, so anything that
+        must happen before the application exits should be registered with
+        :meth:`add_cleanup` or :mod:`atexit`.
+
+        .. versionadded:: 1.1.2
+        """
+        import atexit
+        import logging
+
+        gc.disable()
+        try:
+            if self.stats:
+                self.report_stats()
+            run_exitfuncs = getattr(atexit, "_run_exitfuncs", None)
+            if run_exitfuncs is not None:
+                run_exitfuncs()
+            logging.shutdown()
+        finally:
+            for stream in (self.stdout, self.stderr, sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except Exception:
+                    pass
+            os._exit(status)
+
+    def timed(self, phase, func, *args):
+        """Call *func* with *args*, recording its cost in :attr:`timings`.
+
+        If *stats* wasn't given, *func* is just called. Otherwise, the
+        result for *phase* is a dictionary with the ``wall`` clock time and
+        ``user`` and ``system`` CPU times (in seconds) spent in *func* and
+        the process' ``peak_rss`` (in bytes) when *func* finished. The
+        phases of a run are ``setup``, ``pre_run``, ``main`` and
+        ``post_run``.
+
+        .. versionadded:: 1.1.2
+        """
+        if not self.stats:
+            return func(*args)
+        start = snapshot()
+        try:
+            return func(*args)
+        finally:
+            end = snapshot()
+            timing = dict(wall=end[0] - start[0], peak_rss=end[3],
+                user=None, system=None)
+            if end[1] is not None:
+                timing.update(user=end[1] - start[1], system=end[2] - start[2])
+            self.timings[phase] = timing
+
+    def report_stats(self):
+        """Report :attr:`timings` when the application finishes.
+
+        If *stats* is callable, it is called with the application.
+        Otherwise, if :attr:`show_stats` is True, a table is written to
+        :attr:`stderr`.
+
+        .. versionadded:: 1.1.2
+        """
+        if callable(self.stats):
+            self.stats(self)
+            return
+        if not self.show_stats:
+            return
+
+        from cli.profiler import fmtsec
+
+        def fmt(seconds):
+            if seconds is None:
+                return "-"
+            return fmtsec(seconds)
+
+        self.stderr.write(u"%-10s %12s %12s %12s %12s\n" % (
+            "phase", "wall", "user", "system", "peak RSS"))
+        for phase in ("setup", "pre_run", "main", "post_run"):
+            timing = self.timings.get(phase)
+            if timing is None:
+                continue
+            rss = timing["peak_rss"]
+            if rss is not None:
+                rss = "%.1f MiB" % (rss / 1048576.0)
+            self.stderr.write(u"%-10s %12s %12s %12s %12s\n" % (phase,
+                fmt(timing["wall"]), fmt(timing["user"]), fmt(timing["system"]),
+                rss or "-"))
+
+    def add_cleanup(self, func, *args, **kwargs):
+        """Call *func* with *args* and *kwargs* when the application finishes.
+
+        Cleanup functions are called by :meth:`post_run` (or :meth:`run`, if
+        the application finishes some other way) in the reverse order of their
+        registration, after :attr:`status` is set. :attr:`status` is the
+        application's exit status, or ``None`` if it is finishing because
+        of an exception; cleanup functions can use it to tell success from
+        failure. Each function is called only once.
+
+        .. versionadded:: 1.1.2
+        """
+        self.cleanups.append((func, args, kwargs))
+
+    def run_cleanups(self):
+        """Call (and forget) the functions registered with :meth:`add_cleanup`.
+
+        If *buffered* was given, :attr:`stdout` is flushed afterwards, so that
+        cleanup functions can still write to it.
+
+        .. versionadded:: 1.1.2
+        """
+        try:
+            while self.cleanups:
+                func, args, kwargs = self.cleanups.pop()
+                func(*args, **kwargs)
+        finally:
+            if self.buffered:
+                self.stdout.flush()
+
+    def map(self, func, iterable, workers=None, ordered=True, chunksize=None):
+        """Return an iterator over *func* applied to each item of *iterable*.
+
+        The calls are spread across *workers* processes (by default, one per
+        CPU), which helps applications whose :attr:`main` spends most of its
+        time on CPU-bound work. Results are streamed back as they're ready
+        (in the order of *iterable* unless *ordered* is False), and the
+        input is consumed lazily. If *func* raises an exception, it's raised
+        again in :attr:`main`, so :meth:`post_run` handles it as usual. Log
+        records created by *func* are passed to the application's
+        :attr:`log` (if it has one). See :func:`cli.parallel.process_map`
+        for details.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.parallel import process_map
+
+        return process_map(func, iterable, workers=workers, ordered=ordered,
+            chunksize=chunksize, log=getattr(self, "log", None))
+
+    def thread_map(self, func, iterable, workers=8, ordered=True,
+            timeout=None):
+        """Return an iterator over *func* applied to each item of *iterable*.
+
+        This is the counterpart of :meth:`map` for work that mostly waits on
+        disks or sockets: the calls are made by a pool of *workers* threads.
+        The input is consumed lazily (with at most two items per worker in
+        flight) and results are yielded in the order of *iterable* unless
+        *ordered* is False. If a call runs for more than *timeout* seconds,
+        :class:`cli.parallel.TaskTimeout` is raised. Tasks that haven't
+        started yet are cancelled when the application finishes (even if it
+        aborts or is interrupted), so a busy pool never keeps it from
+        exiting. See :func:`cli.parallel.thread_map` for details.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.parallel import ThreadPool, thread_map
+
+        pool = ThreadPool(workers)
+        self.add_cleanup(pool.shutdown, cancel=True)
+        return thread_map(func, iterable, ordered=ordered, timeout=timeout,
+            pool=pool)
+
+    def run_commands(self, commands, workers=4, prefix="[%(index)d] "):
+        """Run each of *commands* as a child process, returning an exit status.
+
+        At most *workers* commands run at once. Their output is copied to
+        :attr:`stdout` and :attr:`stderr` as it arrives, with each line
+        starting with *prefix*. The returned status is the highest of the
+        commands' statuses, so :attr:`main` can simply return it::
+
+            @cli.app.CommandLineApp
+            def compress(app):
+                return app.run_commands([["gzip", "-9", path]
+                    for path in app.params.paths], workers=8)
+
+        See :func:`cli.parallel.run_commands` for details.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.parallel import exit_status, run_commands
+
+        return exit_status(run_commands(commands, workers=workers,
+            stdout=self.stdout, stderr=self.stderr, prefix=prefix))
+
+    def iter_records(self, sep=None, path=None, mmap=True):
+        """Yield the *sep*-delimited records in :attr:`stdin` (or *path*).
+
+        Records are bytes; *sep* defaults to a newline. Input is read in
+        large chunks (or mapped into memory, if it is a regular file and
+        *mmap* is True) and each chunk is split at once. For plain lines,
+        iterating over a file is still faster (see :mod:`cli.bench.records`);
+        this is for other separators, and for bytes from :attr:`stdin`
+        without decoding them. See :func:`cli.streams.iterrecords` for
+        details. For example::
+
+            @cli.app.CommandLineApp
+            def count(app):
+                total = 0
+                for record in app.iter_records():
+                    if not record.startswith(b"#"):
+                        total += 1
+                app.stdout.write(u"%d\\n" % total)
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.streams import iterrecords
+
+        if path is None:
+            path = self.stdin
+        return iterrecords(path, sep=sep, mmap=mmap)
+
+    def iter_files(self, paths, ahead=2, budget=None):
+        """Return an iterator over the files named by *paths*.
+
+        Like :mod:`fileinput`, but each file is returned as a
+        :class:`cli.streams.InputFile` (with its :attr:`name`) and the next
+        *ahead* files are read on a background thread while :attr:`main`
+        works, holding no more than *budget* bytes in memory. A path of
+        ``-`` means :attr:`stdin`. Prefetching stops when the application
+        finishes. See :class:`cli.streams.PrefetchReader` for details. For
+        example::
+
+            @cli.app.CommandLineApp
+            def grep(app):
+                for input in app.iter_files(app.params.paths):
+                    for line in input:
+                        if app.params.pattern in line:
+                            app.stdout.write(u"%s: %s" % (input.name,
+                                line.decode("utf-8")))
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.streams import PREFETCH, PrefetchReader
+
+        if budget is None:
+            budget = PREFETCH
+        reader = PrefetchReader(paths, ahead=ahead, budget=budget,
+            stdin=self.stdin)
+        self.add_cleanup(reader.close)
+        return reader
+
+    def copy_file(self, source, offset=0, count=None):
+        """Copy *count* bytes of *source*, starting at *offset*, to :attr:`stdout`.
+
+        *source* is a path or a binary file object. If :attr:`stdout` is a
+        file, pipe or socket, the kernel copies the data directly (with
+        :func:`os.sendfile` or :func:`os.splice`); otherwise, it is copied
+        in chunks. Returns the number of bytes copied. See
+        :func:`cli.streams.copyfile` for details. For example::
+
+            @cli.app.CommandLineApp
+            def cat(app):
+                for path in app.params.paths:
+                    app.copy_file(path)
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.streams import copyfile
+
+        return copyfile(source, self.stdout, offset=offset, count=count)
+
+    def open_output(self, path, mode="w", encoding=None):
+        """Return a file that will be written to *path* when the application finishes.
+
+        The file is a :class:`cli.streams.AtomicFile`: a temporary file in
+        the same directory as *path*, written with a large buffer. If the
+        application finishes with a status of 0, each file opened with
+        :meth:`open_output` is synced to disk (according to *sync*) and
+        renamed to its *path*, so other programs never see a partial
+        result. Otherwise (or if :attr:`main` raises an exception or is
+        interrupted) the temporary files are removed. For example::
+
+            @cli.app.CommandLineApp(sync="batch")
+            def split(app):
+                for i, chunk in enumerate(app.iter_records()):
+                    with app.open_output("part-%d" % i, "wb") as output:
+                        output.write(chunk)
+
+        .. versionadded:: 1.1.2
+        """
+        if self.outputs is None:
+            from cli.streams import OutputFiles
+
+            self.outputs = OutputFiles(self.sync)
+            self.add_cleanup(self.close_outputs)
+        return self.outputs.open(path, mode, encoding=encoding)
+
+    def close_outputs(self):
+        """Commit (or, if :attr:`status` isn't 0, discard) the output files.
+
+        .. versionadded:: 1.1.2
+        """
+        outputs, self.outputs = self.outputs, None
+        if outputs is not None:
+            outputs.close(commit=self.status == 0)
+
+    def use_cache(self):
+        """Replay a cached run of the application, or record this one.
+
+        The run is looked up in *cache* by a fingerprint of the
+        application's parameters and *cache_inputs* (see
+        :meth:`cli.cache.RunCache.fingerprint`). On a hit, the recorded
+        output is written to :attr:`stdout` and the recorded exit status is
+        returned. Otherwise, ``None`` is returned and :attr:`stdout` is
+        wrapped in a :class:`cli.cache.Recorder`; when the application
+        finishes with a status, its output and status are stored. Runs
+        that end by raising an exception again (see *reraise*) aren't.
+
+        .. versionadded:: 1.1.2
+        """
+        from io import BytesIO
+        from cli.cache import Recorder, RunCache
+        from cli.streams import copyfile
+
+        cache = self.cache
+        if cache is True:
+            cache = self.cache = RunCache()
+        inputs = self.cache_inputs
+        if callable(inputs):
+            inputs = inputs(self)
+        key = cache.fingerprint(self, inputs)
+
+        hit = cache.get(key)
+        if hit is not None:
+            status, output = hit
+            copyfile(BytesIO(output), self.stdout)
+            return status
+
+        recorder = self.stdout = Recorder(self.stdout)
+        def store():
+            self.stdout = recorder.stream
+            if self.status is not None:
+                cache.put(key, self.status, recorder.getvalue(), self.argv)
+        self.add_cleanup(store)
+        return None
+
+    def start_checkpoint(self):
+        """Load the saved checkpoint (if :attr:`resume` is True) or reset it.
+
+        When the application finishes, the checkpoint is removed (if
+        :attr:`status` is 0) or its latest progress is saved.
+
+        .. versionadded:: 1.1.2
+        """
+        if self.resume:
+            self.checkpoint.load()
+        else:
+            self.checkpoint.reset()
+        self.add_cleanup(self.finish_checkpoint)
+
+    def finish_checkpoint(self):
+        self.checkpoint.finish(self.status == 0)
+
+    def checkpointed(self, iterable):
+        """Return an iterator over the items of *iterable* still to be processed.
+
+        The items processed by an earlier run (when resuming) are skipped,
+        and progress is saved to the application's *checkpoint* as the
+        remaining items are processed. See
+        :meth:`cli.checkpoint.Checkpoint.track`.
+
+        .. versionadded:: 1.1.2
         """
-        self.pre_run()
+        if self.checkpoint is None:
+            raise ValueError("%s has no checkpoint" % self.name)
+        return self.checkpoint.track(iterable)
+
+    def reset(self, argv=None, stdin=None, stdout=None, stderr=None):
+        """Prepare the application to be run again.
 
-        args = (self,)
-        if ismethodof(self.main, self):
-            args = ()
+        :meth:`reset` replaces :attr:`argv`, :attr:`stdin`, :attr:`stdout`
+        and :attr:`stderr` (when the corresponding argument is not
+        ``None``). Subclasses should also discard any state left over from
+        the last run (like parsed parameters).
+
+        .. versionadded:: 1.1.2
+        """
+        if argv is not None:
+            self.argv = argv
+        if stdin is not None:
+            self.stdin = stdin
+        if stdout is not None:
+            self.stdout = stdout
+        if stderr is not None:
+            self.stderr = stderr
+
+    def invoke(self, argv):
+        """Run the application once with *argv*, capturing its output.
+
+        The application is run with :meth:`execute`, an empty :attr:`stdin`
+        and new :class:`cli.util.StringIO` buffers for :attr:`stdout` and
+        :attr:`stderr`.
+
+        Returns a tuple of (*status*, *stdout*, *stderr*), where *stdout* and
+        *stderr* are strings.
+
+        .. versionadded:: 1.1.2
+        """
+        stdout, stderr = StringIO(), StringIO()
+        status = self.execute(argv, StringIO(), stdout, stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def execute(self, argv, stdin, stdout, stderr):
+        """Run the application once with *argv* and the given streams.
+
+        The application is :meth:`reset` with *argv*, *stdin*, *stdout* and
+        *stderr*, and then :meth:`run` as if :attr:`exit_after_main` were
+        False. If the run raises :class:`Abort` or :exc:`SystemExit`, its
+        status is used; any other exception is written to *stderr* and gives
+        a status of 1. Afterwards, the application's original streams,
+        :attr:`argv` and :attr:`params` (if any) are restored. Returns the
+        run's status.
+
+        .. versionadded:: 1.1.2
+        """
+        saved = (self.argv, self.stdin, self.stdout, self.stderr,
+            self.exit_after_main)
+        params = getattr(self, "params", None)
+        self.exit_after_main = False
+        self.reset(argv=argv, stdin=stdin, stdout=stdout, stderr=stderr)
         try:
-            returned = self.main(*args)
-        except Exception, e:
-            returned = e
+            try:
+                status = self.run()
+            except Abort, e:
+                status = e.status
+            except SystemExit, e:
+                status = e.code
+                if status is None:
+                    status = 0
+                elif not isinstance(status, int):
+                    stderr.write(status)
+                    stderr.write(u"\n")
+                    status = 1
+            except Exception:
+                import traceback
+                traceback.print_exc(file=stderr)
+                status = 1
+        finally:
+            argv, stdin, stdout_, stderr_, self.exit_after_main = saved
+            self.reset(argv=argv, stdin=stdin, stdout=stdout_, stderr=stderr_)
+            if params is not None:
+                self.params = params
+
+        return status
+
+    def run_batch(self, input=None, output=None):
+        """Run the application once for each command line read from *input*.
+
+        Starting the interpreter, importing modules and calling
+        :meth:`setup` can take much longer than the work done by a small
+        application. :meth:`run_batch` pays those costs once and then calls
+        :meth:`invoke` for each line of *input* (by default,
+        :attr:`stdin`). Lines are split like a shell would, except
+        that lines starting with ``[`` are read as JSON arrays of strings.
+        The first element of :attr:`argv` is prepended to each command line.
+        Blank lines are skipped.
+
+        For each command line, a JSON object with ``argv``, ``status``,
+        ``stdout`` and ``stderr`` keys is written on its own line to *output*
+        (by default, :attr:`stdout`), in the order the command lines were
+        read. A line that can't be split (or isn't an array of strings)
+        isn't run; its object has an ``argv`` of ``null``, a ``status`` of 2
+        and the error in ``stderr``. Returns 0 if every run succeeded;
+        otherwise, returns 1.
+
+        .. versionadded:: 1.1.2
+        """
+        import json
+        import shlex
+
+        if input is None:
+            input = self.stdin
+        if output is None:
+            output = self.stdout
+
+        returned = 0
+        for line in input:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                if line.startswith("["):
+                    args = json.loads(line)
+                    if not isinstance(args, list) or \
+                            not all(isinstance(a, basestring) for a in args):
+                        raise ValueError("not a JSON array of strings")
+                else:
+                    args = shlex.split(line)
+            except ValueError, e:
+                args, status, stdout = None, 2, u""
+                stderr = u"%s: bad command line: %s\n" % (self.name, e)
+            else:
+                status, stdout, stderr = self.invoke([self.argv[0]] + args)
+            output.write(json.dumps(dict(argv=args, status=status,
+                stdout=stdout, stderr=stderr), sort_keys=True))
+            output.write(u"\n")
+            output.flush()
+            if status:
+                returned = 1
+
+        return returned
+
+class Path(str):
+    """A path argument validated by :class:`PathType`.
+
+    :class:`Path` is a plain string with one extra attribute, :attr:`stat`,
+    which holds the :func:`os.stat` result gathered while the argument was
+    validated. Applications can use it instead of calling :func:`os.stat`
+    again.
+
+    .. versionadded:: 1.1.2
+    """
+    stat = None
+
+class PathType(object):
+    """An argument type for paths that must exist.
+
+    Use a :class:`PathType` instance as the *type* of a parameter to check
+    that each path can be passed to :func:`os.stat`; values are converted to
+    :class:`Path` instances. When the parameter takes a list of values (for
+    example, ``nargs="*"``), the whole list is validated at once on a pool of
+    at most *workers* threads so that slow filesystems don't serialize the
+    checks. The values are returned in their original order.
 
-        return self.post_run(returned)
+    *stat* is the function used to check each path (:func:`os.stat` by
+    default; :func:`os.lstat` is a useful alternative).
+
+    .. versionadded:: 1.1.2
+    """
+
+    def __init__(self, workers=8, stat=os.stat):
+        self.workers = workers
+        self.stat = stat
+
+    def __call__(self, string):
+        return self.check(string)
+
+    def check(self, string):
+        """Return a :class:`Path` for *string*.
+
+        If *string* can't be passed to :attr:`stat` (because the path
+        doesn't exist or isn't a valid path at all, like one containing a
+        NUL byte), raise :class:`argparse.ArgumentTypeError`.
+        """
+        try:
+            stat = self.stat(string)
+        except OSError, e:
+            raise argparse.ArgumentTypeError(
+                "can't stat %r: %s" % (string, e.strerror))
+        except (TypeError, ValueError), e:
+            raise argparse.ArgumentTypeError(
+                "can't stat %r: %s" % (string, e))
+        path = Path(string)
+        path.stat = stat
+        return path
+
+    def batch(self, strings):
+        """Check each of *strings*, returning a list of :class:`Path` instances.
+
+        The checks run concurrently on up to :attr:`workers` threads. If any
+        of them fail, the error for the first failing string is raised.
+        """
+        if self.workers < 2 or len(strings) < 2:
+            return [self.check(s) for s in strings]
+
+        import threading
+
+        results = [None] * len(strings)
+        indices = iter(range(len(strings)))
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                lock.acquire()
+                try:
+                    i = next(indices, None)
+                finally:
+                    lock.release()
+                if i is None:
+                    return
+                try:
+                    results[i] = (self.check(strings[i]), None)
+                except Exception, e:
+                    results[i] = (None, e)
+
+        threads = [threading.Thread(target=worker)
+            for i in range(min(self.workers, len(strings)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for path, error in results:
+            if error is not None:
+                raise error
+        return [path for path, error in results]
+
+class RecordingNamespace(argparse.Namespace):
+    """A namespace that records the names set on it.
+
+    The *unset* names start out as ``None`` (which is what argparse's
+    append and count actions expect of a missing value) and aren't
+    recorded; :attr:`recorded` holds the names set afterwards.
+
+    .. versionadded:: 1.1.2
+    """
+
+    def __init__(self, unset=()):
+        self.__dict__.update(dict.fromkeys(unset))
+        self.__dict__["recorded"] = set()
+
+    def __setattr__(self, name, value):
+        self.recorded.add(name)
+        self.__dict__[name] = value
+
+    def copy(self):
+        """Return an :class:`argparse.Namespace` with the same values."""
+        values = dict(self.__dict__)
+        del values["recorded"]
+        return argparse.Namespace(**values)
 
 class ArgumentParser(argparse.ArgumentParser):
     """This subclass makes it easier to test ArgumentParser.
@@ -252,15 +1061,26 @@ class ArgumentParser(argparse.ArgumentParser):
     these checks into instantiation (except for :attr:`prog`, which is a
     property).
 
+    If *fromfile_sep* is not ``None``, files named by arguments that start
+    with one of the *fromfile_prefix_chars* are read in binary mode and
+    split on *fromfile_sep* (for example, ``"\\0"`` for the output of
+    ``find -print0``) instead of line by line. See
+    :meth:`_read_args_from_files`.
+
     .. versionchanged:: 1.1.1
         The *stdout* and *stderr* options replace *file* (which was present until 1.1.1);
         *argv* is added.
+
+    .. versionchanged:: 1.1.2
+        Added *fromfile_sep*.
     """
 
-    def __init__(self, stdout=None, stderr=None, argv=None, **kwargs):
+    def __init__(self, stdout=None, stderr=None, argv=None, fromfile_sep=None,
+            **kwargs):
         self.stdout = ifelse(stdout, stdout is not None, sys.stdout)
         self.stderr = ifelse(stderr, stderr is not None, sys.stderr)
         self.argv = ifelse(argv, argv is not None, sys.argv)
+        self.fromfile_sep = fromfile_sep
         self._prog = kwargs.get("prog", None)
         super(ArgumentParser, self).__init__(**kwargs)
 
@@ -288,6 +1108,72 @@ class ArgumentParser(argparse.ArgumentParser):
             args = self.argv[1:]
         return super(ArgumentParser, self).parse_known_args(args, namespace)
 
+    def _read_args_from_files(self, arg_strings):
+        """Expand arguments that name files containing more arguments.
+
+        If :attr:`fromfile_sep` is ``None``, each line of the file is passed
+        to :meth:`convert_arg_line_to_args` as usual. Otherwise, the file is
+        read in large binary chunks and split on :attr:`fromfile_sep`; each
+        entry is taken literally (on Python 3, it is decoded like
+        :func:`os.fsdecode` would), so entries may contain arbitrary bytes
+        and are never themselves expanded.
+
+        .. versionadded:: 1.1.2
+        """
+        if self.fromfile_sep is None:
+            return super(ArgumentParser, self)._read_args_from_files(arg_strings)
+
+        from cli.streams import splitstream
+
+        encoding = None
+        if getattr(os, "fsdecode", None) is not None:
+            encoding = sys.getfilesystemencoding()
+        new_arg_strings = []
+        for arg_string in arg_strings:
+            if arg_string[0] not in self.fromfile_prefix_chars:
+                new_arg_strings.append(arg_string)
+                continue
+
+            try:
+                args_file = open(arg_string[1:], "rb", 0)
+                try:
+                    new_arg_strings.extend(splitstream(args_file,
+                        self.fromfile_sep, encoding=encoding))
+                finally:
+                    args_file.close()
+            except IOError, e:
+                self.error(str(e))
+
+        return new_arg_strings
+
+    def _get_values(self, action, arg_strings):
+        """Convert lists of values with a single call when possible.
+
+        If the *action*'s type has a :meth:`batch` method (like
+        :class:`PathType`) and the action produces a list, the type is
+        called once with all of the argument strings. Errors are reported
+        as they would be for a single value.
+
+        .. versionadded:: 1.1.2
+        """
+        batch = getattr(action.type, "batch", None)
+        single = (None, argparse.OPTIONAL, argparse.PARSER, argparse.REMAINDER)
+        if batch is None or action.nargs in single:
+            return super(ArgumentParser, self)._get_values(action, arg_strings)
+
+        arg_strings = [s for s in arg_strings if s != '--']
+        if not arg_strings:
+            return super(ArgumentParser, self)._get_values(action, arg_strings)
+
+        try:
+            values = batch(arg_strings)
+        except argparse.ArgumentTypeError, e:
+            raise argparse.ArgumentError(action, str(e))
+        for value in values:
+            self._check_value(action, value)
+
+        return values
+
     def _print_message(self, message, file=None):
         """If *file* is None, use :attr:`stdout` instead of :data:`sys.stdout`.
 
@@ -300,6 +1186,20 @@ class ArgumentParser(argparse.ArgumentParser):
             message = unicode(message)
         super(ArgumentParser, self)._print_message(message, file)
 
+    def print_usage(self, file=None):
+        """If *file* is None, use :attr:`stdout` instead of :data:`sys.stdout`.
+
+        .. versionadded:: 1.1.2
+        """
+        super(ArgumentParser, self).print_usage(file or self.stdout)
+
+    def print_help(self, file=None):
+        """If *file* is None, use :attr:`stdout` instead of :data:`sys.stdout`.
+
+        .. versionadded:: 1.1.2
+        """
+        super(ArgumentParser, self).print_help(file or self.stdout)
+
     def exit(self, status=0, message=None):
         """If *message* is not None, write it to :attr:`stderr` instead of :data:`sys.stderr`."""
         if message:
@@ -326,8 +1226,36 @@ class CommandLineMixin(object):
 
     *epilog* is text appended to the argument descriptions.
 
+    *config* is the name of a configuration file, or a list of names, from
+    which parameter values will be read (see :meth:`parse_config`). Values
+    are read from the *config_section* section of each file; if
+    *config_section* is ``None``, the application's :attr:`name` is used.
+    *config_cache* is a :class:`cli.config.ConfigCache`; if it is ``None``,
+    the shared :data:`cli.config.cache` will be used.
+
+    *env_prefix* is prepended to the names of the environment variables
+    bound to parameters (see :meth:`add_param`).
+
+    *environ* is a mapping of environment variables. If it is ``None``,
+    :data:`os.environ` will be used instead.
+
+    *fromfile_prefix_chars* and *fromfile_sep* are passed to the
+    :class:`ArgumentParser`. If *fromfile_prefix_chars* is not ``None``,
+    arguments starting with one of its characters name files from which more
+    arguments will be read (see :meth:`ArgumentParser._read_args_from_files`).
+
+    If *compression* is True, the application accepts the standard
+    :option:`--compress` and :option:`--decompress-input` parameters (see
+    :meth:`setup_compression`). If the application has a *checkpoint*, it
+    accepts :option:`--resume`.
+
     The rest of the arguments are passed to the :class:`Application`
     constructor.
+
+    .. versionchanged:: 1.1.2
+        Added *config*, *config_section*, *config_cache*, *env_prefix*,
+        *environ*, *fromfile_prefix_chars*, *fromfile_sep* and
+        *compression*.
     """
     prefix = '-'
     argparser_factory = ArgumentParser
@@ -341,10 +1269,25 @@ class CommandLineMixin(object):
     relied upon.
     """
 
-    def __init__(self, usage=None, epilog=None, **kwargs):
+    def __init__(self, usage=None, epilog=None, config=None,
+            config_section=None, config_cache=None, env_prefix=None,
+            environ=None, fromfile_prefix_chars=None, fromfile_sep=None,
+            compression=False, **kwargs):
         self.usage = usage
         self.epilog = epilog
+        if isinstance(config, basestring):
+            config = [config]
+        self.config = config
+        self.config_section = config_section
+        self.config_cache = config_cache
+        self.env_prefix = env_prefix
+        self.environ = environ
+        self.fromfile_prefix_chars = fromfile_prefix_chars
+        self.fromfile_sep = fromfile_sep
+        self.compression = compression
         self.actions = {}
+        self.stdin_params = {}
+        self.env_params = {}
         self.params = argparse.Namespace()
 
     def setup(self):
@@ -361,6 +1304,8 @@ class CommandLineMixin(object):
             description=self.description,
             epilog=self.epilog,
             prefix_chars=self.prefix,
+            fromfile_prefix_chars=self.fromfile_prefix_chars,
+            fromfile_sep=self.fromfile_sep,
             argv=self.argv,
             stdout=self.stdout,
             stderr=self.stderr,
@@ -373,6 +1318,25 @@ class CommandLineMixin(object):
                 version=("%%(prog)s %s" % self.version),
                 help=("show program's version number and exit"))
 
+        if self.stats is True:
+            # Until the flag is parsed (and if parsing fails), don't show.
+            self.show_stats = False
+            self.add_param("--stats", action="store_true", default=False,
+                help="report the time spent in each phase on exit")
+
+        if self.compression:
+            from cli.compress import CODECS
+            self.add_param("--compress", nargs="?", const="gzip",
+                default=None, choices=CODECS, metavar="CODEC",
+                help="compress the output (default codec: %(const)s)")
+            self.add_param("--decompress-input", nargs="?", const="auto",
+                default=None, choices=["auto"] + CODECS, metavar="CODEC",
+                help="decompress the input (default: detect the codec)")
+        if self.checkpoint is not None:
+            self.add_param("--resume", action="store_true", default=False,
+                help="continue from the last checkpoint (%s)" %
+                    self.checkpoint.path.replace("%", "%%"))
+
     def add_param(self, *args, **kwargs):
         """Add a parameter.
 
@@ -381,11 +1345,225 @@ class CommandLineMixin(object):
         parameter options in a dictionary. This information can be used
         later by other subclasses when deciding whether to override
         parameters.
+
+        If the *stdin* keyword argument is given, the parameter also reads
+        its values from :attr:`stdin`. *stdin* may be ``True`` (to read one
+        value per line) or a separator string (like ``"\\0"``, to read the
+        output of ``find -print0``). Instead of a list, the parameter's
+        value will be a generator that yields the values given on the
+        command line, replacing each ``-`` with the values read from
+        :attr:`stdin`; if no values were given, all of them come from
+        :attr:`stdin`. Values read from :attr:`stdin` are plain strings and
+        are not passed through the parameter's *type*. The generator reads
+        :attr:`stdin` lazily, so :attr:`main` can process an unbounded
+        number of values without holding them all in memory. Unless
+        specified, *nargs* defaults to ``"*"`` for such parameters.
+
+        If the *env* keyword argument is given, the parameter's default may
+        be overridden by an environment variable (and the command line still
+        overrides both). *env* is the name of the variable, which will be
+        prefixed with :attr:`env_prefix`; if *env* is ``True``, the
+        parameter's *dest* in upper case is used instead. See
+        :meth:`parse_environ`.
+
+        .. versionchanged:: 1.1.2
+            Added the *stdin* and *env* keyword arguments.
         """
+        sep = kwargs.pop("stdin", None)
+        env = kwargs.pop("env", None)
+        if sep is not None:
+            kwargs.setdefault("nargs", "*")
         action = self.argparser.add_argument(*args, **kwargs)
         self.actions[action.dest] = action
+        if sep is not None:
+            if sep is True:
+                sep = "\n"
+            self.stdin_params[action.dest] = sep
+        if env is not None:
+            if env is True:
+                env = action.dest.upper()
+            self.env_params[action.dest] = (self.env_prefix or '') + env
         return action
 
+    def iter_param(self, values, sep):
+        """Yield *values*, replacing ``-`` with the records read from :attr:`stdin`.
+
+        If *values* is empty, yield the records read from :attr:`stdin`
+        instead. *sep* separates the records; see :meth:`add_param`.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.streams import splitstream
+
+        if not values:
+            values = ["-"]
+        for value in values:
+            if value == "-":
+                for record in splitstream(self.stdin, sep):
+                    yield record
+            else:
+                yield value
+
+    def convert_param(self, action, value):
+        """Convert the string *value* for the parameter *action*.
+
+        :meth:`convert_param` converts strings that come from somewhere other
+        than the command line (like environment variables) in the same way
+        the :class:`ArgumentParser` would, raising
+        :class:`argparse.ArgumentError` if the conversion fails. Parameters
+        that take no arguments (like flags) are set to their *const* value
+        unless *value* is empty or one of "0", "false", "no" or "off";
+        counters are set to the integer *value*. Parameters that take
+        more than one argument split *value* on whitespace. Parameters that
+        are appended to are set to a list holding the converted *value*.
+
+        .. versionadded:: 1.1.2
+        """
+        parser = self.argparser
+        if action.nargs == 0:
+            if action.const is None:
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise argparse.ArgumentError(action,
+                        "invalid int value: %r" % value)
+            elif value.lower() in ('', '0', 'false', 'no', 'off'):
+                value = action.default
+            else:
+                value = action.const
+            return value
+
+        if action.nargs in (None, argparse.OPTIONAL):
+            strings = [value]
+        else:
+            strings = value.split()
+        values = parser._get_values(action, strings)
+        # The value stands for a single use of the option.
+        if isinstance(action, getattr(argparse, "_ExtendAction", ())):
+            if not isinstance(values, list):
+                values = [values]
+        elif isinstance(action, argparse._AppendAction):
+            values = [values]
+        return values
+
+    def get_config_cache(self):
+        """Return the :class:`cli.config.ConfigCache` used by :meth:`parse_config`."""
+        if self.config_cache is None:
+            from cli.config import cache
+            self.config_cache = cache
+        return self.config_cache
+
+    def parse_config(self):
+        """Return an :class:`argparse.Namespace` of values from :attr:`config`.
+
+        Each configuration file that exists is loaded (through
+        :meth:`get_config_cache`, so unchanged files aren't parsed again)
+        and the keys in its :attr:`config_section` section are matched to
+        parameter *dest* names (with dashes replaced by underscores); other
+        keys are ignored. Later files override earlier ones. String values
+        are converted with :meth:`convert_param`; if a file can't be parsed
+        or a value can't be converted, the error names the file.
+
+        .. versionadded:: 1.1.2
+        """
+        ns = argparse.Namespace()
+        if not self.config:
+            return ns
+
+        from cli.config import ConfigError
+
+        cache = self.get_config_cache()
+        section = self.config_section
+        if section is None:
+            section = self.name
+        for path in self.config:
+            if not os.path.exists(path):
+                cache.forget(path)
+                continue
+            try:
+                values = cache.load(path).get(section, {})
+            except ConfigError, e:
+                self.argparser.error("config file %s" % e)
+            for key, value in values.items():
+                dest = key.replace('-', '_')
+                action = self.actions.get(dest)
+                if action is None:
+                    continue
+                if isinstance(value, basestring):
+                    try:
+                        value = self.convert_param(action, value)
+                    except argparse.ArgumentError, e:
+                        self.argparser.error("config file %s: %s: %s" % (
+                            path, key, e.message))
+                setattr(ns, dest, value)
+
+        return ns
+
+    def reload_config(self):
+        """Reload :attr:`config` if any of the files have changed.
+
+        Long-running applications (like those using
+        :class:`cli.daemon.DaemonizingMixin`) can call :meth:`reload_config`
+        periodically or from a signal handler. The files are only checked
+        with :func:`os.stat`; if none of them changed, nothing else happens
+        and ``False`` is returned. Otherwise, :attr:`params` is rebuilt with
+        :meth:`parse_params` (so the environment and command line still
+        take precedence) and ``True`` is returned. Parameters that read from
+        :attr:`stdin` are left alone. If the files can't be parsed or hold a
+        bad value, the error is written to :attr:`stderr`, :attr:`params`
+        is left as it was and ``False`` is returned.
+
+        .. versionadded:: 1.1.2
+        """
+        if not self.config:
+            return False
+        cache = self.get_config_cache()
+        for path in self.config:
+            if cache.changed(path):
+                break
+        else:
+            return False
+
+        try:
+            ns = self.parse_params()
+        except (Abort, SystemExit):
+            # The parser has reported the error; keep the old parameters
+            # rather than taking down a long-running application.
+            return False
+        for dest in self.stdin_params:
+            delattr(ns, dest)
+        self.params = self.update_params(self.params, ns)
+        return True
+
+    def parse_environ(self):
+        """Return an :class:`argparse.Namespace` of values from the environment.
+
+        Values are read from the environment variables bound to parameters
+        with :meth:`add_param`. :data:`os.environ` is scanned only once per
+        process (see :func:`cli.util.environ_index`). Each value is converted
+        with :meth:`convert_param`; if the conversion fails, the error names
+        the environment variable.
+
+        .. versionadded:: 1.1.2
+        """
+        ns = argparse.Namespace()
+        if not self.env_params:
+            return ns
+
+        index = environ_index(self.env_prefix or '', self.environ)
+        for dest, name in self.env_params.items():
+            value = index.get(name)
+            if value is None:
+                continue
+            try:
+                value = self.convert_param(self.actions[dest], value)
+            except argparse.ArgumentError, e:
+                self.argparser.error("environment variable %s: %s" % (
+                    name, e.message))
+            setattr(ns, dest, value)
+
+        return ns
+
     def update_params(self, params, newparams):
         """Update a parameter namespace.
 
@@ -403,26 +1581,158 @@ class CommandLineMixin(object):
 
         return params
 
-    def pre_run(self):
-        """Parse command line.
+    def reset(self, argv=None, stdin=None, stdout=None, stderr=None):
+        """Discard :attr:`params` and point the parser at the new streams.
 
-        During :meth:`pre_run`, :class:`CommandLineMixin`
-        calls :meth:`argparse.ArgumentParser.parse_args`. The results are
-        stored in :attr:`params`. 
+        See :meth:`Application.reset`.
 
-        ..versionchanged:: 1.1.1
+        .. versionadded:: 1.1.2
+        """
+        self.params = argparse.Namespace()
+        if argv is not None:
+            self.argparser.argv = argv
+        if stdout is not None:
+            self.argparser.stdout = stdout
+        if stderr is not None:
+            self.argparser.stderr = stderr
+
+    def parse_params(self):
+        """Return an :class:`argparse.Namespace` of parameter values.
+
+        Values are taken from (in increasing order of precedence) the
+        parameters' defaults, the configuration files (see
+        :meth:`parse_config`), the environment (see :meth:`parse_environ`)
+        and the command line. A value from the command line replaces the
+        others, even for parameters that accumulate (like ``append`` and
+        ``count`` actions).
 
         If :meth:`argparse.ArgumentParser.parse_args` raises SystemExit but
         :attr:`exit_after_main` is not True, raise Abort instead.
+
+        .. versionadded:: 1.1.2
         """
         try:
-            ns = self.argparser.parse_args()
+            layer = self.parse_config()
+            self.update_params(layer, self.parse_environ())
+            # Actions like append and count add to the value they find, so
+            # the command line is parsed with the layer's values unset and
+            # they're put back only where the command line didn't set them.
+            given = RecordingNamespace(vars(layer))
+            self.argparser.parse_args(namespace=given)
         except SystemExit, e:
             if self.exit_after_main:
                 raise
             else:
                 raise Abort(e.code)
+
+        ns = given.copy()
+        for dest, value in vars(layer).items():
+            if dest not in given.recorded:
+                setattr(ns, dest, value)
+        return ns
+
+    def pre_run(self):
+        """Parse command line.
+
+        During :meth:`pre_run`, :class:`CommandLineMixin`
+        calls :meth:`argparse.ArgumentParser.parse_args`. The results are
+        stored in :attr:`params`. 
+
+        ..versionchanged:: 1.1.1
+
+        If :meth:`argparse.ArgumentParser.parse_args` raises SystemExit but
+        :attr:`exit_after_main` is not True, raise Abort instead.
+
+        ..versionchanged:: 1.1.2
+
+        Parsing moved to :meth:`parse_params`.
+        """
+        ns = self.parse_params()
+        for dest, sep in self.stdin_params.items():
+            setattr(ns, dest, self.iter_param(getattr(ns, dest), sep))
         self.params = self.update_params(self.params, ns)
+        if self.stats is True:
+            self.show_stats = self.params.stats
+        if self.compression:
+            self.setup_compression()
+        if self.checkpoint is not None:
+            self.resume = self.params.resume
+
+    def setup_compression(self):
+        """Wrap :attr:`stdout` and :attr:`stdin` in compression codecs.
+
+        If the :option:`--compress` parameter was given, :attr:`stdout` is
+        replaced by a :class:`cli.compress.CompressingWriter`, which
+        compresses on a background thread; the compressed stream is
+        finished when the application finishes. If
+        :option:`--decompress-input` was given, :attr:`stdin` is replaced
+        by a stream of its decompressed contents (see
+        :func:`cli.compress.decompressing`); :meth:`open_input` decompresses
+        files, too.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.compress import CompressingWriter, decompressing
+
+        if self.params.compress:
+            stdout = self.stdout
+            stdout.flush()
+            writer = CompressingWriter(stdout, self.params.compress,
+                encoding=getattr(stdout, "encoding", None) or "utf-8")
+            self.stdout = writer
+            def finish():
+                writer.close()
+                self.stdout = stdout
+            self.add_cleanup(finish)
+        if self.params.decompress_input:
+            self.stdin = decompressing(self.stdin,
+                self.params.decompress_input)
+
+    def open_input(self, path):
+        """Open the file at *path* for reading in binary mode.
+
+        A *path* of ``-`` means :attr:`stdin`. If the application accepts
+        :option:`--decompress-input` and it was given, the file is
+        decompressed as it is read.
+
+        .. versionadded:: 1.1.2
+        """
+        if path == "-":
+            return getattr(self.stdin, "buffer", self.stdin)
+        stream = open(path, "rb")
+        codec = getattr(self.params, "decompress_input", None)
+        if codec:
+            from cli.compress import decompressing
+            stream = decompressing(stream, codec, owner=True)
+        return stream
+
+    def repl(self, prompt=None, history=None):
+        """Read command lines interactively and run the application for each.
+
+        The parser is built once; each line is parsed into fresh
+        :attr:`params` and run with :meth:`execute`, so whatever the
+        application caches between runs stays warm. *prompt* defaults to
+        the application's name. Lines are kept in the *history* file, by
+        default :file:`history/{name}` in :func:`cli.cache.defaultdir`;
+        pass ``False`` to keep none. See :class:`cli.repl.Shell`.
+
+        Returns the status of the last command.
+
+        .. versionadded:: 1.1.2
+        """
+        from cli.repl import Shell
+
+        if history is None:
+            from cli.cache import defaultdir
+            history = os.path.join(defaultdir(), "history", self.name)
+        elif history is False:
+            history = None
+        stdin = None
+        if not getattr(self.stdin, "isatty", lambda: False)():
+            stdin = self.stdin
+        shell = Shell(self, prompt, history, stdin=stdin, stdout=self.stdout)
+        shell.cmdloop()
+        return shell.status
 
 class CommandLineApp(CommandLineMixin, Application):
     """A command line application.
@@ -442,3 +1752,7 @@ class CommandLineApp(CommandLineMixin, Application):
     def setup(self):
         Application.setup(self)
         CommandLineMixin.setup(self)
+
+    def reset(self, **kwargs):
+        Application.reset(self, **kwargs)
+        CommandLineMixin.reset(self, **kwargs)
@@ -0,0 +1,102 @@
+"""\
+:mod:`cli.bench.compress` -- compressed output throughput
+---------------------------------------------------------
+
+Compares writing uncompressed output with compressing it inline, on a
+:class:`cli.compress.CompressingWriter` thread and by piping it to a
+:command:`gzip` process::
+
+    $ python -m cli.bench.compress -n 1000000 -l 6
+
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+
+import os
+import subprocess
+
+from tempfile import TemporaryFile
+from timeit import default_timer as timer
+
+import cli.app
+
+from cli.compress import CompressingWriter
+from cli.profiler import fmtsec
+
+def write(stream, lines):
+    """Write *lines* lines of sample output to *stream*."""
+    for i in range(lines):
+        stream.write(("%d\tline %d of the output\n" % (i, i)).encode("ascii"))
+
+def plain(output, level, lines):
+    write(output, lines)
+    output.flush()
+
+def inline(output, level, lines):
+    writer = CompressingWriter(output, level=level, threaded=False)
+    write(writer, lines)
+    writer.close()
+
+def threaded(output, level, lines):
+    writer = CompressingWriter(output, level=level)
+    write(writer, lines)
+    writer.close()
+
+def piped(output, level, lines):
+    process = subprocess.Popen(["gzip", "-%d" % level], bufsize=-1,
+        stdin=subprocess.PIPE, stdout=output)
+    write(process.stdin, lines)
+    process.stdin.close()
+    process.wait()
+
+@cli.app.CommandLineApp
+def compress(app):
+    cases = [("plain", plain), ("inline", inline), ("threaded", threaded),
+        ("gzip", piped)]
+    total = sum(len("%d\tline %d of the output\n" % (i, i))
+        for i in range(app.params.lines))
+    for name, func in cases:
+        times = []
+        for i in range(app.params.repeat):
+            output = TemporaryFile(prefix="bench-compress-")
+            try:
+                start = timer()
+                func(output, app.params.level, app.params.lines)
+                times.append(timer() - start)
+                size = os.fstat(output.fileno()).st_size
+            except OSError, e:
+                app.log.warning("%s: %s", name, e)
+                break
+            finally:
+                output.close()
+        if not times:
+            continue
+        best = min(times)
+        app.stdout.write(u"%-8s best of %d: %s (%.1f MB/s in, %d bytes out)\n"
+            % (name, app.params.repeat, fmtsec(best), total / best / 1e6,
+                size))
+
+compress.add_param("-n", "--lines", default=1000000, type=int,
+    help="number of lines to write (default: %(default)s)")
+compress.add_param("-l", "--level", default=6, type=int,
+    help="compression level (default: %(default)s)")
+compress.add_param("-r", "--repeat", default=3, type=int,
+    help="number of timed runs per case (default: %(default)s)")
+
+if __name__ == "__main__":
+    compress.run()
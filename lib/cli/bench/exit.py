@@ -0,0 +1,87 @@
+"""\
+:mod:`cli.bench.exit` -- exit latency with large heaps
+------------------------------------------------------
+
+Runs applications that build a large object graph in :attr:`main` and
+measures how long they take to build it and, once :attr:`main` returns,
+to exit, with and without *fast_exit* and *tune_gc*::
+
+    $ python -m cli.bench.exit -n 2000000
+
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+
+import os
+import subprocess
+import sys
+import time
+
+import cli.app
+
+from cli.profiler import fmtsec
+
+CHILD = """
+import sys, time
+from cli.app import Application
+
+def main(app):
+    start = time.time()
+    graph = app.graph = {}
+    for i in range(%(objects)d):
+        graph[i] = {"id": i, "children": [i - 1, i // 2], "name": str(i)}
+    sys.stderr.write("%%r %%r\\n" %% (start, time.time()))
+    sys.stderr.flush()
+
+Application(main, fast_exit=%(fast_exit)r, tune_gc=%(tune_gc)r).run()
+"""
+
+def measure(objects, fast_exit, tune_gc):
+    """Return the build time and exit latency of one child application."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(cli.__file__))
+    code = CHILD % {"objects": objects, "fast_exit": fast_exit,
+        "tune_gc": tune_gc}
+    process = subprocess.Popen([sys.executable, "-c", code], env=env,
+        stderr=subprocess.PIPE)
+    output = process.stderr.readline()
+    process.wait()
+    exited = time.time()
+    start, built = [float(x) for x in output.split()]
+    return built - start, exited - built
+
+@cli.app.CommandLineApp
+def exit(app):
+    app.stdout.write(u"%-10s %-8s %12s %12s\n" % ("fast_exit", "tune_gc",
+        "build", "exit"))
+    for fast_exit in (False, True):
+        for tune_gc in (False, True):
+            results = [measure(app.params.objects, fast_exit, tune_gc)
+                for i in range(app.params.repeat)]
+            build = min(result[0] for result in results)
+            latency = min(result[1] for result in results)
+            app.stdout.write(u"%-10s %-8s %12s %12s\n" % (fast_exit, tune_gc,
+                fmtsec(build), fmtsec(latency)))
+
+exit.add_param("-n", "--objects", default=1000000, type=int,
+    help="number of graph nodes to build (default: %(default)s)")
+exit.add_param("-r", "--repeat", default=3, type=int,
+    help="number of runs per case (default: %(default)s)")
+
+if __name__ == "__main__":
+    exit.run()
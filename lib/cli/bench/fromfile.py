@@ -0,0 +1,57 @@
+"""Compare the line and NUL-delimited @fromfile formats.
+
+Writes a manifest of generated file names in both formats and times how
+long :class:`cli.app.ArgumentParser` takes to expand each of them.
+"""
+
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+from timeit import default_timer as timer
+
+import cli.app
+
+from cli.profiler import fmtsec
+
+def write_manifest(path, count, sep):
+    manifest = open(path, "wb")
+    try:
+        for i in range(count):
+            manifest.write(("data/%08d/file-%d.txt%s" % (i // 1000, i, sep)).encode("ascii"))
+    finally:
+        manifest.close()
+
+def expand(path, sep):
+    parser = cli.app.ArgumentParser(argv=["bench"], fromfile_prefix_chars="@",
+        fromfile_sep=sep)
+    start = timer()
+    args = parser._read_args_from_files(["@" + path])
+    return timer() - start, len(args)
+
+@cli.app.CommandLineApp
+def fromfile(app):
+    tmpdir = mkdtemp(prefix="bench-fromfile-")
+    try:
+        count = app.params.entries
+        for mode, sep in (("lines", None), ("nul", "\0")):
+            path = os.path.join(tmpdir, mode)
+            write_manifest(path, count, sep or "\n")
+            times = []
+            for i in range(app.params.repeat):
+                elapsed, expanded = expand(path, sep)
+                assert expanded == count
+                times.append(elapsed)
+            best = min(times)
+            app.stdout.write(u"%-5s %d entries, best of %d: %s (%s per entry)\n" % (
+                mode, count, app.params.repeat, fmtsec(best), fmtsec(best / count)))
+    finally:
+        rmtree(tmpdir)
+
+fromfile.add_param("-n", "--entries", default=2000000, type=int,
+    help="number of manifest entries (default: %(default)s)")
+fromfile.add_param("-r", "--repeat", default=3, type=int,
+    help="number of timed runs per format (default: %(default)s)")
+
+if __name__ == "__main__":
+    fromfile.run()
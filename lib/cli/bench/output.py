@@ -0,0 +1,94 @@
+"""\
+:mod:`cli.bench.output` -- output throughput
+--------------------------------------------
+
+Compares writing many short lines straight to a file (fully buffered, as
+when output is redirected, and line buffered, as when it goes to a
+terminal) with writing them through a :class:`cli.streams.OutputWriter`,
+from one thread and from several::
+
+    $ python -m cli.bench.output -n 1000000 -t 4
+
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import io
+import os
+import threading
+
+from tempfile import mkstemp
+from timeit import default_timer as timer
+
+import cli.app
+
+from cli.profiler import fmtsec
+from cli.streams import OutputWriter
+
+def tempfile(buffering=-1):
+    fd, path = mkstemp(prefix="bench-output-")
+    os.unlink(path)
+    return io.open(fd, "w", buffering, encoding="utf-8")
+
+def write(stream, lines, threads):
+    """Write *lines* lines to *stream* from *threads* threads."""
+    per_thread = lines // threads
+    def work():
+        for i in range(per_thread):
+            stream.write(u"line %d of the output\n" % i)
+    workers = [threading.Thread(target=work) for i in range(threads)]
+    start = timer()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stream.flush()
+    return timer() - start, per_thread * threads
+
+@cli.app.CommandLineApp
+def output(app):
+    cases = [
+        ("buffered", -1, lambda s: s),
+        ("line", 1, lambda s: s),
+        ("shared", 1, lambda s: OutputWriter(s)),
+        ("per-thread", 1, lambda s: OutputWriter(s, shared=False)),
+    ]
+    for threads in sorted(set([1, app.params.threads])):
+        for name, buffering, wrap in cases:
+            times = []
+            for i in range(app.params.repeat):
+                stream = tempfile(buffering)
+                try:
+                    elapsed, count = write(wrap(stream), app.params.lines,
+                        threads)
+                finally:
+                    stream.close()
+                times.append(elapsed)
+            best = min(times)
+            app.stdout.write(u"%-10s %d thread(s), best of %d: %s "
+                "(%.0f lines/s)\n" % (name, threads, app.params.repeat,
+                fmtsec(best), count / best))
+
+output.add_param("-n", "--lines", default=1000000, type=int,
+    help="number of lines to write (default: %(default)s)")
+output.add_param("-t", "--threads", default=4, type=int,
+    help="number of writing threads (default: %(default)s)")
+output.add_param("-r", "--repeat", default=3, type=int,
+    help="number of timed runs per case (default: %(default)s)")
+
+if __name__ == "__main__":
+    output.run()
@@ -0,0 +1,96 @@
+"""\
+:mod:`cli.bench.records` -- record reading rate
+-----------------------------------------------
+
+Compares iterating over the lines of a file with
+:func:`cli.streams.iterrecords`, both reading the file in chunks and
+mapping it into memory::
+
+    $ python -m cli.bench.records -n 5000000
+
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import io
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+from timeit import default_timer as timer
+
+import cli.app
+
+from cli.profiler import fmtsec
+from cli.streams import iterrecords
+
+def write_lines(path, count):
+    output = open(path, "wb")
+    try:
+        for i in range(count):
+            output.write(("%08d some typical log line payload\n" % i).encode("ascii"))
+    finally:
+        output.close()
+
+def builtin_open(path):
+    stream = open(path, "rb")
+    try:
+        return sum(1 for line in stream)
+    finally:
+        stream.close()
+
+def io_open(path):
+    stream = io.open(path, "rb")
+    try:
+        return sum(1 for line in stream)
+    finally:
+        stream.close()
+
+def chunked(path):
+    return sum(1 for record in iterrecords(path, mmap=False))
+
+def mapped(path):
+    return sum(1 for record in iterrecords(path, mmap=True))
+
+@cli.app.CommandLineApp
+def records(app):
+    tmpdir = mkdtemp(prefix="bench-records-")
+    try:
+        count = app.params.lines
+        path = os.path.join(tmpdir, "lines")
+        write_lines(path, count)
+        for name, func in (("open", builtin_open), ("io.open", io_open),
+                ("iterrecords", chunked), ("iterrecords (mmap)", mapped)):
+            times = []
+            for i in range(app.params.repeat):
+                start = timer()
+                assert func(path) == count
+                times.append(timer() - start)
+            best = min(times)
+            app.stdout.write(u"%-20s %d lines, best of %d: %s "
+                "(%.0f lines/s)\n" % (name, count, app.params.repeat,
+                fmtsec(best), count / best))
+    finally:
+        rmtree(tmpdir)
+
+records.add_param("-n", "--lines", default=5000000, type=int,
+    help="number of lines in the input file (default: %(default)s)")
+records.add_param("-r", "--repeat", default=3, type=int,
+    help="number of timed runs per reader (default: %(default)s)")
+
+if __name__ == "__main__":
+    records.run()
@@ -0,0 +1,165 @@
+"""\
+:mod:`cli.bench.startup` -- application startup time
+----------------------------------------------------
+
+Measures how long it takes to import :mod:`cli`'s modules and to construct,
+set up and run an empty application of each class. Cold starts are timed in
+a fresh interpreter for each sample; warm starts are timed in a loop in this
+process. Results can be saved as JSON and compared with an earlier run::
+
+    $ python -m cli.bench.startup -o before.json
+    $ git checkout topic
+    $ python -m cli.bench.startup -c before.json
+
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from timeit import default_timer as timer
+
+import cli.app
+
+from cli.profiler import fmtsec
+
+CLASSES = [
+    ("Application", "cli.app", {}),
+    ("CommandLineApp", "cli.app", {}),
+    ("LoggingApp", "cli.log", {"stream": None}),
+    ("DaemonizingApp", "cli.daemon", {"stream": None}),
+]
+"""Application classes to measure, their modules and extra keyword arguments.
+
+Logging applications get no stream, so that repeated construction doesn't
+pile handlers up on the logger.
+"""
+
+COLD = """\
+import sys
+from timeit import default_timer as timer
+start = timer()
+%s
+sys.stdout.write(repr(timer() - start))
+"""
+
+def noop(app):
+    pass
+
+def cases():
+    """Yield (name, setup statement, timed statement) tuples."""
+    for module in ("cli.app", "cli.log", "cli.daemon"):
+        yield "import " + module, "", "import " + module
+    for cls, module, kwargs in CLASSES:
+        setup = "import %s\ndef noop(app): pass\nkwargs = %r" % (module, kwargs)
+        construct = ("app = %s.%s(noop, argv=['bench'], exit_after_main=False, "
+            "**kwargs)" % (module, cls))
+        yield cls + "()", setup, construct
+        yield cls + "().run()", setup, construct + "\napp.run()"
+
+def cold(setup, stmt, samples):
+    """Time *stmt* in *samples* fresh interpreters."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([
+        os.path.dirname(os.path.dirname(cli.__file__)),
+        env.get("PYTHONPATH", "")])
+    # The setup is timed too, so cold constructions include their imports.
+    code = COLD % "\n".join([setup, stmt])
+    times = []
+    for i in range(samples):
+        output = subprocess.Popen([sys.executable, "-c", code], env=env,
+            stdout=subprocess.PIPE).communicate()[0]
+        times.append(float(output))
+    return times
+
+def warm(setup, stmt, loops):
+    """Time *stmt* *loops* times in this process, after running *setup*."""
+    namespace = {}
+    exec(compile(setup, "<setup>", "exec"), namespace)
+    code = compile(stmt, "<stmt>", "exec")
+    exec(code, namespace)
+    times = []
+    for i in range(loops):
+        start = timer()
+        exec(code, namespace)
+        times.append(timer() - start)
+    return times
+
+def percentile(times, p):
+    """Return percentile *p* of the sorted list *times*."""
+    index = int(round(p / 100.0 * (len(times) - 1)))
+    return times[index]
+
+def summarize(times):
+    times = sorted(times)
+    return {
+        "samples": len(times),
+        "min": times[0],
+        "median": percentile(times, 50),
+        "p90": percentile(times, 90),
+        "p99": percentile(times, 99),
+        "max": times[-1],
+    }
+
+@cli.app.CommandLineApp
+def startup(app):
+    results = {}
+    baseline = {}
+    if app.params.compare:
+        baseline = json.load(open(app.params.compare))["results"]
+
+    app.stdout.write(u"%-32s %12s %12s %12s %8s\n" % (
+        "case", "median", "p90", "p99", "change"))
+    for kind, measure, count in (
+            ("cold", cold, app.params.samples),
+            ("warm", warm, app.params.loops)):
+        for name, setup, stmt in cases():
+            if kind == "warm" and name.startswith("import "):
+                continue
+            name = "%s %s" % (kind, name)
+            result = results[name] = summarize(measure(setup, stmt, count))
+            change = ""
+            if name in baseline:
+                change = "%+.1f%%" % (100.0 * (result["median"] /
+                    baseline[name]["median"] - 1))
+            app.stdout.write(u"%-32s %12s %12s %12s %8s\n" % (name,
+                fmtsec(result["median"]), fmtsec(result["p90"]),
+                fmtsec(result["p99"]), change))
+            app.stdout.flush()
+
+    if app.params.output:
+        output = open(app.params.output, "w")
+        try:
+            json.dump({"python": sys.version, "results": results}, output,
+                indent=1, sort_keys=True)
+        finally:
+            output.close()
+
+startup.add_param("-n", "--samples", default=20, type=int,
+    help="number of fresh interpreters per cold case (default: %(default)s)")
+startup.add_param("-l", "--loops", default=1000, type=int,
+    help="number of iterations per warm case (default: %(default)s)")
+startup.add_param("-o", "--output", default=None,
+    help="save the results as JSON to this file")
+startup.add_param("-c", "--compare", default=None,
+    help="compare the medians with results saved by --output")
+
+if __name__ == "__main__":
+    startup.run()
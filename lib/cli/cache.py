@@ -0,0 +1,548 @@
+"""\
+:mod:`cli.cache` -- cached application runs and functions
+---------------------------------------------------------
+
+Build systems and scripts often run the same command again and again with
+the same arguments and unchanged input files. An application created with
+a *cache* replays the output of such repeats instead of running
+:attr:`main` again. The cache can be inspected and pruned from the
+command line::
+
+    $ python -m cli.cache --list
+    $ python -m cli.cache --max-size 10000000
+
+Expensive functions that applications call on every run (like loading a
+schema or building an index) can be wrapped with :func:`memoize`, which
+keeps their results in memory and, optionally, in a file shared by all
+runs.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import io
+import marshal
+import os
+import pickle
+import threading
+import time
+
+from collections import OrderedDict
+from hashlib import sha1
+
+from cli.streams import BINARY, ERRORS
+from cli.util import ifelse, update_wrapper
+
+__all__ = ["MemoryStore", "Recorder", "RunCache", "SQLiteStore", "memoize"]
+
+MISSING = object()
+
+def defaultdir():
+    """Return :file:`$XDG_CACHE_HOME/pycli` (or :file:`~/.cache/pycli`)."""
+    return os.path.join(os.environ.get("XDG_CACHE_HOME",
+        os.path.join(os.path.expanduser("~"), ".cache")), "pycli")
+
+class Recorder(object):
+    """Pass writes through to *stream*, keeping a copy as bytes.
+
+    Text is encoded with *encoding* (by default, the stream's encoding or
+    UTF-8); bytes are written to the stream's binary buffer, if it has one.
+    Attributes that :class:`Recorder` doesn't define are looked up on
+    *stream*, except for :meth:`fileno` and :attr:`buffer`: writes that went
+    around the :class:`Recorder` (like :func:`cli.streams.copyfile`'s)
+    wouldn't be recorded.
+    """
+    hidden = ("buffer", "fileno")
+
+    def __init__(self, stream, encoding=None):
+        self.stream = stream
+        self.encoding = encoding or getattr(stream, "encoding", None) or \
+            "utf-8"
+        self.chunks = []
+
+    def __getattr__(self, name):
+        if name in self.hidden:
+            raise AttributeError(name)
+        return getattr(self.stream, name)
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            raw = getattr(self.stream, "buffer", None)
+            if raw is not None:
+                self.stream.flush()
+                raw.write(data)
+            elif BINARY and isinstance(self.stream, io.TextIOBase):
+                self.stream.write(data.decode(self.encoding, ERRORS))
+            else:
+                self.stream.write(data)
+        else:
+            self.stream.write(data)
+            data = data.encode(self.encoding)
+        self.chunks.append(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def getvalue(self):
+        """Return the bytes written so far."""
+        return b"".join(self.chunks)
+
+class RunCache(object):
+    """A directory of recorded application runs.
+
+    Each run is keyed by a :meth:`fingerprint` of the application's
+    parameters and input files and stores the run's exit status and the
+    bytes it wrote to :attr:`stdout`. Entries are kept in *cachedir* (by
+    default, :file:`$XDG_CACHE_HOME/pycli/runs` or
+    :file:`~/.cache/pycli/runs`); when they take up more than *max_size*
+    bytes, the least recently used ones are removed.
+
+    Input files are identified by their size and modification time, which
+    is cheap but misses changes that keep both; if *hash* is True, their
+    contents are hashed instead. Failures to read or write the cache are
+    ignored.
+    """
+    version = 1
+
+    def __init__(self, cachedir=None, max_size=100 << 20, hash=False):
+        if cachedir is None:
+            cachedir = os.path.join(defaultdir(), "runs")
+        self.cachedir = cachedir
+        self.max_size = max_size
+        self.hash = hash
+
+    def fingerprint(self, app, inputs=()):
+        """Return the cache key for a run of *app* reading *inputs*.
+
+        The key covers the application's name and version, its
+        :attr:`params` (or, if it has none, its :attr:`argv`) and each of
+        the paths in *inputs*. Parameter values are compared by their
+        :func:`repr`, so parameters like open files never match.
+        """
+        digest = sha1()
+        def update(value):
+            digest.update(repr(value).encode("utf-8"))
+            digest.update(b"\0")
+        update((self.version, app.name, app.version))
+        params = getattr(app, "params", None)
+        if params is None:
+            update(list(app.argv[1:]))
+        else:
+            update(sorted(vars(params).items()))
+        for path in inputs:
+            update(os.path.abspath(path))
+            update(self.identify(path))
+        return digest.hexdigest()
+
+    def identify(self, path):
+        """Return a value that changes when the file at *path* does."""
+        try:
+            if not self.hash:
+                stat = os.stat(path)
+                return (stat.st_size, stat.st_mtime)
+            digest = sha1()
+            f = open(path, "rb")
+            try:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            finally:
+                f.close()
+            return digest.hexdigest()
+        except (IOError, OSError):
+            return None
+
+    def path(self, key):
+        return os.path.join(self.cachedir, key)
+
+    def get(self, key):
+        """Return the (*status*, *output*) recorded for *key*, or ``None``.
+
+        A hit counts as a use of the entry for eviction.
+        """
+        path = self.path(key)
+        try:
+            f = open(path, "rb")
+            try:
+                version, info, output = marshal.load(f)
+            finally:
+                f.close()
+            os.utime(path, None)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != self.version:
+            return None
+        return info["status"], output
+
+    def put(self, key, status, output, argv=()):
+        """Record a run with exit *status* and *output* under *key*.
+
+        *argv* is kept to make :meth:`entries` easier to read. Afterwards,
+        the cache is pruned to *max_size* bytes.
+        """
+        from cli.streams import AtomicFile
+
+        info = {"status": status, "argv": list(argv), "created": time.time()}
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with AtomicFile(self.path(key), "wb", sync=False) as f:
+                f.write(marshal.dumps((self.version, info, output)))
+        except (IOError, OSError, ValueError):
+            return
+        self.prune()
+
+    def entries(self):
+        """Return a list of (*key*, *size*, *used*) tuples, oldest first.
+
+        *used* is the time the entry was last written or replayed.
+        """
+        entries = []
+        try:
+            names = os.listdir(self.cachedir)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith("."):
+                continue
+            try:
+                stat = os.stat(self.path(name))
+            except OSError:
+                continue
+            entries.append((name, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def info(self, key):
+        """Return the status, arguments and creation time recorded for *key*."""
+        try:
+            f = open(self.path(key), "rb")
+            try:
+                version, info, output = marshal.load(f)
+            finally:
+                f.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        return info
+
+    def prune(self, max_size=None):
+        """Remove the least recently used entries until at most *max_size*
+        bytes (by default, the cache's *max_size*) remain.
+
+        Returns the number of entries removed.
+        """
+        max_size = ifelse(self.max_size, max_size is None, max_size)
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        removed = 0
+        for key, size, used in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(self.path(key))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+class MemoryStore(object):
+    """A thread-safe, in-process LRU store for :func:`memoize`.
+
+    At most *maxsize* entries (and, if *max_bytes* is not ``None``, about
+    that many bytes of pickled values) are kept; the least recently used
+    entries are dropped first.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored for *key*, or :data:`MISSING`."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return MISSING
+            value, size, expires = entry
+            if expires is not None and expires <= now:
+                self.size -= size
+                return MISSING
+            self.entries[key] = entry
+            return value
+
+    def put(self, key, value, expires=None, size=None):
+        """Store *value* for *key* until *expires* (a time, or ``None``).
+
+        *size* is the length of the pickled value, if it is known.
+        """
+        if self.max_bytes is not None and size is None:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        size = size or 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = (value, size, expires)
+            self.size += size
+            while len(self.entries) > self.maxsize or (
+                    self.max_bytes is not None and self.size > self.max_bytes):
+                self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+class SQLiteStore(object):
+    """A persistent store for :func:`memoize`, kept in one SQLite file.
+
+    The file at *path* can be shared by any number of threads and
+    processes; SQLite serializes their writes, waiting up to *timeout*
+    seconds for a lock. When the pickled values take up more than
+    *max_bytes*, the least recently used ones are removed. Failures to
+    read or write the store are ignored, like cache misses.
+    """
+    schema = """create table if not exists memo (
+        key text primary key, value blob, size integer, expires real,
+        used real)"""
+
+    def __init__(self, path=None, max_bytes=100 << 20, timeout=30):
+        if path is None:
+            path = os.path.join(defaultdir(), "memo.sqlite")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connect(self):
+        # SQLite connections belong to one thread and can't survive a fork.
+        db = getattr(self.local, "db", None)
+        if db is None or self.local.pid != os.getpid():
+            import sqlite3
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            db = sqlite3.connect(self.path, timeout=self.timeout,
+                isolation_level=None)
+            try:
+                db.execute("pragma journal_mode=wal")
+            except sqlite3.DatabaseError:
+                pass
+            db.execute(self.schema)
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+
+    def errors(self):
+        import sqlite3
+
+        return (sqlite3.Error, IOError, OSError, pickle.UnpicklingError,
+            EOFError)
+
+    def get(self, key):
+        """Return the value stored for *key*, or :data:`MISSING`."""
+        try:
+            db = self.connect()
+            row = db.execute("select value, expires from memo where key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return MISSING
+            value, expires = row
+            now = time.time()
+            if expires is not None and expires <= now:
+                return MISSING
+            db.execute("update memo set used = ? where key = ?", (now, key))
+            return pickle.loads(bytes(value))
+        except self.errors():
+            return MISSING
+
+    def put(self, key, value, expires=None, data=None):
+        """Store *value* (or its pickle, *data*) for *key* until *expires*.
+
+        Returns the length of the pickled value.
+        """
+        import sqlite3
+
+        if data is None:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return len(data)
+        try:
+            db = self.connect()
+            db.execute("insert or replace into memo values (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), expires, time.time()))
+            self.prune(db)
+        except self.errors():
+            pass
+        return len(data)
+
+    def prune(self, db):
+        """Remove expired entries, then least recently used ones over budget."""
+        db.execute("delete from memo where expires <= ?", (time.time(),))
+        total = db.execute("select sum(size) from memo").fetchone()[0] or 0
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        removed = []
+        for key, size in db.execute("select key, size from memo "
+                "order by used"):
+            removed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("delete from memo where key = ?", removed)
+
+    def clear(self):
+        try:
+            self.connect().execute("delete from memo")
+        except self.errors():
+            pass
+
+def memoize(func=None, maxsize=128, max_bytes=None, ttl=None, key=None,
+        store=None):
+    """Cache the results of *func*.
+
+    Results are kept in a :class:`MemoryStore` of *maxsize* entries and
+    *max_bytes* bytes and, if *store* is given, in a persistent store
+    shared by later runs and other processes (*store* may be a
+    :class:`SQLiteStore`, or a path or True for one at that path or the
+    default path). Results older than *ttl* seconds are computed again.
+
+    Calls are identified by *key*, a function called with the same
+    arguments as *func* that returns a hashable (and, for a persistent
+    store, picklable) value; by default, the positional and keyword
+    arguments themselves are used. Persistent entries are also keyed by
+    *func*'s module and name. :func:`memoize` may be used with or without
+    arguments::
+
+        @memoize(ttl=3600, store=True)
+        def load_schema(path):
+            ...
+
+    The wrapper's :meth:`stats` returns a dict of hits (from each tier),
+    misses and the hit ratio, which an application can log when it
+    finishes::
+
+        app.add_cleanup(lambda: app.log.info("%r", load_schema.stats()))
+
+    :meth:`clear` empties both tiers.
+    """
+    if func is None:
+        return lambda func: memoize(func, maxsize=maxsize,
+            max_bytes=max_bytes, ttl=ttl, key=key, store=store)
+
+    memory = MemoryStore(maxsize, max_bytes)
+    if store is True:
+        store = SQLiteStore()
+    elif isinstance(store, basestring):
+        store = SQLiteStore(store)
+    prefix = "%s.%s:" % (func.__module__, func.__name__)
+    counts = {"memory": 0, "disk": 0, "misses": 0}
+
+    def wrapper(*args, **kwargs):
+        if key is None:
+            k = (args, tuple(sorted(kwargs.items())))
+        else:
+            k = key(*args, **kwargs)
+        value = memory.get(k)
+        if value is not MISSING:
+            counts["memory"] += 1
+            return value
+
+        expires = None
+        if ttl is not None:
+            expires = time.time() + ttl
+        if store is not None:
+            digest = prefix + sha1(pickle.dumps(k, 2)).hexdigest()
+            value = store.get(digest)
+            if value is not MISSING:
+                counts["disk"] += 1
+                memory.put(k, value, expires)
+                return value
+
+        counts["misses"] += 1
+        value = func(*args, **kwargs)
+        size = None
+        if store is not None:
+            size = store.put(digest, value, expires)
+        memory.put(k, value, expires, size)
+        return value
+
+    def stats():
+        calls = counts["memory"] + counts["disk"] + counts["misses"]
+        hits = calls - counts["misses"]
+        return {"calls": calls, "hits": hits, "memory_hits": counts["memory"],
+            "disk_hits": counts["disk"], "misses": counts["misses"],
+            "hit_ratio": float(hits) / (calls or 1)}
+
+    def clear():
+        memory.clear()
+        if store is not None:
+            store.clear()
+
+    wrapper = update_wrapper(wrapper, func)
+    wrapper.stats = stats
+    wrapper.clear = clear
+    wrapper.memory = memory
+    wrapper.store = store
+    return wrapper
+
+def inspect(app):
+    """Inspect and prune the cache of application runs."""
+    cache = RunCache(app.params.cachedir)
+    if app.params.max_size is not None:
+        removed = cache.prune(app.params.max_size)
+        app.stdout.write(u"removed %d entries\n" % removed)
+    if app.params.list:
+        for key, size, used in cache.entries():
+            info = cache.info(key) or {}
+            app.stdout.write(u"%s %10d %s %4s %s\n" % (key[:12], size,
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(used)),
+                info.get("status", "?"), " ".join(info.get("argv", ()))))
+    else:
+        entries = cache.entries()
+        app.stdout.write(u"%s: %d entries, %d bytes\n" % (cache.cachedir,
+            len(entries), sum(entry[1] for entry in entries)))
+
+def tool():
+    """Return the application run by ``python -m cli.cache``.
+
+    It is built on demand, so that importing :mod:`cli.cache` (as every
+    application using :func:`memoize` does) doesn't build a parser.
+    """
+    import cli.app
+
+    app = cli.app.CommandLineApp(inspect, name="cli.cache")
+    app.add_param("-d", "--cachedir", default=None,
+        help="cache directory (default: $XDG_CACHE_HOME/pycli/runs)")
+    app.add_param("-l", "--list", default=False, action="store_true",
+        help="list the cached runs, least recently used first")
+    app.add_param("-m", "--max-size", default=None, type=int,
+        help="remove the least recently used runs until at most MAX_SIZE "
+            "bytes remain (0 empties the cache)")
+    return app
+
+if __name__ == "__main__":
+    tool().run()
@@ -0,0 +1,173 @@
+"""\
+:mod:`cli.checkpoint` -- resumable batch applications
+-----------------------------------------------------
+
+A batch application that takes hours to work through its input shouldn't
+have to start over when it crashes or is stopped. An application created
+with a *checkpoint* saves its progress -- how many input items it has
+finished, and any state of its own -- every so often, and picks up where
+it left off when run again with :option:`--resume`::
+
+    @cli.app.CommandLineApp(checkpoint="index.checkpoint")
+    def index(app):
+        state = app.checkpoint.state
+        state.setdefault("words", 0)
+        for record in app.checkpointed(app.iter_records()):
+            state["words"] += len(record.split())
+        app.stdout.write(u"%d\\n" % state["words"])
+
+.. versionadded:: 1.1.2
+"""
+
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+
+import errno
+import os
+import pickle
+
+from collections import deque
+from itertools import islice
+from timeit import default_timer as timer
+
+from cli.streams import AtomicFile
+
+__all__ = ["Checkpoint"]
+
+class Checkpoint(object):
+    """The progress of a batch run, kept in the file at *path*.
+
+    :attr:`cursor` counts the input items that have been completely
+    processed and :attr:`state` is a dictionary for anything else the
+    application needs to resume (it must be picklable). The checkpoint is
+    saved whenever *every* items have been processed or *interval*
+    seconds have passed since the last save (either may be ``None``).
+    Saves replace the file atomically (see :class:`cli.streams.AtomicFile`)
+    and, if *sync* is True, reach the disk before the next item is read.
+
+    The input must be the same, in the same order, when the run is
+    resumed: items are skipped by counting them. :attr:`state` is saved as
+    it is, so it should be updated once an item is done with, not while it
+    is being processed. For example::
+
+        checkpoint = Checkpoint("index.checkpoint")
+        checkpoint.load()
+        state = checkpoint.state
+        state.setdefault("words", 0)
+        try:
+            for record in checkpoint.track(records):
+                state["words"] += len(record.split())
+        except:
+            checkpoint.finish(False)
+            raise
+        checkpoint.finish(True)
+
+    An application given a *checkpoint* loads and finishes it around
+    :attr:`main` itself (see :meth:`cli.app.Application.checkpointed`).
+    """
+    version = 1
+
+    def __init__(self, path, every=None, interval=10.0, sync=True):
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self.sync = sync
+        self.saves = 0
+        self.reset()
+
+    def reset(self):
+        """Start from the beginning, with an empty :attr:`state`."""
+        self.cursor = 0
+        self.state = {}
+        self.unsaved = 0
+        self.saved = timer()
+
+    def load(self):
+        """Restore the saved :attr:`cursor` and :attr:`state`.
+
+        Returns False (and resets the checkpoint) if nothing was saved.
+        """
+        self.reset()
+        try:
+            f = open(self.path, "rb")
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+        try:
+            version, cursor, state = pickle.load(f)
+        finally:
+            f.close()
+        if version != self.version:
+            raise ValueError("%s: unsupported checkpoint version %r" % (
+                self.path, version))
+        self.cursor, self.state = cursor, state
+        return True
+
+    def save(self):
+        """Write the :attr:`cursor` and :attr:`state` to :attr:`path`."""
+        data = pickle.dumps((self.version, self.cursor, self.state),
+            pickle.HIGHEST_PROTOCOL)
+        with AtomicFile(self.path, "wb", sync=self.sync) as f:
+            f.write(data)
+        self.unsaved = 0
+        self.saved = timer()
+        self.saves += 1
+
+    def remove(self):
+        """Remove the saved checkpoint, if there is one."""
+        try:
+            os.unlink(self.path)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def advance(self, count=1):
+        """Count *count* more items as processed, saving if one is due."""
+        self.cursor += count
+        self.unsaved += count
+        if self.every is not None and self.unsaved >= self.every:
+            self.save()
+        elif self.interval is not None and \
+                timer() - self.saved >= self.interval:
+            self.save()
+
+    def track(self, iterable):
+        """Yield the items of *iterable* that haven't been processed yet.
+
+        The first :attr:`cursor` items are skipped. An item counts as
+        processed (see :meth:`advance`) when the next one is requested, so
+        a save never records an item that was only partly handled.
+        """
+        items = iter(iterable)
+        deque(islice(items, self.cursor), 0)
+        for item in items:
+            yield item
+            self.advance()
+
+    def finish(self, success):
+        """Finish the run, which succeeded if *success* is True.
+
+        After a successful run, the checkpoint is removed. Otherwise, any
+        progress made since the last save is saved; the item that was being
+        processed when the run stopped isn't counted.
+        """
+        if success:
+            self.remove()
+        elif self.unsaved:
+            self.save()
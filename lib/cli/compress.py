@@ -0,0 +1,311 @@
+"""\
+:mod:`cli.compress` -- compressed input and output streams
+----------------------------------------------------------
+
+Applications whose output is piped straight into :command:`gzip` (or whose
+input comes from :command:`zcat`) can compress and decompress their own
+streams instead, saving a process and a copy of every byte. The work
+happens on a background thread, so it overlaps with the application's own.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import io
+import Queue
+import threading
+
+from cli.streams import BUFSIZE
+
+__all__ = ["CODECS", "CompressingWriter", "DecompressingReader",
+    "compressor", "decompressing", "decompressor"]
+
+CODECS = ["gzip", "bz2", "lzma", "zlib"]
+"""The names of the supported codecs."""
+
+MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "lzma"),
+]
+"""Prefixes identifying compressed data; zlib streams can't be told apart
+from text reliably, so they aren't detected."""
+
+FINISH = object()
+
+def module(codec):
+    """Import and return the module implementing *codec*."""
+    if codec not in CODECS:
+        raise ValueError("unknown codec: %r" % codec)
+    name = codec
+    if codec == "gzip":
+        name = "zlib"
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ValueError("codec %s is not available" % codec)
+
+def compressor(codec, level=None):
+    """Return a new compressor object for *codec*.
+
+    *level* is the compression level (or preset, for lzma); if it is
+    ``None``, the codec's default is used.
+    """
+    lib = module(codec)
+    if codec in ("gzip", "zlib"):
+        if level is None:
+            level = 6
+        wbits = lib.MAX_WBITS
+        if codec == "gzip":
+            wbits += 16
+        return lib.compressobj(level, lib.DEFLATED, wbits)
+    elif codec == "bz2":
+        if level is None:
+            level = 9
+        return lib.BZ2Compressor(level)
+    return lib.LZMACompressor(preset=level)
+
+def decompressor(codec):
+    """Return a new decompressor object for *codec*."""
+    lib = module(codec)
+    if codec == "gzip":
+        return lib.decompressobj(lib.MAX_WBITS + 16)
+    elif codec == "zlib":
+        return lib.decompressobj()
+    elif codec == "bz2":
+        return lib.BZ2Decompressor()
+    return lib.LZMADecompressor()
+
+def detect(data):
+    """Return the codec that compressed *data*, or ``None``."""
+    for magic, codec in MAGIC:
+        if data.startswith(magic):
+            return codec
+    return None
+
+class CompressingWriter(object):
+    """Compress the data written to it onto *stream*.
+
+    *stream* is a binary stream, or a text stream wrapping one (like
+    :data:`sys.stdout`). Writes (text is encoded with *encoding*) are
+    collected until *size* bytes are waiting and then handed to a background
+    thread, which compresses them with *codec* at *level* and writes the
+    result to *stream*. At most *ahead* chunks wait for the thread. If
+    *threaded* is False, chunks are compressed as they are handed over
+    instead.
+
+    :meth:`flush` waits for the queued chunks to be compressed and written,
+    but leaves the compressor's own buffer alone (flushing it would hurt
+    compression); :meth:`close` finishes the compressed stream, which is
+    only complete afterwards. *stream* itself is not closed.
+    """
+
+    def __init__(self, stream, codec="gzip", level=None, encoding="utf-8",
+            size=BUFSIZE, ahead=4, threaded=True):
+        self.stream = getattr(stream, "buffer", stream)
+        self.codec = codec
+        self.compressor = compressor(codec, level)
+        self.encoding = encoding
+        self.size = size
+        self.chunks = []
+        self.waiting = 0
+        self.closed = False
+        self.error = None
+        self.thread = None
+        if threaded:
+            self.pending = Queue.Queue(ahead)
+            self.thread = threading.Thread(target=self.work)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode(self.encoding)
+        self.chunks.append(data)
+        self.waiting += len(data)
+        if self.waiting >= self.size:
+            self.submit()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def submit(self, chunk=None):
+        """Hand the waiting data (and then *chunk*) to the compressor."""
+        if self.chunks:
+            data = b"".join(self.chunks)
+            self.chunks = []
+            self.waiting = 0
+            self.submit(data)
+        if chunk is None:
+            return
+        if self.thread is None:
+            self.compress(chunk)
+        else:
+            self.pending.put(chunk)
+        if self.error is not None:
+            raise self.error
+
+    def compress(self, chunk):
+        if chunk is FINISH:
+            data = self.compressor.flush()
+        else:
+            data = self.compressor.compress(chunk)
+        if data:
+            self.stream.write(data)
+
+    def work(self):
+        while True:
+            chunk = self.pending.get()
+            try:
+                if self.error is None:
+                    self.compress(chunk)
+            except Exception, e:
+                self.error = e
+            self.pending.task_done()
+            if chunk is FINISH:
+                break
+
+    def flush(self):
+        if self.closed:
+            return
+        self.submit()
+        if self.thread is not None:
+            self.pending.join()
+        if self.error is not None:
+            raise self.error
+        self.stream.flush()
+
+    def close(self):
+        """Finish the compressed stream and stop the background thread."""
+        if self.closed:
+            return
+        self.submit(FINISH)
+        if self.thread is not None:
+            self.thread.join()
+        self.closed = True
+        if self.error is not None:
+            raise self.error
+        self.stream.flush()
+
+class DecompressingReader(io.RawIOBase):
+    """A raw binary stream of the decompressed contents of *stream*.
+
+    Once the reader is first read from, a background thread reads *stream*
+    (binary, or text wrapping a binary buffer) in chunks of *size* bytes
+    and decompresses them, keeping up to *ahead* chunks ready. If *codec*
+    is ``"auto"``, it is detected from the first bytes, and data that
+    doesn't look compressed is passed through. Concatenated compressed
+    streams (like the output of ``cat a.gz b.gz``) are read in turn; if the
+    last one is cut short, reading raises :exc:`IOError` (with codecs that
+    can tell, which excludes gzip and bz2 on Python 2). Wrap the reader in
+    :class:`io.BufferedReader` (or use :func:`decompressing`) to read lines.
+    If *owner* is True, closing the reader closes *stream*, too.
+    """
+
+    def __init__(self, stream, codec="auto", size=BUFSIZE, ahead=4,
+            owner=False):
+        io.RawIOBase.__init__(self)
+        self.stream = getattr(stream, "buffer", stream)
+        self.owner = owner
+        self.codec = codec
+        self.size = size
+        self.ready = Queue.Queue(ahead)
+        self.current = b""
+        self.offset = 0
+        self.done = False
+        self.thread = None
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if not self.closed and self.owner:
+            self.stream.close()
+        io.RawIOBase.close(self)
+
+    def work(self):
+        try:
+            codec = self.codec
+            engine = None
+            while True:
+                data = self.stream.read(self.size)
+                if not data:
+                    break
+                if codec == "auto":
+                    codec = detect(data)
+                if codec is None:
+                    self.ready.put(data)
+                    continue
+                while data:
+                    if engine is None:
+                        engine = decompressor(codec)
+                    output = engine.decompress(data)
+                    if output:
+                        self.ready.put(output)
+                    data = b""
+                    if getattr(engine, "eof", False) or engine.unused_data:
+                        # Start over on the next concatenated stream.
+                        data = engine.unused_data
+                        engine = None
+            if engine is not None and hasattr(engine, "flush"):
+                output = engine.flush()
+                if output:
+                    self.ready.put(output)
+            if engine is not None and not getattr(engine, "eof", True):
+                raise IOError("compressed stream ended early")
+            self.ready.put(None)
+        except Exception, e:
+            self.ready.put(e)
+
+    def readinto(self, buffer):
+        if self.thread is None:
+            # Start lazily: an application that never reads its input
+            # shouldn't leave a thread blocked on it (and holding its lock).
+            self.thread = threading.Thread(target=self.work)
+            self.thread.daemon = True
+            self.thread.start()
+        while self.offset >= len(self.current):
+            if self.done:
+                return 0
+            chunk = self.ready.get()
+            if isinstance(chunk, Exception):
+                self.done = True
+                raise chunk
+            if chunk is None:
+                self.done = True
+                return 0
+            self.current = chunk
+            self.offset = 0
+        count = min(len(buffer), len(self.current) - self.offset)
+        buffer[:count] = self.current[self.offset:self.offset + count]
+        self.offset += count
+        return count
+
+def decompressing(stream, codec="auto", size=BUFSIZE, owner=False):
+    """Return a file object reading the decompressed contents of *stream*.
+
+    The result is text if *stream* is a text stream (with the same
+    encoding) and binary otherwise. See :class:`DecompressingReader`.
+    """
+    reader = io.BufferedReader(DecompressingReader(stream, codec, size,
+        owner=owner), size)
+    if isinstance(stream, io.TextIOBase):
+        return io.TextIOWrapper(reader,
+            encoding=getattr(stream, "encoding", None))
+    return reader
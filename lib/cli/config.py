@@ -0,0 +1,184 @@
+"""\
+:mod:`cli.config` -- configuration files
+----------------------------------------
+
+The :mod:`cli.config` module reads INI and JSON configuration files for
+:class:`cli.app.CommandLineMixin`. Parsed files are cached (both in memory
+and on disk) so that unchanged files are never parsed twice.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import marshal
+import os
+
+from hashlib import sha1
+
+__all__ = ["ConfigCache", "ConfigError", "parse"]
+
+class ConfigError(Exception):
+    """Raised when a configuration file can't be parsed."""
+    pass
+
+def parse(path):
+    """Parse the configuration file at *path*.
+
+    Files whose names end with ``.json`` must contain a JSON object mapping
+    section names to objects; all other files are read by
+    :class:`ConfigParser.RawConfigParser`. Either way, :func:`parse` returns a
+    dictionary mapping section names to dictionaries of values. Values from
+    INI files are always strings. If the file is malformed, raise
+    :class:`ConfigError`.
+    """
+    if path.endswith(".json"):
+        import json
+        f = open(path)
+        try:
+            try:
+                data = json.load(f)
+            except ValueError, e:
+                raise ConfigError("%s: %s" % (path, e))
+        finally:
+            f.close()
+        if not isinstance(data, dict):
+            raise ConfigError("%s: expected an object" % path)
+        return data
+
+    import ConfigParser
+    parser = ConfigParser.RawConfigParser()
+    try:
+        parser.read([path])
+    except ConfigParser.Error, e:
+        raise ConfigError(str(e))
+    return dict((section, dict(parser.items(section)))
+        for section in parser.sections())
+
+class ConfigCache(object):
+    """A cache of parsed configuration files.
+
+    Parsed files are keyed by their absolute path, size and modification
+    time, so a file is parsed again only after it changes. Results are
+    kept in memory and written (with :mod:`marshal`) to *cachedir*, which
+    allows other processes to skip parsing too. If *cachedir* is ``None``,
+    :file:`$XDG_CACHE_HOME/pycli/config` (or :file:`~/.cache/pycli/config`)
+    will be used; if it is ``False``, nothing is written to disk. Failures to
+    read or write the on-disk cache are ignored.
+    """
+    version = 1
+
+    def __init__(self, cachedir=None):
+        if cachedir is None:
+            cachedir = os.environ.get("XDG_CACHE_HOME",
+                os.path.join(os.path.expanduser("~"), ".cache"))
+            cachedir = os.path.join(cachedir, "pycli", "config")
+        self.cachedir = cachedir
+        self.memory = {}
+
+    def key(self, path):
+        """Return the cache key for *path*, calling :func:`os.stat`."""
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+    def cachefile(self, path):
+        """Return the name of the on-disk cache file for the absolute *path*."""
+        digest = sha1(path.encode("utf-8")).hexdigest()
+        return os.path.join(self.cachedir, digest)
+
+    def changed(self, path):
+        """Return True if *path* changed since it was last loaded.
+
+        A file that has appeared or disappeared counts as changed (a
+        disappeared file until it is passed to :meth:`forget`). Only
+        :func:`os.stat` is called, so this check is cheap.
+        """
+        try:
+            key = self.key(path)
+        except OSError:
+            key = None
+        cached = self.memory.get(os.path.abspath(path))
+        return (cached and cached[0]) != key
+
+    def forget(self, path):
+        """Forget *path*, which no longer exists.
+
+        Until it appears again, :meth:`changed` returns False for it.
+        """
+        self.memory.pop(os.path.abspath(path), None)
+
+    def load(self, path):
+        """Return the parsed contents of the configuration file at *path*.
+
+        See :func:`parse`.
+        """
+        key = self.key(path)
+        cached = self.memory.get(key[0])
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        data = self.read(key)
+        if data is None:
+            data = parse(path)
+            self.write(key, data)
+        self.memory[key[0]] = (key, data)
+
+        return data
+
+    def read(self, key):
+        """Return the data cached on disk for *key*, or ``None``."""
+        if not self.cachedir:
+            return None
+        try:
+            f = open(self.cachefile(key[0]), "rb")
+            try:
+                version, cachedkey, data = marshal.load(f)
+            finally:
+                f.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if (version, tuple(cachedkey)) != (self.version, key):
+            return None
+        return data
+
+    def write(self, key, data):
+        """Store *data* on disk for *key*.
+
+        The cache file is written under a temporary name and renamed into
+        place so that readers never see a partial file.
+        """
+        if not self.cachedir:
+            return
+        cachefile = self.cachefile(key[0])
+        tmp = "%s.%d" % (cachefile, os.getpid())
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            f = open(tmp, "wb")
+            try:
+                marshal.dump((self.version, key, data), f)
+            finally:
+                f.close()
+            os.rename(tmp, cachefile)
+        except (IOError, OSError, ValueError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+cache = ConfigCache()
+"""The :class:`ConfigCache` shared by applications in this process."""
@@ -150,3 +150,8 @@ class DaemonizingApp(
         Application.pre_run(self)
         CommandLineMixin.pre_run(self)
         LoggingMixin.pre_run(self)
+
+    def reset(self, **kwargs):
+        LoggingMixin.reset(self, **kwargs)
+        Application.reset(self, **kwargs)
+        CommandLineMixin.reset(self, **kwargs)
@@ -6,20 +6,44 @@
     scripttest - 2010.03.04
         LICENSE:    MIT
         URL:        http://bitbucket.org/ianb/scripttest/src/tip/scripttest/__init__.py
+
+The included modules are imported when they're first used, so importing
+this module doesn't pull scripttest (and subprocess, shutil and friends)
+into applications that never run their tests.
 """
 import os
+import sys
+
+from types import ModuleType
 
 # Add included module names to __all__.
 __all__ = ["argparse", "scripttest"]
 project = os.path.basename(os.path.dirname(__file__))
 ext = project + "._ext"
 
-name, module = None, None
-for name in __all__:
-    try:
-        module = __import__(name)
-    except ImportError:
-        module = __import__('.'.join((ext, name)), {}, {}, [ext])
-    locals()[name] = module
+class LazyModule(ModuleType):
+    """A module whose included modules are imported on first access.
+
+    The installed version of a module is preferred; the included version is
+    used if it can't be imported.
+    """
+
+    def __init__(self, module):
+        ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__.update(vars(module))
+        # Keep the original module alive; Python 2 clears the globals of
+        # modules that are garbage collected.
+        self._module = module
+
+    def __getattr__(self, name):
+        if name not in __all__:
+            raise AttributeError("module %r has no attribute %r" % (
+                self.__name__, name))
+        try:
+            module = __import__(name)
+        except ImportError:
+            module = __import__('.'.join((ext, name)), {}, {}, [ext])
+        setattr(self, name, module)
+        return module
 
-del(ext, module, name, project)
+sys.modules[__name__] = LazyModule(sys.modules[__name__])
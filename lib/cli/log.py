@@ -96,7 +96,7 @@ class CommandLineLogger(logging.Logger):
         elif level <= logging.NOTSET:
             level = logging.DEBUG
 
-        self.level = level
+        self.setLevel(level)
 
 class LoggingMixin(object):
     """A mixin for command-line applications that knows how to log.
@@ -154,7 +154,7 @@ class LoggingMixin(object):
         self.log = logging.getLogger(self.name)
         self.formatter = Formatter(fmt=self.message_format, datefmt=self.date_format)
 
-        self.log.level = self.log.default_level
+        self.log.setLevel(self.log.default_level)
 
         # If requested, make our logger the root.
         if self.root:
@@ -192,6 +192,31 @@ class LoggingMixin(object):
         if not self.log.handlers:
             self.log.addHandler(NullHandler())
 
+    def reset(self, stdout=None, stderr=None, **kwargs):
+        """Follow :attr:`stdout` or :attr:`stderr` to their new streams.
+
+        If :attr:`stream` is the application's (or the :mod:`sys` module's)
+        :attr:`stdout` or :attr:`stderr`, it is replaced by the new stream,
+        along with the stream of any handler writing to it, so that
+        :meth:`cli.app.Application.invoke` captures log messages too. Call
+        this before :meth:`cli.app.Application.reset` replaces the
+        application's streams.
+
+        .. versionadded:: 1.1.2
+        """
+        old = self.stream
+        if old is None:
+            return
+        if stdout is not None and old in (self.stdout, sys.stdout):
+            self.stream = stdout
+        elif stderr is not None and old in (self.stderr, sys.stderr):
+            self.stream = stderr
+        else:
+            return
+        for handler in self.log.handlers:
+            if isinstance(handler, StreamHandler) and handler.stream is old:
+                handler.stream = self.stream
+
 class LoggingApp(LoggingMixin, CommandLineMixin, Application):
     """A logging application.
 
@@ -216,3 +241,8 @@ class LoggingApp(LoggingMixin, CommandLineMixin, Application):
         Application.pre_run(self)
         CommandLineMixin.pre_run(self)
         LoggingMixin.pre_run(self)
+
+    def reset(self, **kwargs):
+        LoggingMixin.reset(self, **kwargs)
+        Application.reset(self, **kwargs)
+        CommandLineMixin.reset(self, **kwargs)
@@ -0,0 +1,586 @@
+"""\
+:mod:`cli.parallel` -- parallel work for applications
+-----------------------------------------------------
+
+The :mod:`cli.parallel` module spreads an application's work across
+several processes or threads. Applications usually reach it through
+:meth:`cli.app.Application.map` and
+:meth:`cli.app.Application.thread_map`.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import Queue
+import shlex
+import subprocess
+import threading
+import time
+import traceback
+
+from collections import deque
+
+__all__ = ["QueueHandler", "TaskTimeout", "ThreadPool", "chunks",
+    "exit_status", "process_map", "run_commands", "spawn", "thread_map"]
+
+POLL = 0.5
+"""How often (in seconds) blocked waits wake up so that the main thread can
+handle signals like :exc:`KeyboardInterrupt`."""
+
+clock = getattr(time, "monotonic", time.time)
+
+class QueueHandler(logging.Handler):
+    """Send log records to a queue.
+
+    Worker processes use a :class:`QueueHandler` to send their log records
+    back to the parent, where they're passed to the application's own
+    handlers. Records are made picklable first: the message is formatted
+    and any exception information is rendered as text.
+    """
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+
+    def prepare(self, record):
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(
+                    record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+def listen(queue, log):
+    """Pass records from *queue* to *log* until ``None`` is received.
+
+    If *log* is ``None``, each record goes to the logger it was created
+    with.
+    """
+    while True:
+        record = queue.get()
+        if record is None:
+            break
+        logger = log
+        if logger is None:
+            logger = logging.getLogger(record.name)
+        logger.handle(record)
+
+def init_worker(queue, name):
+    """Send the worker's log records (for the root logger and *name*) to *queue*."""
+    handlers = [QueueHandler(queue)]
+    # The root may be an application's logger (see LoggingMixin's *root*),
+    # whose parents still have the handlers inherited from the parent.
+    root = logging.getLogger()
+    root.handlers = handlers
+    root.propagate = False
+    if name is not None:
+        logger = logging.getLogger(name)
+        logger.handlers = handlers
+        logger.propagate = False
+
+def run_chunk(func, chunk):
+    """Call *func* on each item in *chunk*.
+
+    Returns (``True``, *results*) on success. If *func* raises an
+    exception, returns (``False``, *exception*) instead; the exception's
+    :attr:`remote_traceback` attribute holds the formatted traceback from the
+    worker.
+    """
+    try:
+        return True, [func(item) for item in chunk]
+    except Exception, e:
+        e.remote_traceback = traceback.format_exc()
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(e.remote_traceback)
+            e.remote_traceback = e.args[0]
+        return False, e
+
+def unpack(returned):
+    """Return the results from :func:`run_chunk`, raising its exception if it failed."""
+    ok, value = returned
+    if not ok:
+        raise value
+    return value
+
+def chunks(iterable, size):
+    """Yield lists of up to *size* items from *iterable*."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def process_map(func, iterable, workers=None, ordered=True, chunksize=None,
+        log=None):
+    """Yield the results of calling *func* on each item of *iterable*.
+
+    The calls are made in a :class:`multiprocessing.Pool` of *workers*
+    processes (by default, one per CPU), so *func* and the items must be
+    picklable. Items are sent to the workers in lists of *chunksize*; if
+    *chunksize* is ``None``, it's chosen from the length of *iterable* (if
+    known) so that each worker gets about four chunks.
+
+    *iterable* is consumed lazily: no more than two chunks per worker are
+    in flight at once. If *ordered* is True, results are yielded in the
+    order of *iterable*; otherwise, each chunk's results are yielded as
+    soon as the chunk is done.
+
+    If *func* raises an exception, the same exception is raised here (with
+    the worker's formatted traceback in its :attr:`remote_traceback`
+    attribute) and the pool is terminated. If a worker process dies (it's
+    killed, or calls :func:`os._exit`), the chunk it was running is lost,
+    so :exc:`RuntimeError` is raised instead. Log records created in the
+    workers are passed to the handlers of the *log* logger in this process
+    (or, if *log* is ``None``, to those of the logger that created them).
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = 1
+        if hasattr(iterable, "__len__"):
+            chunksize, extra = divmod(len(iterable), workers * 4)
+            chunksize = max(1, chunksize + bool(extra))
+
+    records = multiprocessing.Queue()
+    listener = threading.Thread(target=listen, args=(records, log))
+    listener.daemon = True
+    listener.start()
+
+    pool = multiprocessing.Pool(workers, init_worker,
+        (records, log and log.name or None))
+    # The pool quietly replaces a worker that dies, losing its chunk; keep
+    # the originals so that waiting can notice.
+    processes = list(pool._pool)
+    window = workers * 2
+    finished = False
+    try:
+        if ordered:
+            pending = deque()
+            for chunk in chunks(iterable, chunksize):
+                pending.append(pool.apply_async(run_chunk, (func, chunk)))
+                while len(pending) >= window:
+                    for result in unpack(wait(pending.popleft(),
+                            processes)):
+                        yield result
+            while pending:
+                for result in unpack(wait(pending.popleft(), processes)):
+                    yield result
+        else:
+            done = Queue.Queue()
+            pending = {}
+            for i, chunk in enumerate(chunks(iterable, chunksize)):
+                pending[i] = pool.apply_async(run_chunk, (func, chunk),
+                    callback=tagged(done.put, i))
+                while len(pending) >= window:
+                    for result in unpack(get(done, pending, processes)):
+                        yield result
+            while pending:
+                for result in unpack(get(done, pending, processes)):
+                    yield result
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+        records.put(None)
+        listener.join()
+
+def wait(result, processes=()):
+    """Return the value of the :class:`multiprocessing.pool.AsyncResult` *result*.
+
+    While waiting, the worker *processes* are checked with :func:`check`.
+    """
+    while not result.ready():
+        result.wait(POLL)
+        if not result.ready():
+            check(processes)
+    return result.get()
+
+def check(processes):
+    """Raise :exc:`RuntimeError` if any of the pool's *processes* has exited."""
+    for process in processes:
+        if process.exitcode is not None:
+            raise RuntimeError("worker process %s exited with status %s" %
+                (process.pid, process.exitcode))
+
+def tagged(put, tag):
+    """Return a callback that calls *put* with (*tag*, *value*)."""
+    return lambda value: put((tag, value))
+
+def get(results, pending, processes=()):
+    """Return the next value from the :class:`Queue.Queue` *results*.
+
+    *pending* maps tags to the :class:`multiprocessing.pool.AsyncResult`
+    objects whose :func:`tagged` callbacks put (*tag*, *value*) on
+    *results*; the finished one is removed. A task that failed before its
+    function could run (because its arguments couldn't be pickled, for
+    example) never calls back, so its exception is raised here instead;
+    so is a dead worker among *processes* (see :func:`check`).
+    """
+    while True:
+        try:
+            tag, value = results.get(True, POLL)
+        except Queue.Empty:
+            for result in pending.values():
+                if result.ready() and not result.successful():
+                    result.get()
+            check(processes)
+            continue
+        del pending[tag]
+        return value
+
+class TaskTimeout(Exception):
+    """Raised when a task runs for longer than its timeout.
+
+    The :attr:`item` attribute holds the item the task was working on.
+    """
+
+    def __init__(self, item, timeout):
+        self.item = item
+        self.timeout = timeout
+        message = "Task timed out after %s seconds: %r" % (timeout, item)
+        super(TaskTimeout, self).__init__(message)
+
+class Task(object):
+    """A call of *func* on *item*, run by a :class:`ThreadPool`.
+
+    When the task is finished (or cancelled), it is put on the *done* queue
+    (if not ``None``).
+    """
+    started = None
+    result = None
+    error = None
+    cancelled = False
+
+    def __init__(self, func, item, done=None):
+        self.func = func
+        self.item = item
+        self.done = done
+        self.finished = threading.Event()
+
+    def run(self):
+        self.started = clock()
+        try:
+            self.result = self.func(self.item)
+        except Exception, e:
+            self.error = e
+        self.finish()
+
+    def cancel(self):
+        self.cancelled = True
+        self.finish()
+
+    def finish(self):
+        self.finished.set()
+        if self.done is not None:
+            self.done.put(self)
+
+    def expired(self, timeout, now=None):
+        """Return True if the task has run for more than *timeout* seconds."""
+        if timeout is None or self.started is None or self.finished.is_set():
+            return False
+        if now is None:
+            now = clock()
+        return now - self.started > timeout
+
+    def get(self, timeout=None):
+        """Wait for the task to finish and return its result.
+
+        If the task raised an exception, raise it again. If the task runs
+        for longer than *timeout* seconds, raise :class:`TaskTimeout`.
+        """
+        while not self.finished.is_set():
+            if self.expired(timeout):
+                raise TaskTimeout(self.item, timeout)
+            self.finished.wait(POLL)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class ThreadPool(object):
+    """A pool of *workers* daemon threads.
+
+    Tasks are queued with :meth:`submit` and run in order by the first
+    free thread. Because the threads are daemons, a pool that is still busy
+    never keeps the interpreter from exiting.
+    """
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.tasks = Queue.Queue()
+        self.cancelled = False
+        self.closed = False
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            if self.cancelled:
+                task.cancel()
+            else:
+                task.run()
+
+    def submit(self, func, item, done=None):
+        """Queue a call of *func* on *item*, returning its :class:`Task`."""
+        task = Task(func, item, done)
+        self.tasks.put(task)
+        return task
+
+    def shutdown(self, cancel=False):
+        """Stop the pool's threads.
+
+        If *cancel* is False, wait for all of the queued tasks to finish.
+        Otherwise, cancel the queued tasks that haven't started yet and
+        return without waiting for the running ones. Calling
+        :meth:`shutdown` again has no effect.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if cancel:
+            self.cancelled = True
+            while True:
+                try:
+                    task = self.tasks.get_nowait()
+                except Queue.Empty:
+                    break
+                if task is not None:
+                    task.cancel()
+        for thread in self.threads:
+            self.tasks.put(None)
+        if not cancel:
+            for thread in self.threads:
+                thread.join()
+
+def thread_map(func, iterable, workers=8, ordered=True, timeout=None,
+        pool=None):
+    """Yield the results of calling *func* on each item of *iterable*.
+
+    The calls are made by a :class:`ThreadPool` of *workers* threads (or by
+    *pool*, if it isn't ``None``), which suits functions that mostly wait on
+    disks or sockets. *iterable* is consumed lazily: no more than two items
+    per worker are in flight at once. If *ordered* is True, results are
+    yielded in the order of *iterable*; otherwise, they're yielded as soon
+    as they're ready.
+
+    If *func* raises an exception, the same exception is raised here. If a
+    call runs for more than *timeout* seconds, :class:`TaskTimeout` is raised
+    (the call itself can't be interrupted, but its result is abandoned).
+    Either way, or if the generator is closed early, the pool's remaining
+    tasks are cancelled.
+    """
+    if pool is None:
+        pool = ThreadPool(workers)
+    window = pool.workers * 2
+    done = Queue.Queue()
+    finished = False
+    try:
+        if ordered:
+            pending = deque()
+            for item in iterable:
+                pending.append(pool.submit(func, item))
+                while len(pending) >= window:
+                    yield pending.popleft().get(timeout)
+            while pending:
+                yield pending.popleft().get(timeout)
+        else:
+            pending = set()
+            for item in iterable:
+                pending.add(pool.submit(func, item, done))
+                while len(pending) >= window:
+                    yield next_done(done, pending, timeout)
+            while pending:
+                yield next_done(done, pending, timeout)
+        finished = True
+    finally:
+        pool.shutdown(cancel=not finished)
+
+def next_done(done, pending, timeout):
+    """Return the result of the next *pending* task to be put on *done*."""
+    while True:
+        try:
+            task = done.get(True, POLL)
+        except Queue.Empty:
+            now = clock()
+            for task in pending:
+                if task.expired(timeout, now):
+                    raise TaskTimeout(task.item, timeout)
+            continue
+        pending.discard(task)
+        return task.get()
+
+def spawn(args):
+    """Start the command *args* with its output connected to pipes.
+
+    Return a tuple of a function that waits for the command and returns its
+    exit status (negative if it was killed by a signal, like
+    :attr:`subprocess.Popen.returncode`) and binary file objects connected to
+    its standard output and standard error. The command's standard input is
+    :data:`os.devnull`.
+
+    Where :func:`os.posix_spawnp` is available, it's used instead of
+    :mod:`subprocess`, which forks: copying the page tables of a large
+    parent is often the biggest part of starting a small child.
+    """
+    if not hasattr(os, "posix_spawnp"):
+        devnull = open(os.devnull, "rb")
+        try:
+            child = subprocess.Popen(args, stdin=devnull,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                close_fds=True)
+        finally:
+            devnull.close()
+        return child.wait, child.stdout, child.stderr
+
+    out, out_w = os.pipe()
+    err, err_w = os.pipe()
+    try:
+        pid = os.posix_spawnp(args[0], args, os.environ, file_actions=[
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+            (os.POSIX_SPAWN_DUP2, out_w, 1),
+            (os.POSIX_SPAWN_DUP2, err_w, 2)])
+    except:
+        os.close(out)
+        os.close(err)
+        raise
+    finally:
+        os.close(out_w)
+        os.close(err_w)
+
+    def wait():
+        pid_, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
+
+    return wait, os.fdopen(out, "rb"), os.fdopen(err, "rb")
+
+def copylines(source, stream, prefix, lock):
+    """Copy the lines of the binary file *source* to *stream*.
+
+    Each line is prefixed with *prefix* and written while holding *lock*,
+    so that lines from concurrent commands aren't interleaved.
+    """
+    buffer = getattr(stream, "buffer", None)
+    encoding = getattr(stream, "encoding", None) or "utf-8"
+    if bytes is str:
+        buffer = stream
+    prefix = prefix.encode(encoding)
+    try:
+        for line in iter(source.readline, b""):
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            with lock:
+                if buffer is None:
+                    stream.write((prefix + line).decode(encoding, "replace"))
+                else:
+                    if buffer is not stream:
+                        stream.flush()
+                    buffer.write(prefix + line)
+    finally:
+        source.close()
+
+def run_commands(commands, workers=4, stdout=None, stderr=None,
+        prefix="[%(index)d] "):
+    """Run each of *commands*, at most *workers* at a time.
+
+    Commands are lists of arguments or strings (which are split with
+    :func:`shlex.split`) and are started with :func:`spawn`. Their output
+    is copied line by line to *stdout* and *stderr* (by default,
+    :data:`sys.stdout` and :data:`sys.stderr`) as it arrives, so a command
+    that fills a pipe never blocks. Each line starts with *prefix*, which is
+    formatted with the command's *index* in *commands*, its *name* and its
+    *command* line; if *prefix* is ``None``, lines are copied unchanged.
+
+    Return a list of the commands' exit statuses, in the order of
+    *commands*. A command that can't be started gets the shell's status of
+    127 and an error message on *stderr*.
+    """
+    import sys
+
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+    lock = threading.Lock()
+
+    def run(item):
+        index, args = item
+        if isinstance(args, basestring):
+            args = shlex.split(args)
+        args = list(args)
+        line = " ".join(args)
+        label = ""
+        if prefix is not None:
+            label = prefix % dict(index=index, name=os.path.basename(args[0]),
+                command=line)
+        try:
+            wait, out, err = spawn(args)
+        except OSError, e:
+            with lock:
+                stderr.write("%scan't run %r: %s\n" % (label, line, e))
+            return 127
+        thread = threading.Thread(target=copylines,
+            args=(err, stderr, label, lock))
+        thread.daemon = True
+        thread.start()
+        copylines(out, stdout, label, lock)
+        thread.join()
+        return wait()
+
+    return list(thread_map(run, enumerate(commands), workers=workers))
+
+def exit_status(statuses):
+    """Return the highest of *statuses* as a process exit status.
+
+    Negative statuses (commands killed by a signal) count as 128 plus the
+    signal number, like they do in the shell. If *statuses* is empty,
+    return 0.
+    """
+    highest = 0
+    for status in statuses:
+        if status < 0:
+            status = 128 - status
+        highest = max(highest, status)
+    return highest
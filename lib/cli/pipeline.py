@@ -0,0 +1,338 @@
+"""\
+:mod:`cli.pipeline` -- staged pipeline applications
+---------------------------------------------------
+
+Many tools are shaped like ``read | parse | transform | write`` shell
+pipelines. A :class:`PipelineApp` runs such a pipeline inside a single
+process, handing items between stages through bounded queues instead of
+serializing them through pipes.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import pickle
+import Queue
+import threading
+
+from cli.app import CommandLineMixin, Application
+from cli.log import LoggingMixin
+from cli.parallel import POLL, clock
+
+__all__ = ["PipelineApp", "PipelineMixin", "Stage"]
+
+class End(object):
+    """Marks the end of a stage's output."""
+    pass
+
+class Failure(object):
+    """Carries an exception raised by a stage to the next one."""
+
+    def __init__(self, error):
+        try:
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(repr(error))
+        self.error = error
+
+def work(func, input, output):
+    """Run the generator function *func* in a worker process.
+
+    Items are read from the *input* queue until an :class:`End` is
+    received; results are put on the *output* queue, followed by an
+    :class:`End` (or a :class:`Failure`, if *func* raised an exception).
+    """
+    def items():
+        while True:
+            item = input.get()
+            if isinstance(item, End):
+                break
+            yield item
+    try:
+        for item in func(items()):
+            output.put(item)
+    except Exception, e:
+        output.put(Failure(e))
+    output.put(End())
+
+class Stage(object):
+    """A stage in a pipeline.
+
+    *func* is a generator function: it receives an iterator over the
+    previous stage's output (or the pipeline's source) and yields its own
+    output. *mode* determines where *func* runs:
+
+    ``"inline"``
+        in the thread consuming the pipeline's output, with no queue;
+
+    ``"thread"``
+        in its own thread;
+
+    ``"process"``
+        in its own process (so *func* and the items must be picklable).
+
+    Threaded and process-based stages put their output on a queue holding
+    at most *maxsize* items; when it's full, the stage waits for the next
+    stage to catch up.
+
+    While the pipeline runs, each stage counts the items it receives
+    (:attr:`items_in`) and yields (:attr:`items_out`) and samples the depth
+    of its output queue (:attr:`max_depth`, :attr:`mean_depth`).
+    """
+
+    def __init__(self, func, mode="inline", maxsize=1024):
+        if mode not in ("inline", "thread", "process"):
+            raise ValueError("unknown stage mode: %r" % mode)
+        self.func = func
+        self.mode = mode
+        self.maxsize = maxsize
+        self.items_in = 0
+        self.items_out = 0
+        self.depths = 0
+        self.samples = 0
+        self.max_depth = 0
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.error = None
+        self.queue = None
+        self.process = None
+
+    @property
+    def name(self):
+        return getattr(self.func, "__name__", repr(self.func))
+
+    @property
+    def mean_depth(self):
+        if not self.samples:
+            return 0.0
+        return float(self.depths) / self.samples
+
+    @property
+    def elapsed(self):
+        """Seconds between the stage's first and last items."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or clock()) - self.started
+
+    def count(self, items):
+        for item in items:
+            self.items_in += 1
+            yield item
+
+    def sample(self, queue):
+        try:
+            depth = queue.qsize()
+        except NotImplementedError:
+            return
+        self.depths += depth
+        self.samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def put(self, queue, item):
+        """Put *item* on *queue*, giving up if the stage is cancelled."""
+        while not self.cancelled:
+            try:
+                queue.put(item, True, POLL)
+            except Queue.Full:
+                continue
+            self.sample(queue)
+            return True
+        return False
+
+    def start(self, items):
+        """Start the stage, returning an iterator over its output."""
+        self.started = clock()
+        if self.mode == "inline":
+            return self.inline(items)
+
+        if self.mode == "thread":
+            self.queue = Queue.Queue(self.maxsize)
+            target, args = self.produce, (items,)
+        else:
+            import multiprocessing
+            input = multiprocessing.Queue(self.maxsize)
+            self.queue = multiprocessing.Queue(self.maxsize)
+            self.process = multiprocessing.Process(target=work,
+                args=(self.func, input, self.queue))
+            self.process.daemon = True
+            self.process.start()
+            target, args = self.feed, (items, input)
+
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return self.consume()
+
+    def inline(self, items):
+        for item in self.func(self.count(items)):
+            self.items_out += 1
+            yield item
+        self.finished = clock()
+
+    def produce(self, items):
+        try:
+            for item in self.func(self.count(items)):
+                if not self.put(self.queue, item):
+                    return
+        except Exception, e:
+            self.put(self.queue, Failure(e))
+        self.put(self.queue, End())
+
+    def feed(self, items, input):
+        try:
+            for item in self.count(items):
+                if not self.put(input, item):
+                    return
+        except Exception, e:
+            self.error = e
+        self.put(input, End())
+
+    def consume(self):
+        dead = False
+        while True:
+            try:
+                item = self.queue.get(True, POLL)
+            except Queue.Empty:
+                # A process that dies without sending End (killed, or
+                # os._exit) never will; give its last items one more poll.
+                if dead:
+                    exitcode = self.process.exitcode
+                    self.stop(cancel=True)
+                    raise RuntimeError("stage %s exited with status %s" %
+                        (self.name, exitcode))
+                dead = (self.process is not None and
+                    not self.process.is_alive())
+                continue
+            if isinstance(item, End):
+                break
+            elif isinstance(item, Failure):
+                self.stop(cancel=True)
+                raise item.error
+            self.items_out += 1
+            yield item
+
+        self.finished = clock()
+        self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, cancel=False):
+        """Stop the stage's thread or process.
+
+        If *cancel* is True, the stage stops producing output and its
+        process (if any) is terminated.
+        """
+        if cancel:
+            self.cancelled = True
+        if self.process is not None:
+            if cancel:
+                self.process.terminate()
+            self.process.join()
+            self.process = None
+
+class PipelineMixin(object):
+    """A mixin for applications built from a pipeline of stages.
+
+    :attr:`main` declares the stages with :meth:`add_stage` and then
+    iterates over the output of :meth:`run_pipeline`. For example::
+
+        @cli.pipeline.PipelineApp
+        def tool(app):
+            app.add_stage(parse, mode="thread")
+            app.add_stage(transform, mode="process")
+            for record in app.run_pipeline(app.stdin):
+                app.stdout.write(record)
+
+    The :class:`PipelineMixin` requires :class:`cli.log.LoggingMixin`:
+    when the application finishes, each stage's throughput and queue depth
+    are logged at the ``INFO`` level. Arguments are:
+
+    *queue_size* is the default maximum number of items waiting between two
+    stages.
+    """
+
+    def __init__(self, queue_size=1024, **kwargs):
+        self.queue_size = queue_size
+        self.stages = []
+
+    def add_stage(self, func, mode="inline", maxsize=None):
+        """Add a :class:`Stage` to the end of the pipeline, returning it.
+
+        *func*, *mode* and *maxsize* are passed to :class:`Stage`; if
+        *maxsize* is ``None``, :attr:`queue_size` is used.
+        """
+        if maxsize is None:
+            maxsize = self.queue_size
+        stage = Stage(func, mode=mode, maxsize=maxsize)
+        self.stages.append(stage)
+        return stage
+
+    def run_pipeline(self, source):
+        """Start the pipeline, returning an iterator over the last stage's output.
+
+        *source* is an iterable that provides the first stage's input. If a
+        stage raises an exception, it is raised again here and the other
+        stages are stopped. Stages that are still running when the
+        application finishes are cancelled.
+        """
+        self.add_cleanup(self.stop_pipeline)
+        items = source
+        for stage in self.stages:
+            items = stage.start(items)
+        return items
+
+    def stop_pipeline(self):
+        """Cancel any stages still running and log their metrics."""
+        for stage in self.stages:
+            stage.stop(cancel=True)
+            self.log.info("stage %s (%s): %d in, %d out, %.1f items/s, "
+                "queue depth %.1f mean, %d max", stage.name, stage.mode,
+                stage.items_in, stage.items_out,
+                stage.items_out / (stage.elapsed or 1e-9),
+                stage.mean_depth, stage.max_depth)
+
+class PipelineApp(PipelineMixin, LoggingMixin, CommandLineMixin, Application):
+    """A pipeline application.
+
+    This class simply glues together the base :class:`cli.app.Application`,
+    :class:`PipelineMixin` and other mixins that provide necessary
+    functionality.
+    """
+
+    def __init__(self, main=None, **kwargs):
+        PipelineMixin.__init__(self, **kwargs)
+        LoggingMixin.__init__(self, **kwargs)
+        CommandLineMixin.__init__(self, **kwargs)
+        Application.__init__(self, main, **kwargs)
+
+    def setup(self):
+        Application.setup(self)
+        CommandLineMixin.setup(self)
+        LoggingMixin.setup(self)
+
+    def pre_run(self):
+        Application.pre_run(self)
+        CommandLineMixin.pre_run(self)
+        LoggingMixin.pre_run(self)
+
+    def reset(self, **kwargs):
+        LoggingMixin.reset(self, **kwargs)
+        Application.reset(self, **kwargs)
+        CommandLineMixin.reset(self, **kwargs)
+        self.stages = []
@@ -26,26 +26,9 @@ OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
 import pstats
 
-__all__ = ["Profiler", "Stats", "fmtsec"]
-
-class update_wrapper(object):
-    assignments = ('__module__', '__name__', '__doc__')
-    updates = ('__dict__',)
+from cli.util import update_wrapper
 
-    def __call__(self, wrapper, wrapped):
-        """Update callable wrapper so it looks like callable wrapped.
-    
-        Based on functools.update_wrapper (used only for compatibility on
-        Python <= 2.5).
-        """
-        for attr in self.assignments:
-            setattr(wrapper, attr, getattr(wrapped, attr))
-        for attr in self.updates:
-            getattr(wrapper, attr).update(getattr(wrapper, attr, {}))
-    
-        return wrapper
-
-update_wrapper = update_wrapper()
+__all__ = ["Profiler", "Stats", "fmtsec"]
 
 def fmtsec(seconds):
     if seconds < 0:
@@ -0,0 +1,173 @@
+"""\
+:mod:`cli.repl` -- interactive command lines
+--------------------------------------------
+
+Running a small command line application many times in a row pays for
+starting the interpreter, importing modules and building the argument
+parser every time. :meth:`cli.app.CommandLineMixin.repl` pays once and
+then reads command lines interactively, running the application for each
+one in the same process. Anything the application keeps between runs
+(memoized functions, parsed configuration files) stays warm::
+
+    @cli.app.CommandLineApp
+    def myapp(app):
+        ...
+
+    if __name__ == "__main__":
+        myapp.repl()
+
+Each line is parsed as the application's command line::
+
+    $ python myapp.py
+    myapp> --count 3 input.txt
+    ...
+    myapp> ^D
+
+.. versionadded:: 1.1.2
+"""
+
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+
+import cmd
+import glob
+import os
+import shlex
+
+from cli.util import StringIO
+
+__all__ = ["Shell"]
+
+class Shell(cmd.Cmd):
+    """An interactive shell that runs *app* once per command line.
+
+    Each line is split like a shell would and passed to
+    :meth:`cli.app.Application.execute` (with the name of the application
+    prepended), so it's parsed by the application's own parser into fresh
+    :attr:`params`. Output goes to the application's :attr:`stdout` and
+    :attr:`stderr`; its :attr:`stdin` is empty. Blank lines and lines
+    starting with ``#`` are ignored, and ``exit``, ``quit`` or the end of
+    the input leave the shell. Interrupting a command returns to the
+    prompt.
+
+    If *stdin* is ``None``, lines are read with :mod:`readline` (where
+    available): completion offers the parser's options, the choices of the
+    option being completed and file names, and the lines entered are kept
+    in the *history* file (if it isn't ``None``). :attr:`status` is the
+    status of the last command.
+    """
+
+    def __init__(self, app, prompt=None, history=None, stdin=None,
+            stdout=None):
+        cmd.Cmd.__init__(self, stdin=stdin, stdout=stdout)
+        self.app = app
+        self.prompt = prompt or "%s> " % app.name
+        self.history = history
+        self.use_rawinput = stdin is None
+        self.status = 0
+
+    def readline(self):
+        """Return the :mod:`readline` module, or ``None`` if it isn't used."""
+        if not self.use_rawinput:
+            return None
+        try:
+            import readline
+        except ImportError:
+            return None
+        return readline
+
+    def cmdloop(self, intro=None):
+        readline = self.readline()
+        if readline is not None:
+            readline.set_completer_delims(" \t\n")
+            if self.history is not None:
+                try:
+                    readline.read_history_file(self.history)
+                except IOError:
+                    pass
+        try:
+            while True:
+                try:
+                    return cmd.Cmd.cmdloop(self, intro)
+                except KeyboardInterrupt:
+                    self.stdout.write("\n")
+                    self.status = 130
+                    intro = ""
+        finally:
+            if readline is not None and self.history is not None:
+                self.save_history(readline)
+
+    def save_history(self, readline):
+        directory = os.path.dirname(os.path.abspath(self.history))
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            readline.write_history_file(self.history)
+        except (IOError, OSError):
+            pass
+
+    def emptyline(self):
+        # Unlike cmd.Cmd, don't repeat the last command.
+        return False
+
+    def onecmd(self, line):
+        line = line.strip()
+        if line == "EOF":
+            self.stdout.write("\n")
+            return True
+        if line in ("exit", "quit"):
+            return True
+        if not line or line.startswith("#"):
+            return False
+        try:
+            args = shlex.split(line)
+        except ValueError, e:
+            self.app.stderr.write(u"%s: %s\n" % (self.app.name, e))
+            self.status = 2
+            return False
+        self.status = self.app.execute([self.app.argv[0]] + args, StringIO(),
+            self.app.stdout, self.app.stderr)
+        return False
+
+    def completenames(self, text, line, begidx, endidx):
+        return self.completedefault(text, line, begidx, endidx)
+
+    def completedefault(self, text, line, begidx, endidx):
+        parser = self.app.argparser
+        words = line[:begidx].split()
+        options = {}
+        for action in parser._actions:
+            for option in action.option_strings:
+                options[option] = action
+        action = words and options.get(words[-1])
+        if action and action.nargs != 0 and action.choices:
+            return [str(choice) for choice in action.choices
+                if str(choice).startswith(text)]
+        if text and text[0] in parser.prefix_chars:
+            return sorted(option for option in options
+                if option.startswith(text))
+        matches = []
+        for action in parser._actions:
+            if not action.option_strings and action.choices:
+                matches.extend(str(choice) for choice in action.choices
+                    if str(choice).startswith(text))
+        for path in sorted(glob.glob(os.path.expanduser(text) + "*")):
+            if os.path.isdir(path):
+                path += os.sep
+            matches.append(path)
+        return matches
@@ -0,0 +1,809 @@
+"""\
+:mod:`cli.streams` -- efficient input and output
+------------------------------------------------
+
+The :mod:`cli.streams` module collects helpers for applications that
+move a lot of data through their standard input and output.
+
+.. versionadded:: 1.1.2
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import codecs
+import errno
+import io
+import os
+import Queue
+import stat
+import sys
+import tempfile
+import threading
+
+from itertools import chain
+
+__all__ = ["AtomicFile", "InputFile", "OutputFiles", "OutputWriter",
+    "PrefetchReader", "copyfile", "iterrecords", "splitstream"]
+
+BUFSIZE = 1 << 20
+"""The default size (in bytes) of reads from input streams."""
+
+CHUNKSIZE = 1 << 16
+"""The default size (in bytes) of the chunks :func:`iterrecords` splits;
+small enough that a chunk and its records stay in the CPU cache."""
+
+PREFETCH = 64 << 20
+"""The default number of bytes a :class:`PrefetchReader` may hold in memory."""
+
+WRITESIZE = 1 << 16
+"""The default number of bytes or characters an :class:`OutputWriter`
+buffers before writing to its stream."""
+
+SYNC = ("file", "batch", None)
+"""The policies :class:`OutputFiles` accepts for getting files to disk."""
+
+BINARY = bytes is not str
+"""True if bytes and text are different types (as on Python 3)."""
+
+try:
+    codecs.lookup_error("surrogateescape")
+    ERRORS = "surrogateescape"
+except LookupError:
+    ERRORS = "strict"
+
+def splitstream(stream, sep="\n", size=BUFSIZE, encoding=None):
+    """Return an iterator over the *sep*-delimited records in *stream*.
+
+    *stream* is read in chunks of up to *size* bytes, and each chunk is
+    split in one pass; only a record that straddles two chunks is copied
+    more than once. Records are available as soon as the chunk containing
+    them has been read, so an unbounded stream can be consumed lazily. The
+    separators themselves are dropped, as is an empty final record.
+
+    If *encoding* is not ``None``, each chunk is decoded before it is split
+    (with the ``surrogateescape`` error handler where available, so that
+    arbitrary bytes in file names survive the trip). If *stream* is a text
+    stream wrapping a binary buffer (like :data:`sys.stdin` on Python 3), the
+    buffer is read directly and *encoding* defaults to the file system
+    encoding.
+    """
+    return chain.from_iterable(splitchunks(stream, sep, size, encoding))
+
+def splitchunks(stream, sep, size, encoding):
+    """Yield a list of the records in each chunk of *stream*.
+
+    See :func:`splitstream`, which flattens the lists (without paying for a
+    Python loop per record).
+    """
+    raw = getattr(stream, "buffer", stream)
+    read = getattr(raw, "read1", raw.read)
+    if raw is not stream and encoding is None:
+        encoding = sys.getfilesystemencoding()
+    decoder = None
+    if encoding is not None:
+        decoder = codecs.getincrementaldecoder(encoding)(ERRORS)
+
+    tail = None
+    while True:
+        data = read(size)
+        chunk = data
+        if decoder is not None:
+            chunk = decoder.decode(data, not data)
+        elif isinstance(chunk, bytes) and not isinstance(sep, bytes):
+            sep = sep.encode("ascii")
+        elif BINARY and isinstance(sep, bytes) and \
+                not isinstance(chunk, bytes):
+            sep = sep.decode("ascii")
+
+        if chunk:
+            if tail:
+                chunk = tail + chunk
+            records = chunk.split(sep)
+            tail = records.pop()
+            yield records
+
+        if not data:
+            break
+
+    if tail:
+        yield [tail]
+
+def iterrecords(source, sep=None, size=CHUNKSIZE, mmap=True):
+    """Return an iterator over the *sep*-delimited records in *source*.
+
+    *source* is a binary stream, a text stream wrapping a binary buffer (like
+    :data:`sys.stdin` on Python 3) or the path of a file. Records are bytes
+    (or text, for text streams without a binary buffer). *sep* defaults to
+    a newline. Like :func:`splitstream`, the separators are dropped, as is
+    an empty final record.
+
+    If *mmap* is True and *source* is a regular file, the file is mapped
+    into memory (and the kernel is told that it will be read sequentially)
+    instead of read. Either way, *source* is split in chunks of about *size*
+    bytes, one call to :meth:`bytes.split` per chunk, which is much cheaper
+    than finding and slicing out each record in Python.
+    """
+    if sep is None:
+        sep = b"\n"
+    elif not sep:
+        raise ValueError("empty separator")
+    return chain.from_iterable(recordchunks(source, sep, size, mmap))
+
+def recordchunks(source, sep, size, mmap):
+    if isinstance(source, basestring):
+        stream = open(source, "rb")
+        try:
+            for chunk in recordchunks(stream, sep, size, mmap):
+                yield chunk
+        finally:
+            stream.close()
+        return
+
+    raw = getattr(source, "buffer", source)
+    chunks = None
+    if mmap:
+        chunks = mappedchunks(raw, sep, size)
+    if chunks is None:
+        chunks = splitchunks(raw, sep, size, None)
+    for chunk in chunks:
+        yield chunk
+
+def mappedchunks(raw, sep, size):
+    """Return an iterator over the chunks of *raw* if it can be mapped."""
+    import mmap
+    try:
+        fd = raw.fileno()
+        info = os.fstat(fd)
+        offset = raw.tell()
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+    if not stat.S_ISREG(info.st_mode) or info.st_size <= offset:
+        return None
+    mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return splitmapped(raw, mapped, offset, sep, size)
+
+def splitmapped(raw, mapped, start, sep, size):
+    end = len(mapped)
+    try:
+        while start < end:
+            # Cut the chunk after its last complete record.
+            cut = end
+            if start + size < end:
+                cut = mapped.rfind(sep, start, start + size)
+                if cut < 0:
+                    cut = mapped.find(sep, start + size)
+                if cut < 0:
+                    cut = end
+            records = mapped[start:cut].split(sep)
+            if cut == end and not records[-1]:
+                records.pop()
+            start = cut + len(sep)
+            yield records
+        raw.seek(end)
+    finally:
+        mapped.close()
+
+def copyfile(source, output, offset=0, count=None, size=BUFSIZE):
+    """Copy *count* bytes of *source*, starting at *offset*, to *output*.
+
+    *source* is a binary file object or the path of a file; if *count* is
+    ``None``, everything up to the end of *source* is copied. *offset* is
+    counted from the current position of *source*, and *source* is left
+    positioned just past the copied bytes. *output* is flushed first and
+    the number of bytes copied is returned.
+
+    When both have file descriptors, the kernel copies the data without
+    passing it through Python: with :func:`os.sendfile` if *source* is a
+    regular file or :func:`os.splice` if it is a pipe (where available).
+    Otherwise, *source* is read in chunks of *size* bytes which are written
+    to *output* (through its binary buffer, if it has one, or decoded, if
+    it is a text stream without one).
+    """
+    if isinstance(source, basestring):
+        stream = open(source, "rb")
+        try:
+            return copyfile(stream, output, offset, count, size)
+        finally:
+            stream.close()
+
+    output.flush()
+    copied = copyfd(source, output, offset, count, size)
+    if copied is None:
+        copied = copybuffered(source, output, offset, count, size)
+    return copied
+
+def copyfd(source, output, offset, count, size):
+    """Copy between file descriptors, or return ``None`` if that's not possible."""
+    try:
+        infd = source.fileno()
+        outfd = output.fileno()
+        info = os.fstat(infd)
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+
+    start = None
+    if stat.S_ISREG(info.st_mode) and hasattr(os, "sendfile"):
+        # sendfile takes an absolute offset and leaves the descriptor alone,
+        # so start at the stream's position and move it past the copy.
+        start = source.tell() + offset
+        if count is None:
+            count = max(info.st_size - start, 0)
+        def copy(copied, n):
+            return os.sendfile(outfd, infd, start + copied, n)
+    elif stat.S_ISFIFO(info.st_mode) and hasattr(os, "splice") and not offset:
+        def copy(copied, n):
+            return os.splice(infd, outfd, n)
+    else:
+        return None
+
+    copied = 0
+    while count is None or copied < count:
+        n = size
+        if count is not None:
+            n = min(size, count - copied)
+        try:
+            sent = copy(copied, n)
+        except OSError, e:
+            # Some systems only send to sockets or splice to pipes.
+            if copied or e.errno not in (errno.EINVAL, errno.ENOSYS,
+                    errno.ENOTSOCK, errno.EOPNOTSUPP):
+                raise
+            return None
+        if not sent:
+            break
+        copied += sent
+    if start is not None:
+        source.seek(start + copied)
+    return copied
+
+def copybuffered(source, output, offset, count, size):
+    source = getattr(source, "buffer", source)
+    if offset:
+        source.seek(offset, 1)
+    write = output.write
+    raw = getattr(output, "buffer", None)
+    if raw is not None:
+        write = raw.write
+    elif BINARY and isinstance(output, io.TextIOBase):
+        encoding = getattr(output, "encoding", None) or "utf-8"
+        decoder = codecs.getincrementaldecoder(encoding)(ERRORS)
+        def write(data):
+            output.write(decoder.decode(data))
+
+    copied = 0
+    while count is None or copied < count:
+        n = size
+        if count is not None:
+            n = min(size, count - copied)
+        data = source.read(n)
+        if not data:
+            break
+        write(data)
+        copied += len(data)
+    if raw is not None:
+        raw.flush()
+    return copied
+
+class InputFile(object):
+    """A file returned by a :class:`PrefetchReader`.
+
+    *name* is the path the file was opened with and *stream* is a binary
+    file object holding its contents (in memory, if the file was
+    prefetched). Iterating over an :class:`InputFile` yields its lines.
+    """
+
+    def __init__(self, name, stream):
+        self.name = name
+        self.stream = stream
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def records(self, sep=b"\n"):
+        """Return an iterator over the file's records (see :func:`iterrecords`)."""
+        return iterrecords(self.stream, sep)
+
+    def close(self):
+        self.stream.close()
+
+class PrefetchReader(object):
+    """Read the files named by *paths* in order, prefetching the next ones.
+
+    Iterating over a :class:`PrefetchReader` yields an :class:`InputFile`
+    for each path. Meanwhile, a background thread opens up to *ahead* of
+    the following files, asks the kernel to start reading them (with
+    :func:`os.posix_fadvise`, where available) and reads them into memory,
+    so that the consumer rarely waits on a disk. No more than *budget*
+    bytes are held in memory at once; files that don't fit are handed over
+    open but unread. A file is released when the consumer moves on to the
+    next one.
+
+    A path of ``-`` means *stdin*. Errors opening or reading a file are
+    raised when the consumer reaches it; errors raised while iterating
+    over *paths* are raised after the files before them.
+    """
+
+    def __init__(self, paths, ahead=2, budget=PREFETCH, stdin=None):
+        self.paths = paths
+        self.ahead = ahead
+        self.budget = budget
+        self.stdin = stdin or sys.stdin
+        self.used = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.entries = Queue.Queue(ahead)
+        self.thread = None
+
+    def __iter__(self):
+        from cli.parallel import POLL
+
+        self.thread = threading.Thread(target=self.prefetch)
+        self.thread.daemon = True
+        self.thread.start()
+        while True:
+            try:
+                entry = self.entries.get(True, POLL)
+            except Queue.Empty:
+                if self.thread.is_alive() or not self.entries.empty():
+                    continue
+                raise RuntimeError("prefetch thread exited unexpectedly")
+            if entry is None:
+                break
+            name, stream, size, error = entry
+            if error is not None:
+                raise error
+            current = InputFile(name, stream)
+            try:
+                yield current
+            finally:
+                if name != "-":
+                    current.close()
+                self.release(size)
+
+    def prefetch(self):
+        try:
+            for path in self.paths:
+                if path == "-":
+                    entry = (path, getattr(self.stdin, "buffer", self.stdin),
+                        0, None)
+                else:
+                    entry = self.load(path)
+                if not self.put(entry):
+                    self.discard(entry)
+                    return
+        except Exception, e:
+            # Hand anything else (from *paths* itself, say) to the consumer
+            # rather than letting it die with the thread.
+            self.put((None, None, 0, e))
+            return
+        self.put(None)
+
+    def load(self, path):
+        """Return an entry for *path*, reading it if it fits the budget."""
+        try:
+            stream = open(path, "rb")
+            fd = stream.fileno()
+            size = os.fstat(fd).st_size
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            if size > self.budget or not self.reserve(size):
+                return path, stream, 0, None
+            try:
+                data = stream.read()
+            finally:
+                stream.close()
+            return path, io.BytesIO(data), size, None
+        except EnvironmentError, e:
+            return path, None, 0, e
+
+    def reserve(self, size):
+        """Wait until *size* bytes fit in the budget and take them."""
+        from cli.parallel import POLL
+
+        with self.condition:
+            while self.used + size > self.budget:
+                if self.closed:
+                    return False
+                self.condition.wait(POLL)
+            self.used += size
+        return True
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify()
+
+    def put(self, entry):
+        from cli.parallel import POLL
+
+        while not self.closed:
+            try:
+                self.entries.put(entry, True, POLL)
+            except Queue.Full:
+                continue
+            return True
+        return False
+
+    def close(self):
+        """Stop prefetching and close the files that haven't been read."""
+        self.closed = True
+        with self.condition:
+            self.condition.notify()
+        while True:
+            try:
+                entry = self.entries.get_nowait()
+            except Queue.Empty:
+                break
+            self.discard(entry)
+
+    def discard(self, entry):
+        if entry is not None and entry[1] is not None and entry[0] != "-":
+            entry[1].close()
+
+class Buffer(object):
+    """Records waiting to be written by an :class:`OutputWriter`."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.size = 0
+        self.binary = False
+
+class OutputWriter(object):
+    """A buffered, thread-safe writer for an output *stream*.
+
+    Calls to :meth:`write` are collected in memory and written to *stream*
+    in a single call once more than *size* bytes (or characters) are
+    waiting, which makes writing many short lines to an unbuffered or
+    line-buffered stream (like a terminal) much cheaper. Each :meth:`write`
+    (or :meth:`writelines`) is a record: it is never split between two
+    writes to *stream*, so records from different threads don't interleave.
+
+    If *shared* is True, all threads append to a single buffer and records
+    reach *stream* in the order they were written. Otherwise, each thread
+    gets its own buffer and records from one thread stay in order, but
+    threads don't contend for a lock on every write.
+
+    Bytes written to a text stream that wraps a binary buffer (like
+    :data:`sys.stdout` on Python 3) are written to the buffer directly;
+    bytes written to other text streams are decoded with *encoding*
+    (by default, the stream's encoding or UTF-8), and bytes written to
+    binary streams are passed through. Attributes that
+    :class:`OutputWriter` doesn't define are looked up on *stream*.
+    """
+
+    def __init__(self, stream, size=WRITESIZE, shared=True, encoding=None):
+        self.stream = stream
+        self.size = size
+        self.shared = shared
+        self.encoding = encoding or getattr(stream, "encoding", None) or \
+            "utf-8"
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # Not "buffer": by io convention, that is the binary stream under a
+        # text stream, and copyfile() and friends look for it.
+        self._shared = None
+        self.buffers = []
+        if shared:
+            self._shared = Buffer()
+            self.buffers.append(self._shared)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def buffer_for_thread(self):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            buffer = self.local.buffer = Buffer()
+            with self.lock:
+                self.buffers.append(buffer)
+        return buffer
+
+    def write(self, data):
+        """Write the record *data*, which may be text or bytes."""
+        buffer = self._shared or self.buffer_for_thread()
+        binary = BINARY and isinstance(data, bytes)
+        with buffer.lock:
+            if binary is not buffer.binary:
+                self.drain(buffer)
+                buffer.binary = binary
+            buffer.chunks.append(data)
+            buffer.size += len(data)
+            if buffer.size >= self.size:
+                self.drain(buffer)
+
+    def writelines(self, lines):
+        """Write the strings in *lines* as a single record."""
+        lines = list(lines)
+        if lines:
+            self.write(lines[0][:0].join(lines))
+
+    def drain(self, buffer):
+        """Write and empty *buffer*, whose lock must be held."""
+        if not buffer.chunks:
+            return
+        data = buffer.chunks[0][:0].join(buffer.chunks)
+        buffer.chunks = []
+        buffer.size = 0
+        with self.lock:
+            self.emit(data, buffer.binary)
+
+    def emit(self, data, binary):
+        stream = self.stream
+        if binary:
+            raw = getattr(stream, "buffer", None)
+            if raw is None:
+                if not isinstance(stream, (io.BufferedIOBase, io.RawIOBase)):
+                    data = data.decode(self.encoding, ERRORS)
+            else:
+                stream.flush()
+                stream = raw
+        stream.write(data)
+
+    def flush(self):
+        """Write all of the buffered records and flush *stream*."""
+        for buffer in list(self.buffers):
+            with buffer.lock:
+                self.drain(buffer)
+        with self.lock:
+            self.stream.flush()
+
+    def close(self):
+        """Flush the writer; *stream* itself is left open."""
+        self.flush()
+
+replace = getattr(os, "replace", os.rename)
+
+def readumask():
+    """Return the process's umask (which can only be read by setting it)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+UMASK = readumask()
+"""The process's umask, read when this module is imported: setting it (even
+briefly) while other threads create files would change their permissions."""
+
+def filemode(path):
+    """Return the permissions a new file at *path* should have.
+
+    These are the permissions of the existing file, if there is one, or
+    the defaults allowed by :data:`UMASK`.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~UMASK
+
+def syncdir(path):
+    """Flush the entries of directory *path* (like a rename) to disk."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+libc = []
+
+def syncfs(path):
+    """Flush the whole file system containing *path* to disk.
+
+    Returns False if the platform can't (:manpage:`syncfs(2)` is specific
+    to Linux).
+    """
+    if not libc:
+        try:
+            import ctypes
+            libc.append((ctypes, ctypes.CDLL(None, use_errno=True).syncfs))
+        except (ImportError, OSError, AttributeError):
+            libc.append(None)
+    if libc[0] is None:
+        return False
+    ctypes, func = libc[0]
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if func(fd) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+    finally:
+        os.close(fd)
+    return True
+
+class AtomicFile(object):
+    """A file that appears at *path* complete or not at all.
+
+    Data is written to a temporary file in the same directory as *path*
+    (so that the two are on the same file system), with a *buffering*
+    byte buffer. :meth:`commit` renames it to *path*, replacing any file
+    already there; readers see either the old file or the new one, never
+    a partial write. :meth:`discard` removes it instead. *mode* and
+    *encoding* are passed to :func:`io.open`; *mode* must be a write-only
+    mode like ``w`` or ``wb``.
+
+    If *sync* is True, the data is flushed to disk before the rename and
+    the rename itself after it, so that the new file survives a crash.
+    Used as a context manager, the file is committed when the block
+    finishes and discarded if it raises an exception. Attributes that
+    :class:`AtomicFile` doesn't define are looked up on the open file.
+
+    If *group* is True, the file belongs to an :class:`OutputFiles` group,
+    which decides when to commit it; :meth:`close` (and the end of a
+    ``with`` block) only finishes writing it.
+    """
+
+    def __init__(self, path, mode="w", buffering=BUFSIZE, encoding=None,
+            sync=True, group=False):
+        if set(mode) & set("ra+"):
+            raise ValueError("invalid mode for AtomicFile: %r" % mode)
+        self.path = path
+        self.sync = sync
+        self.group = group
+        self.directory, name = os.path.split(os.path.abspath(path))
+        fd, self.temp = tempfile.mkstemp(prefix=".%s." % name,
+            suffix=".tmp", dir=self.directory)
+        try:
+            os.chmod(self.temp, filemode(path))
+            self.file = io.open(fd, mode, buffering, encoding=encoding)
+        except:
+            os.close(fd)
+            os.unlink(self.temp)
+            raise
+        self.committed = False
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None or self.group:
+            self.close()
+        else:
+            self.discard()
+
+    def close(self):
+        """Commit the file (or, if it belongs to a group, finish it)."""
+        if self.group:
+            self.finish()
+        else:
+            self.commit()
+
+    def finish(self):
+        """Flush and close the temporary file (syncing it if *sync* is True)."""
+        if self.file.closed:
+            return
+        try:
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+        finally:
+            self.file.close()
+
+    def rename(self):
+        """Move the (finished) temporary file to :attr:`path`."""
+        replace(self.temp, self.path)
+        self.committed = True
+
+    def commit(self):
+        """Finish the file and move it to :attr:`path`."""
+        if self.committed:
+            return
+        self.finish()
+        self.rename()
+        if self.sync:
+            syncdir(self.directory)
+
+    def discard(self):
+        """Close and remove the temporary file."""
+        if self.committed:
+            return
+        try:
+            self.file.close()
+        finally:
+            try:
+                os.unlink(self.temp)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+class OutputFiles(object):
+    """A group of :class:`AtomicFile` instances committed together.
+
+    *sync* chooses how the group's files get to disk before they're
+    renamed into place:
+
+    ``"file"``
+        Each file is flushed to disk on its own, and then each directory
+        the files were renamed in is flushed once.
+    ``"batch"``
+        The files are closed without syncing; then each file system that
+        holds one is flushed in a single call (with :func:`syncfs`, or a
+        flush of each file where that isn't available) and each directory
+        is flushed once. This is much cheaper when writing many small
+        files.
+    ``None``
+        Nothing is synced; the renames are still atomic, but the files may
+        be lost (or, on some file systems, empty) after a crash.
+    """
+
+    def __init__(self, sync="file"):
+        if sync not in SYNC:
+            raise ValueError("invalid sync policy: %r" % (sync,))
+        self.sync = sync
+        self.files = []
+
+    def open(self, path, mode="w", buffering=BUFSIZE, encoding=None):
+        """Return a new :class:`AtomicFile` for *path* in the group."""
+        output = AtomicFile(path, mode, buffering, encoding,
+            sync=self.sync == "file", group=True)
+        self.files.append(output)
+        return output
+
+    def commit(self):
+        """Finish all of the files and move them into place."""
+        files, self.files = self.files, []
+        try:
+            for output in files:
+                output.finish()
+            if self.sync == "batch":
+                self.syncfs(files)
+            for output in files:
+                output.rename()
+        except:
+            for output in files:
+                output.discard()
+            raise
+        if self.sync:
+            for directory in set(output.directory for output in files):
+                syncdir(directory)
+
+    def syncfs(self, files):
+        """Flush the (finished) *files* to disk, a file system at a time."""
+        devices = {}
+        for output in files:
+            device = os.stat(output.temp).st_dev
+            devices.setdefault(device, []).append(output)
+        for outputs in devices.values():
+            if syncfs(outputs[0].directory):
+                continue
+            for output in outputs:
+                fd = os.open(output.temp, os.O_RDWR)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def discard(self):
+        """Remove all of the files."""
+        files, self.files = self.files, []
+        for output in files:
+            output.discard()
+
+    def close(self, commit=True):
+        """Commit the files if *commit* is True, or else discard them."""
+        if commit:
+            self.commit()
+        else:
+            self.discard()
@@ -0,0 +1,205 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Abort
+from cli.cache import RunCache
+from cli.checkpoint import Checkpoint
+from cli.util import StringIO
+
+try:
+    import asyncio
+    from cli.aio import AsyncApplication, AsyncCommandLineApp
+except ImportError:
+    asyncio = None
+
+from cli import tests
+
+skipUnlessAsyncio = tests.unittest.skipIf(asyncio is None,
+    "asyncio is not available")
+
+if asyncio is not None:
+
+    class EchoProtocol(asyncio.Protocol):
+        """A local stand-in server that echoes one message and hangs up."""
+
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def data_received(self, data):
+            self.transport.write(data)
+            self.transport.close()
+
+    class ClientProtocol(asyncio.Protocol):
+
+        def __init__(self, message, done):
+            self.message = message
+            self.done = done
+            self.received = b""
+
+        def connection_made(self, transport):
+            transport.write(self.message)
+
+        def data_received(self, data):
+            self.received += data
+
+        def connection_lost(self, exc):
+            self.done.set_result(self.received)
+
+    class FakeAsyncApp(AsyncApplication):
+
+        def main(self):
+            return asyncio.sleep(0)
+
+class TestAsyncApplication(tests.AppTest):
+
+    def setUp(self):
+        if asyncio is None:
+            raise tests.unittest.SkipTest("asyncio is not available")
+        self.app_cls = FakeAsyncApp
+        tests.AppTest.setUp(self)
+
+    def test_returns_value(self):
+        @self.app_cls(exit_after_main=False)
+        def app(app):
+            return asyncio.sleep(0, result=3)
+
+        self.assertEqual(app.run(), 3)
+        self.assertEqual(app.loop, None)
+
+    def test_stats(self):
+        reports = []
+        @self.app_cls(exit_after_main=False, stats=reports.append)
+        def app(app):
+            return asyncio.sleep(0.01)
+
+        app.run()
+        self.assertEqual(reports, [app])
+        self.assertTrue(app.timings["main"]["wall"] >= 0.01)
+
+    def test_cancel(self):
+        @self.app_cls(exit_after_main=False, cancel_status=4)
+        def app(app):
+            future = app.loop.create_future()
+            app.loop.call_soon(future.cancel)
+            return future
+
+        self.assertEqual(app.run(), 4)
+
+    def test_swallow_exception(self):
+        @self.app_cls(exit_after_main=False, reraise=())
+        def app(app):
+            future = app.loop.create_future()
+            app.loop.call_soon(future.set_exception, ValueError("Just testing."))
+            return future
+
+        self.assertEqual(app.run(), 1)
+
+    def test_stand_in_server(self):
+        @self.app_cls(exit_after_main=False)
+        def app(app):
+            loop = app.loop
+            done = loop.create_future()
+            def connect(started):
+                server = started.result()
+                port = server.sockets[0].getsockname()[1]
+                asyncio.ensure_future(loop.create_connection(
+                    lambda: ClientProtocol(b"ping", done), "127.0.0.1", port))
+                done.add_done_callback(lambda future: server.close())
+            started = asyncio.ensure_future(
+                loop.create_server(EchoProtocol, "127.0.0.1", 0))
+            started.add_done_callback(connect)
+            done.add_done_callback(
+                lambda future: setattr(app, "received", future.result()))
+            return done
+
+        self.assertEqual(app.run(), 1)
+        self.assertEqual(app.received, b"ping")
+
+class TestAsyncCommandLineApp(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    @skipUnlessAsyncio
+    def test_parse_before_loop(self):
+        @AsyncCommandLineApp(exit_after_main=False, argv=["test", "-f", "2"])
+        def app(app):
+            return asyncio.sleep(0, result=app.params.foo)
+        app.add_param("-f", "--foo", type=int)
+
+        self.assertEqual(app.run(), 2)
+
+    @skipUnlessAsyncio
+    def test_cache(self):
+        calls = []
+        def run_app():
+            @AsyncCommandLineApp(exit_after_main=False, argv=["test"],
+                stdout=StringIO(), cache=RunCache(self.tmpdir))
+            def app(app):
+                calls.append(app)
+                app.stdout.write(u"hello\n")
+                return asyncio.sleep(0, result=3)
+            return app.run(), app.stdout.getvalue()
+
+        self.assertEqual(run_app(), (3, "hello\n"))
+        self.assertEqual(run_app(), (3, "hello\n"))
+        self.assertEqual(len(calls), 1)
+
+    @skipUnlessAsyncio
+    def test_resume(self):
+        path = os.path.join(self.tmpdir, "checkpoint")
+        def run_app(*argv):
+            seen = []
+            @AsyncCommandLineApp(exit_after_main=False,
+                argv=["test"] + list(argv), stdout=StringIO(),
+                checkpoint=Checkpoint(path, interval=None))
+            def app(app):
+                for i in app.checkpointed(range(5)):
+                    if i == app.params.fail:
+                        raise Abort(3)
+                    seen.append(i)
+                return asyncio.sleep(0)
+            app.add_param("--fail", default=None, type=int)
+            return app.run(), seen
+
+        self.assertEqual(run_app("--fail", "2"), (3, [0, 1]))
+        self.assertEqual(run_app("--resume"), (0, [2, 3, 4]))
+        self.assertFalse(os.path.exists(path))
+
+    @skipUnlessAsyncio
+    def test_buffered_help(self):
+        @AsyncCommandLineApp(exit_after_main=False, stdout=StringIO(),
+            buffered=True, argv=["test", "--help"])
+        def app(app):
+            return asyncio.sleep(0)
+
+        stream = app.stdout.stream
+        try:
+            app.run()
+        except Abort, e:
+            self.assertEqual(e.status, 0)
+        else:
+            self.fail("--help didn't abort")
+        self.assertTrue(stream.getvalue().startswith("usage: app"))
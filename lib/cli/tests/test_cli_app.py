@@ -15,11 +15,43 @@ ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
 OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 """
 
-from cli.app import Abort, Application, CommandLineApp
+import gc
+import json
+import os
+import subprocess
+import sys
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Abort, Application, CommandLineApp, PathType
+from cli.config import ConfigCache
 from cli.util import StringIO
 
+import cli
+
 from cli import tests
 
+FAST_EXIT = """
+import atexit, logging, sys
+from cli.app import Application
+
+def main(app):
+    logging.basicConfig(format="%%(message)s")
+    logging.getLogger("test").warning("logged")
+    app.stdout.write("output")
+    atexit.register(lambda: sys.stderr.write("atexit\\n"))
+    app.leak = [[] for i in range(1000)]
+    return 3
+
+class Finalized(object):
+    def __del__(self):
+        sys.stderr.write("finalized\\n")
+
+finalized = Finalized()
+Application(main, fast_exit=%r).run()
+"""
+
 class FakeApp(Application):
     
     def main(self):
@@ -70,6 +102,32 @@ class TestApplication(tests.AppTest):
 
         self.assertRaises(RuntimeError, app.run)
 
+    def test_cleanups(self):
+        calls = []
+        def cleanup(name):
+            try:
+                int("x")
+            except ValueError:
+                pass
+            calls.append((name, app.status))
+
+        @self.app_cls(exit_after_main=False)
+        def app(app):
+            app.add_cleanup(cleanup, "first")
+            app.add_cleanup(cleanup, name="second")
+            return 2
+
+        self.assertEqual(app.run(), 2)
+        self.assertEqual(calls, [("second", 2), ("first", 2)])
+
+        del calls[:]
+        def main(app):
+            app.add_cleanup(cleanup, "third")
+            raise RuntimeError("Just testing.")
+        app.main = main
+        self.assertRaises(RuntimeError, app.run)
+        self.assertEqual(calls, [("third", None)])
+
     def test_swallow_exception(self):
         @self.app_cls(exit_after_main=False, reraise=(ValueError, TypeError))
         def app(app):
@@ -77,6 +135,58 @@ class TestApplication(tests.AppTest):
 
         self.assertEqual(app.run(), 1)
 
+    def test_stats(self):
+        reports = []
+        @self.app_cls(exit_after_main=False, stats=reports.append)
+        def app(app):
+            return 0
+
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(reports, [app])
+        self.assertEqual(sorted(app.timings),
+            ["main", "post_run", "pre_run", "setup"])
+        for timing in app.timings.values():
+            self.assertEqual(sorted(timing),
+                ["peak_rss", "system", "user", "wall"])
+            self.assertTrue(timing["wall"] >= 0)
+
+    def test_tune_gc(self):
+        thresholds = gc.get_threshold()
+        during = []
+        @self.app_cls(exit_after_main=False, tune_gc=(5000, 10, 10))
+        def app(app):
+            during.append(gc.get_threshold())
+
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(during, [(5000, 10, 10)])
+        self.assertEqual(gc.get_threshold(), thresholds)
+        if hasattr(gc, "get_freeze_count"):
+            self.assertEqual(gc.get_freeze_count(), 0)
+
+    def test_fast_exit(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(cli.__file__))
+        for fast_exit in (False, True):
+            process = subprocess.Popen([sys.executable, "-c",
+                FAST_EXIT % fast_exit], env=env, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+            self.assertEqual(process.returncode, 3)
+            self.assertEqual(stdout, b"output")
+            lines = stderr.decode("ascii").splitlines()
+            self.assertEqual(lines[:2], ["logged", "atexit"])
+            if fast_exit:
+                self.assertFalse("finalized" in lines)
+
+    def test_no_stats(self):
+        @self.app_cls(exit_after_main=False, stderr=StringIO())
+        def app(app):
+            return 0
+
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(app.timings, {})
+        self.assertEqual(app.stderr.getvalue(), "")
+
             
 class TestCommandLineApp(tests.AppTest):
     app_cls = FakeCommandLineApp
@@ -105,3 +215,278 @@ class TestCommandLineApp(tests.AppTest):
     def test_version(self):
         self.app.version = "0.1"
         self.app.run()
+
+    def test_path_type(self):
+        tmpdir = mkdtemp()
+        try:
+            paths = [os.path.join(tmpdir, str(i)) for i in range(20)]
+            for i, path in enumerate(paths):
+                f = open(path, 'w')
+                f.write("x" * i)
+                f.close()
+
+            app_cls = self.app_cls
+            class Test(app_cls):
+
+                def setup(self):
+                    app_cls.setup(self)
+                    self.add_param("paths", nargs="+", type=PathType(workers=4))
+
+            status, app = self.runapp(Test, "test " + " ".join(paths))
+            self.assertEqual(app.params.paths, paths)
+            self.assertEqual([p.stat.st_size for p in app.params.paths],
+                list(range(20)))
+        finally:
+            rmtree(tmpdir)
+
+    def test_path_type_missing(self):
+        app_cls = self.app_cls
+        class Test(app_cls):
+
+            def setup(self):
+                app_cls.setup(self)
+                self.add_param("paths", nargs="*", type=PathType())
+
+        stderr = StringIO()
+        status = None
+        try:
+            self.runapp(Test, "test / /nonexistent /nonexistent2", stderr=stderr)
+        except Abort, e:
+            status = e.status
+        self.assertEqual(status, 2)
+        self.assertTrue("argument paths: can't stat '/nonexistent'" in
+            stderr.getvalue())
+
+    def test_path_type_invalid(self):
+        for nargs, paths in ((None, ["a\0b"]), ("*", ["/", "a\0b"])):
+            @self.app_cls(exit_after_main=False, argv=["test", "/"] + paths,
+                stderr=StringIO())
+            def app(app):
+                pass
+            app.add_param("root", type=PathType())
+            app.add_param("paths", nargs=nargs, type=PathType())
+
+            try:
+                app.run()
+            except Abort, e:
+                self.assertEqual(e.status, 2)
+            else:
+                self.fail("path with a NUL byte accepted")
+            self.assertTrue("argument paths: can't stat 'a\\x00b'" in
+                app.stderr.getvalue())
+
+    def test_stdin_param(self):
+        app_cls = self.app_cls
+        class Test(app_cls):
+
+            def setup(self):
+                app_cls.setup(self)
+                self.add_param("names", stdin="\0")
+                self.add_param("-l", "--lines", stdin=True)
+
+        stdin = StringIO(u"b\0c\0")
+        status, app = self.runapp(Test, "test a - d", stdin=stdin)
+        self.assertEqual(list(app.params.names), ["a", "b", "c", "d"])
+
+        stdin = StringIO(u"b\nc")
+        status, app = self.runapp(Test, "test a -l", stdin=stdin)
+        self.assertEqual(list(app.params.lines), ["b", "c"])
+
+    def test_fromfile_sep(self):
+        tmpdir = mkdtemp()
+        try:
+            manifest = os.path.join(tmpdir, "manifest")
+            f = open(manifest, "wb")
+            f.write(b"a b\nc\0@d\0e\0")
+            f.close()
+
+            app_cls = self.app_cls
+            class Test(app_cls):
+
+                def setup(self):
+                    app_cls.setup(self)
+                    self.add_param("names", nargs="*")
+
+            status, app = self.runapp(Test, "test x @%s y" % manifest,
+                fromfile_prefix_chars="@", fromfile_sep="\0")
+            self.assertEqual(app.params.names, ["x", "a b\nc", "@d", "e", "y"])
+        finally:
+            rmtree(tmpdir)
+
+    def test_environ(self):
+        app_cls = self.app_cls
+        class Test(app_cls):
+
+            def setup(self):
+                app_cls.setup(self)
+                self.add_param("-f", "--foo", default=1, type=int, env=True)
+                self.add_param("-b", "--bar", default=False,
+                    action="store_true", env="BAR")
+                self.add_param("-v", "--verbose", default=0, action="count",
+                    env=True)
+                self.add_param("-n", "--names", nargs="*", env="NAMES")
+                self.add_param("-q", "--quux", default="q", env=True)
+                self.add_param("-i", "--include", action="append",
+                    default=[], env=True)
+
+        environ = {"APP_FOO": "2", "APP_BAR": "yes", "APP_VERBOSE": "3",
+            "APP_NAMES": "a b", "QUUX": "ignored", "APP_INCLUDE": "x"}
+        status, app = self.runapp(Test, "test", env_prefix="APP_",
+            environ=environ)
+        self.assertEqual(app.params.include, ["x"])
+        self.assertEqual(app.params.foo, 2)
+        self.assertEqual(app.params.bar, True)
+        self.assertEqual(app.params.verbose, 3)
+        self.assertEqual(app.params.names, ["a", "b"])
+        self.assertEqual(app.params.quux, "q")
+
+        status, app = self.runapp(Test, "test -f 3", env_prefix="APP_",
+            environ=environ)
+        self.assertEqual(app.params.foo, 3)
+
+        status, app = self.runapp(Test, "test -i y -v", env_prefix="APP_",
+            environ=environ)
+        self.assertEqual(app.params.include, ["y"])
+        self.assertEqual(app.params.verbose, 1)
+        self.assertEqual(app.params.names, ["a", "b"])
+
+        stderr = StringIO()
+        environ["APP_FOO"] = "x"
+        status = None
+        try:
+            self.runapp(Test, "test", env_prefix="APP_", environ=environ,
+                stderr=stderr)
+        except Abort, e:
+            status = e.status
+        self.assertEqual(status, 2)
+        self.assertTrue("environment variable APP_FOO: invalid int value: 'x'"
+            in stderr.getvalue())
+
+    def test_config(self):
+        tmpdir = mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "test.ini")
+            f = open(path, "w")
+            f.write("[test]\nfoo = 2\nbar = b\nbaz = c\nunknown = x\n"
+                "include = i\n")
+            f.close()
+
+            app_cls = self.app_cls
+            class Test(app_cls):
+
+                def setup(self):
+                    app_cls.setup(self)
+                    self.add_param("-f", "--foo", default=1, type=int)
+                    self.add_param("-b", "--bar", default="a", env=True)
+                    self.add_param("-z", "--baz", default="a", env=True)
+                    self.add_param("-i", "--include", action="append")
+
+            kwargs = dict(name="test", config=[path, "/nonexistent"],
+                config_cache=ConfigCache(False), environ={"BAR": "e"})
+            status, app = self.runapp(Test, "test -z z", **kwargs)
+            self.assertEqual(app.params.foo, 2)
+            self.assertEqual(app.params.bar, "e")
+            self.assertEqual(app.params.baz, "z")
+            self.assertEqual(app.params.include, ["i"])
+
+            self.assertEqual(app.reload_config(), False)
+            f = open(path, "w")
+            f.write("[test]\nfoo = 30\n")
+            f.close()
+            self.assertEqual(app.reload_config(), True)
+            self.assertEqual(app.params.foo, 30)
+            self.assertEqual(app.params.baz, "z")
+
+            os.remove(path)
+            self.assertEqual(app.reload_config(), True)
+            self.assertEqual(app.params.foo, 1)
+            self.assertEqual(app.reload_config(), False)
+        finally:
+            rmtree(tmpdir)
+
+    def test_reload_invalid_config(self):
+        tmpdir = mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "test.ini")
+            f = open(path, "w")
+            f.write("[test]\nfoo = 2\n")
+            f.close()
+
+            app_cls = self.app_cls
+            class Test(app_cls):
+
+                def setup(self):
+                    app_cls.setup(self)
+                    self.add_param("-f", "--foo", default=1, type=int)
+
+            stderr = StringIO()
+            status, app = self.runapp(Test, "test", name="test", config=[path],
+                config_cache=ConfigCache(False), stderr=stderr)
+            for contents in ("[test]\nfoo = x\n", "[test\n"):
+                f = open(path, "w")
+                f.write(contents)
+                f.close()
+                self.assertEqual(app.reload_config(), False)
+                self.assertEqual(app.params.foo, 2)
+            self.assertTrue("invalid int value" in stderr.getvalue())
+            self.assertTrue("config file" in stderr.getvalue())
+        finally:
+            rmtree(tmpdir)
+
+    def test_run_batch(self):
+        app_cls = self.app_cls
+        class Test(app_cls):
+
+            def setup(self):
+                app_cls.setup(self)
+                self.add_param("-f", "--foo", default=None)
+
+            def main(self):
+                self.stdout.write(u"%s" % self.params.foo)
+                return len(self.params.foo or "")
+
+        input = StringIO(u'-f a\n\n["-f", "b c"]\n-f \'d\n["-f"\n[1]\n'
+            u'\n--bar\n')
+        output = StringIO()
+        status, app = self.runapp(Test, "test")
+        returned = app.run_batch(input, output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        self.assertEqual(returned, 1)
+        self.assertEqual([r["argv"] for r in results],
+            [["-f", "a"], ["-f", "b c"], None, None, None, ["--bar"]])
+        self.assertEqual([r["status"] for r in results], [1, 3, 2, 2, 2, 2])
+        self.assertEqual([r["stdout"] for r in results],
+            ["a", "b c", "", "", "", ""])
+        for result in results[2:5]:
+            self.assertTrue("bad command line" in result["stderr"])
+        self.assertTrue("unrecognized arguments: --bar" in results[5]["stderr"])
+        self.assertEqual(app.params.foo, None)
+        self.assertEqual(app.argv, ["test"])
+
+    def test_stats_flag(self):
+        for argv, shown in ((["test"], False), (["test", "--stats"], True)):
+            @self.app_cls(exit_after_main=False, stats=True, argv=argv,
+                stderr=StringIO())
+            def app(app):
+                return 0
+
+            self.assertEqual(app.run(), 0)
+            self.assertEqual(sorted(app.timings),
+                ["main", "post_run", "pre_run", "setup"])
+            lines = app.stderr.getvalue().splitlines()
+            if shown:
+                self.assertEqual([line.split()[0] for line in lines],
+                    ["phase", "setup", "pre_run", "main", "post_run"])
+            else:
+                self.assertEqual(lines, [])
+
+    def test_stats_flag_usage_error(self):
+        for argv in (["test", "--bogus"], ["test", "--help"]):
+            @self.app_cls(exit_after_main=False, stats=True, argv=argv,
+                stdout=StringIO(), stderr=StringIO())
+            def app(app):
+                return 0
+
+            self.assertRaises(Abort, app.run)
+            self.assertFalse("phase" in app.stderr.getvalue())
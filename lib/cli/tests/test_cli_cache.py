@@ -0,0 +1,254 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import io
+import os
+import threading
+import time
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Application, CommandLineApp
+from cli.cache import MISSING, MemoryStore, Recorder, RunCache, \
+    SQLiteStore, memoize
+from cli.cache import tool
+from cli.util import StringIO
+
+from cli import tests
+
+class TestRunCache(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.cachedir = os.path.join(self.tmpdir, "cache")
+        self.input = os.path.join(self.tmpdir, "input")
+        self.write(self.input, "one\n")
+        self.calls = []
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def write(self, path, data):
+        f = open(path, "w")
+        try:
+            f.write(data)
+        finally:
+            f.close()
+
+    def app(self, argv, **kwargs):
+        calls = self.calls
+        @CommandLineApp(exit_after_main=False, argv=argv, stdout=StringIO(),
+            cache=RunCache(self.cachedir, **kwargs),
+            cache_inputs=lambda app: [app.params.path])
+        def app(app):
+            calls.append(app.params.path)
+            f = open(app.params.path)
+            try:
+                app.stdout.write(f.read().upper())
+            finally:
+                f.close()
+            return app.params.status
+        app.add_param("path")
+        app.add_param("--status", default=0, type=int)
+        return app
+
+    def run_app(self, *argv, **kwargs):
+        app = self.app(["test"] + list(argv), **kwargs)
+        status = app.run()
+        return status, app.stdout.getvalue()
+
+    def test_replay(self):
+        self.assertEqual(self.run_app(self.input), (0, "ONE\n"))
+        self.assertEqual(self.run_app(self.input), (0, "ONE\n"))
+        self.assertEqual(len(self.calls), 1)
+
+        self.assertEqual(self.run_app(self.input, "--status", "3"),
+            (3, "ONE\n"))
+        self.assertEqual(self.run_app(self.input, "--status", "3"),
+            (3, "ONE\n"))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_copy_file(self):
+        output = os.path.join(self.tmpdir, "output")
+        for i in range(2):
+            stdout = io.open(output, "w")
+            @Application(exit_after_main=False, stdout=stdout, argv=["test"],
+                cache=RunCache(self.cachedir), cache_inputs=[self.input])
+            def app(app):
+                self.calls.append(app)
+                app.stdout.write(u"head\n")
+                app.copy_file(self.input)
+
+            try:
+                self.assertEqual(app.run(), 0)
+            finally:
+                stdout.close()
+            f = open(output)
+            try:
+                self.assertEqual(f.read(), "head\none\n")
+            finally:
+                f.close()
+        self.assertEqual(len(self.calls), 1)
+
+    def test_input_changed(self):
+        self.run_app(self.input)
+        self.write(self.input, "two, longer\n")
+        self.assertEqual(self.run_app(self.input), (0, "TWO, LONGER\n"))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_hash(self):
+        self.run_app(self.input, hash=True)
+        os.utime(self.input, (0, 0))
+        self.assertEqual(self.run_app(self.input, hash=True), (0, "ONE\n"))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_interrupt_not_cached(self):
+        @Application(exit_after_main=False, stdout=StringIO(),
+            cache=RunCache(self.cachedir), argv=["test"])
+        def app(app):
+            app.stdout.write(u"partial")
+            raise KeyboardInterrupt
+
+        self.assertRaises(KeyboardInterrupt, app.run)
+        self.assertEqual(RunCache(self.cachedir).entries(), [])
+
+    def test_prune(self):
+        cache = RunCache(self.cachedir, max_size=1000)
+        for i in range(3):
+            cache.put(str(i), 0, b"x" * 400)
+            os.utime(cache.path(str(i)), (i, i))
+        cache.put("3", 0, b"x" * 400)
+        self.assertEqual([entry[0] for entry in cache.entries()], ["2", "3"])
+        self.assertEqual(cache.get("1"), None)
+        self.assertEqual(cache.get("2"), (0, b"x" * 400))
+        self.assertEqual(cache.prune(0), 2)
+
+    def test_recorder(self):
+        stream = StringIO()
+        recorder = Recorder(stream)
+        recorder.write(u"\xe9\n")
+        recorder.writelines([u"a", u"b"])
+        self.assertEqual(recorder.getvalue(), b"\xc3\xa9\nab")
+        self.assertEqual(stream.getvalue(), u"\xe9\nab")
+
+    def test_tool(self):
+        self.run_app(self.input)
+        self.run_app(self.input, "--status", "1")
+        cachetool = tool()
+        status, stdout, stderr = cachetool.invoke(["cache", "-d",
+            self.cachedir, "--list"])
+        self.assertEqual(status, 0)
+        lines = stdout.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[-1].endswith("1 test %s --status 1" %
+            self.input))
+
+        status, stdout, stderr = cachetool.invoke(["cache", "-d",
+            self.cachedir, "-m", "0"])
+        self.assertEqual(stdout.splitlines(), ["removed 2 entries",
+            "%s: 0 entries, 0 bytes" % self.cachedir])
+
+class TestMemoize(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "memo.sqlite")
+        self.calls = []
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def square(self, **kwargs):
+        calls = self.calls
+        @memoize(**kwargs)
+        def square(x, scale=1):
+            calls.append(x)
+            return x * x * scale
+        return square
+
+    def test_memory(self):
+        square = self.square(maxsize=2)
+        self.assertEqual([square(2), square(3), square(2), square(2, scale=2)],
+            [4, 9, 4, 8])
+        self.assertEqual(self.calls, [2, 3, 2])
+        square(3)
+        self.assertEqual(self.calls, [2, 3, 2, 3])
+        self.assertEqual(square.__name__, "square")
+        self.assertEqual(square.stats(), {"calls": 5, "hits": 1,
+            "memory_hits": 1, "disk_hits": 0, "misses": 4, "hit_ratio": 0.2})
+
+    def test_key(self):
+        square = self.square(key=lambda x, scale=1: x)
+        self.assertEqual([square(2), square(2, scale=3)], [4, 4])
+        self.assertEqual(self.calls, [2])
+
+    def test_ttl(self):
+        square = self.square(ttl=-1)
+        square(2)
+        square(2)
+        self.assertEqual(self.calls, [2, 2])
+
+    def test_max_bytes(self):
+        store = MemoryStore(maxsize=100, max_bytes=200)
+        for i in range(10):
+            store.put(i, b"x" * 50)
+        self.assertTrue(store.size <= 200)
+        self.assertEqual(store.get(0), MISSING)
+        self.assertEqual(store.get(9), b"x" * 50)
+        store.put("big", b"x" * 500)
+        self.assertEqual(store.get("big"), MISSING)
+
+    def test_store(self):
+        square = self.square(store=self.path)
+        square(3)
+        # A new wrapper, as in a later run, finds the result on disk.
+        square = self.square(store=self.path)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(self.calls, [3])
+        self.assertEqual(square.stats()["disk_hits"], 1)
+        self.assertEqual(square.stats()["memory_hits"], 1)
+
+        square.clear()
+        self.assertEqual(square(3), 9)
+        self.assertEqual(self.calls, [3, 3])
+
+    def test_store_budget(self):
+        store = SQLiteStore(self.path, max_bytes=1000)
+        for i in range(10):
+            store.put(str(i), b"x" * 300)
+            time.sleep(0.001)
+        self.assertEqual(store.get("0"), MISSING)
+        self.assertEqual(store.get("9"), b"x" * 300)
+
+    def test_store_threads(self):
+        errors = []
+        def work(n):
+            try:
+                store = SQLiteStore(self.path)
+                for i in range(20):
+                    store.put("%d-%d" % (n, i), i)
+                    self.assertEqual(store.get("%d-%d" % (n, i)), i)
+            except Exception, e:
+                errors.append(e)
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
@@ -0,0 +1,117 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Abort, Application, CommandLineApp
+from cli.checkpoint import Checkpoint
+from cli.util import StringIO
+
+from cli import tests
+
+class TestCheckpoint(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "checkpoint")
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def test_track(self):
+        checkpoint = Checkpoint(self.path, every=3, interval=None)
+        items = checkpoint.track(range(10))
+        for i in range(5):
+            checkpoint.state["last"] = next(items)
+        self.assertEqual((checkpoint.cursor, checkpoint.saves), (4, 1))
+
+        resumed = Checkpoint(self.path)
+        self.assertTrue(resumed.load())
+        self.assertEqual((resumed.cursor, resumed.state), (3, {"last": 2}))
+        self.assertEqual(list(resumed.track(range(10))), list(range(3, 10)))
+        self.assertEqual(os.listdir(self.tmpdir), ["checkpoint"])
+
+    def test_interval(self):
+        checkpoint = Checkpoint(self.path, interval=0)
+        list(checkpoint.track(range(3)))
+        self.assertEqual(checkpoint.saves, 3)
+
+    def test_load_missing(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.cursor = 5
+        self.assertFalse(checkpoint.load())
+        self.assertEqual(checkpoint.cursor, 0)
+        checkpoint.remove()
+
+    def test_finish(self):
+        checkpoint = Checkpoint(self.path, interval=None)
+        items = checkpoint.track("abc")
+        next(items)
+        checkpoint.finish(False)
+        self.assertFalse(os.path.exists(self.path))
+        next(items)
+        checkpoint.finish(False)
+        checkpoint.finish(False)
+        self.assertEqual((checkpoint.cursor, checkpoint.saves), (1, 1))
+        checkpoint.finish(True)
+        self.assertFalse(os.path.exists(self.path))
+
+class TestCheckpointedApp(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "checkpoint")
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def run_app(self, *argv):
+        seen = []
+        @CommandLineApp(exit_after_main=False, argv=["test"] + list(argv),
+            checkpoint=Checkpoint(self.path, interval=None), stdout=StringIO())
+        def app(app):
+            state = app.checkpoint.state
+            state.setdefault("total", 0)
+            for i in app.checkpointed(range(10)):
+                if i == app.params.fail:
+                    raise Abort(3)
+                seen.append(i)
+                state["total"] += i
+            app.stdout.write(u"%d\n" % state["total"])
+        app.add_param("--fail", default=None, type=int)
+        status = app.run()
+        return status, seen, app.stdout.getvalue()
+
+    def test_resume(self):
+        self.assertEqual(self.run_app("--fail", "4"), (3, [0, 1, 2, 3], ""))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.run_app("--resume", "--fail", "7"),
+            (3, [4, 5, 6], ""))
+        self.assertEqual(self.run_app("--resume"),
+            (0, [7, 8, 9], "45\n"))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_restart(self):
+        self.run_app("--fail", "4")
+        self.assertEqual(self.run_app()[1], list(range(10)))
+
+    def test_no_checkpoint(self):
+        app = Application(lambda app: None)
+        self.assertRaises(ValueError, app.checkpointed, [])
@@ -0,0 +1,170 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import io
+import os
+import zlib
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Abort, CommandLineApp
+from cli.compress import CODECS, CompressingWriter, decompressing, \
+    decompressor
+from cli.util import StringIO
+
+from cli import tests
+
+DATA = b"".join(("line %d\n" % i).encode("ascii") for i in range(20000))
+
+def available(codec):
+    try:
+        decompressor(codec)
+    except ValueError:
+        return False
+    return True
+
+def compress(data, codec, **kwargs):
+    output = io.BytesIO()
+    writer = CompressingWriter(output, codec, **kwargs)
+    writer.write(data)
+    writer.close()
+    return output.getvalue()
+
+class TestCompression(tests.BaseTest):
+
+    def test_round_trip(self):
+        for codec in filter(available, CODECS):
+            for threaded in (True, False):
+                compressed = compress(DATA, codec, threaded=threaded,
+                    size=1000)
+                self.assertTrue(len(compressed) < len(DATA) // 4)
+                reader = decompressing(io.BytesIO(compressed), codec,
+                    size=1000)
+                self.assertEqual(reader.read(), DATA)
+
+    def test_detect(self):
+        for codec in filter(available, CODECS):
+            if codec == "zlib":
+                continue
+            reader = decompressing(io.BytesIO(compress(DATA, codec)))
+            self.assertEqual(reader.read(), DATA)
+        reader = decompressing(io.BytesIO(DATA))
+        self.assertEqual(reader.read(), DATA)
+
+    def test_concatenated(self):
+        compressed = compress(b"a\nb\n", "gzip") + compress(b"c\n", "gzip")
+        reader = decompressing(io.BytesIO(compressed), size=3)
+        self.assertEqual(list(reader), [b"a\n", b"b\n", b"c\n"])
+
+    def test_text(self):
+        output = io.BytesIO()
+        writer = CompressingWriter(output)
+        writer.write(u"\xe9t\xe9\n")
+        writer.flush()
+        writer.close()
+        writer.close()
+        stdin = io.TextIOWrapper(io.BytesIO(output.getvalue()),
+            encoding="utf-8")
+        self.assertEqual(decompressing(stdin).read(), u"\xe9t\xe9\n")
+
+    def test_lazy(self):
+        reader = decompressing(io.BytesIO(compress(DATA, "gzip")))
+        self.assertEqual(reader.raw.thread, None)
+        reader.readline()
+        self.assertNotEqual(reader.raw.thread, None)
+
+    def test_truncated(self):
+        for codec in filter(available, CODECS):
+            if not hasattr(decompressor(codec), "eof"):
+                continue
+            compressed = compress(DATA, codec)
+            reader = decompressing(io.BytesIO(compressed[:-10]), codec)
+            self.assertRaises(IOError, reader.read)
+
+    def test_corrupt(self):
+        reader = decompressing(io.BytesIO(b"\x1f\x8bgarbage"))
+        self.assertRaises(zlib.error, reader.read)
+
+class TestCompressionParams(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def test_params(self):
+        stdin = io.BytesIO(compress(b"1\n2\n3\n", "gzip"))
+        stdout = io.BytesIO()
+        @CommandLineApp(exit_after_main=False, compression=True,
+            argv=["test", "--compress", "--decompress-input"], stdin=stdin,
+            stdout=stdout)
+        def app(app):
+            for line in app.stdin:
+                app.stdout.write(line * 2)
+
+        self.assertEqual(app.run(), 0)
+        self.assertTrue(app.stdout is stdout)
+        self.assertEqual(decompressor("gzip").decompress(stdout.getvalue()),
+            b"1\n1\n2\n2\n3\n3\n")
+
+    def test_buffered(self):
+        stdout = io.BytesIO()
+        @CommandLineApp(exit_after_main=False, compression=True,
+            buffered=True, argv=["test", "--compress"], stdout=stdout)
+        def app(app):
+            app.stdout.write(DATA)
+
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(decompressor("gzip").decompress(stdout.getvalue()),
+            DATA)
+
+    def test_open_input(self):
+        path = os.path.join(self.tmpdir, "input.bz2")
+        compressed = compress(DATA, "bz2")
+        f = open(path, "wb")
+        f.write(compressed)
+        f.close()
+
+        for argv, expected in ((["test"], compressed),
+                (["test", "--decompress-input"], DATA)):
+            @CommandLineApp(exit_after_main=False, compression=True,
+                argv=argv, stdin=io.BytesIO(), stdout=StringIO())
+            def app(app):
+                stream = app.open_input(path)
+                try:
+                    contents.append(stream.read())
+                finally:
+                    stream.close()
+
+            contents = []
+            app.run()
+            self.assertEqual(contents, [expected])
+
+    def test_disabled(self):
+        @CommandLineApp(exit_after_main=False, argv=["test", "--compress"],
+            stderr=StringIO())
+        def app(app):
+            pass
+
+        try:
+            app.run()
+        except Abort, e:
+            self.assertEqual(e.status, 2)
+        else:
+            self.fail("--compress accepted without compression=True")
@@ -0,0 +1,77 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli import config
+from cli.config import ConfigCache, ConfigError
+
+from cli import tests
+
+class TestConfigCache(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.cache = ConfigCache(os.path.join(self.tmpdir, "cache"))
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        f = open(path, "w")
+        f.write(data)
+        f.close()
+        return path
+
+    def test_parse(self):
+        ini = self.write("app.ini", "[app]\nfoo = 1\n")
+        self.assertEqual(self.cache.load(ini), {"app": {"foo": "1"}})
+        json = self.write("app.json", '{"app": {"foo": 1}}')
+        self.assertEqual(self.cache.load(json), {"app": {"foo": 1}})
+        bad = self.write("bad.json", '{"app": ')
+        self.assertRaises(ConfigError, self.cache.load, bad)
+
+    def test_disk_cache(self):
+        path = self.write("app.ini", "[app]\nfoo = 1\n")
+        self.cache.load(path)
+
+        parse = config.parse
+        def fail(path):
+            raise AssertionError("parsed %s again" % path)
+        config.parse = fail
+        try:
+            cache = ConfigCache(self.cache.cachedir)
+            self.assertEqual(cache.load(path), {"app": {"foo": "1"}})
+        finally:
+            config.parse = parse
+
+    def test_changed(self):
+        path = self.write("app.ini", "[app]\nfoo = 1\n")
+        self.assertEqual(self.cache.changed(path), True)
+        self.cache.load(path)
+        self.assertEqual(self.cache.changed(path), False)
+        self.write("app.ini", "[app]\nfoo = 10\n")
+        self.assertEqual(self.cache.changed(path), True)
+        self.assertEqual(self.cache.load(path), {"app": {"foo": "10"}})
+        os.remove(path)
+        self.assertEqual(self.cache.changed(path), True)
+        self.cache.forget(path)
+        self.assertEqual(self.cache.changed(path), False)
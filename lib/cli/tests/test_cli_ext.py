@@ -0,0 +1,59 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+import subprocess
+import sys
+
+import cli
+
+from cli import tests
+
+HEAVY = ["cli._ext.scripttest", "cli.profiler", "pstats", "scripttest",
+    "shutil", "subprocess"]
+
+def imported(*modules):
+    """Return the modules loaded by a new interpreter importing *modules*."""
+    code = "import sys; import %s; print(' '.join(sorted(sys.modules)))" % \
+        ", ".join(modules)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(cli.__file__))
+    output = subprocess.Popen([sys.executable, "-c", code], env=env,
+        stdout=subprocess.PIPE).communicate()[0]
+    return set(output.decode("ascii").split())
+
+class TestImports(tests.BaseTest):
+
+    def test_app_is_light(self):
+        modules = imported("cli.app")
+        self.assertTrue("cli.app" in modules)
+        for name in HEAVY:
+            self.assertFalse(name in modules, name)
+
+    def test_ext_is_lazy(self):
+        modules = imported("cli.ext")
+        self.assertTrue("cli.ext" in modules)
+        for name in HEAVY:
+            self.assertFalse(name in modules, name)
+
+    def test_ext_attributes(self):
+        from cli.ext import scripttest
+        self.assertTrue(hasattr(scripttest, "TestFileEnvironment"))
+
+        import cli.ext
+        self.assertTrue(cli.ext.scripttest is scripttest)
+        self.assertRaises(AttributeError, getattr, cli.ext, "missing")
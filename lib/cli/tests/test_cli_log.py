@@ -14,11 +14,13 @@ WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
 ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
 OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 """
+import json
 import logging
 logging.logMultiprocessing = 0
 
 from cli.ext import argparse
 from cli.log import CommandLineLogger, LoggingApp
+from cli.util import StringIO
 
 from cli import tests
 
@@ -82,3 +84,19 @@ class TestLoggingApp(tests.AppTest):
 
         # We shouldn't see anything here.
         self.app.log.critical("foo")
+
+    def test_run_batch(self):
+        stdout = StringIO()
+        @LoggingApp(name="batchlog", exit_after_main=False, root=False,
+            stdout=stdout, message_format="%(message)s")
+        def app(app):
+            app.log.warning("working on %s", app.params.name)
+        app.add_param("name")
+        app.log.propagate = False
+
+        output = StringIO()
+        self.assertEqual(app.run_batch(StringIO(u"one\ntwo\n"), output), 0)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([r["stdout"] for r in results],
+            ["working on one\n", "working on two\n"])
+        self.assertEqual(stdout.getvalue(), "")
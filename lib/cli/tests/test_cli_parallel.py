@@ -0,0 +1,224 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+from cli.app import Abort, Application
+from cli.log import LoggingApp
+from cli.parallel import TaskTimeout, exit_status, process_map, run_commands, \
+    thread_map
+from cli.util import StringIO
+
+from cli import tests
+
+def square(x):
+    return x * x
+
+def fail(x):
+    if x == 3:
+        raise ValueError("bad item %d" % x)
+    return x
+
+def die(x):
+    if x == 3:
+        os._exit(3)
+    return x
+
+def shout(x):
+    logging.getLogger().warning("item %d", x)
+    return x
+
+class TestProcessMap(tests.BaseTest):
+
+    def test_ordered(self):
+        items = (i for i in range(50))
+        self.assertEqual(list(process_map(square, items, workers=3)),
+            [i * i for i in range(50)])
+
+    def test_unordered(self):
+        results = process_map(square, range(50), workers=3, ordered=False,
+            chunksize=2)
+        self.assertEqual(sorted(results), [i * i for i in range(50)])
+
+    def test_exception(self):
+        try:
+            list(process_map(fail, range(10), workers=2, chunksize=1))
+        except ValueError, e:
+            self.assertTrue("bad item 3" in e.remote_traceback)
+        else:
+            self.fail("ValueError not raised")
+
+    def test_unpicklable(self):
+        for ordered in (True, False):
+            results = process_map(lambda x: x, range(3), workers=2,
+                ordered=ordered)
+            self.assertRaises(Exception, list, results)
+
+    def test_dead_worker(self):
+        for ordered in (True, False):
+            results = process_map(die, range(10), workers=2, chunksize=1,
+                ordered=ordered)
+            self.assertRaises(RuntimeError, list, results)
+
+class TestThreadMap(tests.BaseTest):
+
+    def test_ordered(self):
+        def work(x):
+            time.sleep(0.001 * (x % 3))
+            return x * x
+        items = (i for i in range(50))
+        self.assertEqual(list(thread_map(work, items, workers=4)),
+            [i * i for i in range(50)])
+
+    def test_unordered(self):
+        results = thread_map(square, range(50), workers=4, ordered=False)
+        self.assertEqual(sorted(results), [i * i for i in range(50)])
+
+    def test_exception(self):
+        self.assertRaises(ValueError, list, thread_map(fail, range(10)))
+
+    def test_timeout(self):
+        event = threading.Event()
+        def hang(x):
+            if x == 1:
+                event.wait(5)
+            return x
+        for ordered in (True, False):
+            event.clear()
+            try:
+                results = thread_map(hang, range(4), workers=2,
+                    ordered=ordered, timeout=0.1)
+                list(results)
+            except TaskTimeout, e:
+                self.assertEqual(e.item, 1)
+            else:
+                self.fail("TaskTimeout not raised")
+            event.set()
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+class TestRunCommands(tests.BaseTest):
+
+    def test_output(self):
+        stdout, stderr = StringIO(), StringIO()
+        commands = [python("import sys; sys.stdout.write('out %d\\n' * 3)" % i)
+            for i in range(4)]
+        commands.append(python("import sys; sys.stderr.write('err')"))
+        statuses = run_commands(commands, workers=2, stdout=stdout,
+            stderr=stderr)
+        self.assertEqual(statuses, [0] * 5)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 12)
+        for i in range(4):
+            self.assertEqual(lines.count("[%d] out %d" % (i, i)), 3)
+        self.assertEqual(stderr.getvalue(), "[4] err\n")
+
+    def test_full_pipes(self):
+        stdout, stderr = StringIO(), StringIO()
+        code = ("import sys\n"
+            "for i in range(20000):\n"
+            "    sys.stdout.write('%d\\n' % i); sys.stderr.write('%d\\n' % i)")
+        statuses = run_commands([python(code)], stdout=stdout, stderr=stderr,
+            prefix=None)
+        self.assertEqual(statuses, [0])
+        self.assertEqual(len(stdout.getvalue().splitlines()), 20000)
+        self.assertEqual(len(stderr.getvalue().splitlines()), 20000)
+
+    def test_statuses(self):
+        stderr = StringIO()
+        commands = [python("raise SystemExit(%d)" % i) for i in range(3)]
+        commands.append("/nonexistent/command")
+        statuses = run_commands(commands, stdout=StringIO(), stderr=stderr,
+            prefix="%(name)s: ")
+        self.assertEqual(statuses, [0, 1, 2, 127])
+        self.assertTrue(stderr.getvalue().startswith("command: can't run"))
+
+    def test_exit_status(self):
+        self.assertEqual(exit_status([]), 0)
+        self.assertEqual(exit_status([0, 2, 1]), 2)
+        self.assertEqual(exit_status([0, -9, 1]), 137)
+
+class TestApplicationMap(tests.BaseTest):
+
+    def test_run_commands(self):
+        @Application(exit_after_main=False, stdout=StringIO())
+        def app(app):
+            return app.run_commands([python("print('hi')"),
+                python("raise SystemExit(3)")])
+
+        self.assertEqual(app.run(), 3)
+        self.assertEqual(app.stdout.getvalue(), "[0] hi\n")
+
+
+    def test_map_swallow_exception(self):
+        @Application(exit_after_main=False, reraise=())
+        def app(app):
+            return sum(app.map(fail, range(10), workers=2))
+
+        self.assertEqual(app.run(), 1)
+
+    def test_map_logs(self):
+        stream = StringIO()
+        @LoggingApp(exit_after_main=False, argv=["test"], stream=stream,
+            message_format="%(message)s", name="maplogs", root=False)
+        def app(app):
+            return sum(app.map(shout, range(3), workers=2))
+        app.log.propagate = False
+
+        self.assertEqual(app.run(), 3)
+        self.assertEqual(sorted(stream.getvalue().splitlines()),
+            ["item 0", "item 1", "item 2"])
+
+    def test_thread_map_abort_cancels(self):
+        started = []
+        def work(x):
+            started.append(x)
+            time.sleep(0.01)
+            return x
+
+        @Application(exit_after_main=False)
+        def app(app):
+            results = app.thread_map(work, range(100), workers=2)
+            next(results)
+            raise Abort(3)
+
+        self.assertEqual(app.run(), 3)
+        time.sleep(0.05)
+        self.assertTrue(len(started) < 10)
+
+    def test_thread_map_interrupt_cancels(self):
+        started = []
+        def work(x):
+            started.append(x)
+            time.sleep(0.01)
+            return x
+
+        @Application(exit_after_main=False)
+        def app(app):
+            results = app.thread_map(work, range(100), workers=2)
+            next(results)
+            raise KeyboardInterrupt
+
+        self.assertRaises(KeyboardInterrupt, app.run)
+        self.assertEqual(app.cleanups, [])
+        time.sleep(0.05)
+        self.assertTrue(len(started) < 10)
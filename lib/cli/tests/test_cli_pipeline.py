@@ -0,0 +1,111 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+
+from cli.pipeline import PipelineApp
+from cli.util import StringIO
+
+from cli import tests
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+def quarters(items):
+    for item in items:
+        if item % 4 == 0:
+            yield item
+
+def fail(items):
+    for item in items:
+        if item == 10:
+            raise ValueError("bad item %d" % item)
+        yield item
+
+def crash(items):
+    for item in items:
+        if item == 10:
+            os._exit(3)
+        yield item
+
+class FakePipelineApp(PipelineApp):
+
+    def main(self):
+        for mode in self.params.modes:
+            self.add_stage(double, mode=mode, maxsize=4)
+        self.add_stage(quarters)
+        return sum(self.run_pipeline(range(100)))
+
+class TestPipelineApp(tests.AppTest):
+    app_cls = FakePipelineApp
+
+    def setUp(self):
+        # Like tests.AppTest.setUp, but keep the app's log off sys.stdout
+        # (its handlers stay on the logger, which later apps share).
+        tests.BaseTest.setUp(self)
+        self.kwargs = dict(stream=StringIO(), message_format="%(message)s",
+            root=False)
+        _, self.app = self.runapp(self.app_cls, "foo", **self.kwargs)
+
+    def runapp(self, app_cls, cmd, **kwargs):
+        app = app_cls(exit_after_main=False, argv=cmd.split(), **kwargs)
+        # Other tests' apps may have made their own loggers the root.
+        app.log.propagate = False
+        app.add_param("modes", nargs="*")
+        return app.run(), app
+
+    def test_modes(self):
+        for modes in ("", "inline", "thread", "process",
+                "thread process inline"):
+            status, app = self.runapp(self.app_cls, "test " + modes,
+                **self.kwargs)
+            factor = 2 ** len(modes.split())
+            expected = sum(i * factor for i in range(100)
+                if (i * factor) % 4 == 0)
+            self.assertEqual(status, expected)
+
+    def test_metrics(self):
+        status, app = self.runapp(self.app_cls, "test -v thread process",
+            **self.kwargs)
+        lines = app.stream.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith(
+            "stage double (thread): 100 in, 100 out"))
+        self.assertTrue(lines[1].startswith(
+            "stage double (process): 100 in, 100 out"))
+        self.assertTrue(lines[2].startswith(
+            "stage quarters (inline): 100 in, 100 out"))
+
+    def test_failure(self):
+        for mode in ("inline", "thread", "process"):
+            @PipelineApp(exit_after_main=False, argv=["test"], reraise=(),
+                stream=None, root=False)
+            def app(app):
+                app.add_stage(fail, mode=mode)
+                app.add_stage(double, mode="thread")
+                return sum(app.run_pipeline(range(100)))
+
+            self.assertEqual(app.run(), 1)
+
+    def test_crash(self):
+        @PipelineApp(exit_after_main=False, argv=["test"], stream=None,
+            root=False)
+        def app(app):
+            app.add_stage(crash, mode="process")
+            return sum(app.run_pipeline(range(100)))
+
+        self.assertRaises(RuntimeError, app.run)
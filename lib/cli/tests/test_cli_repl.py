@@ -0,0 +1,103 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import CommandLineApp
+from cli.repl import Shell
+from cli.util import StringIO
+
+from cli import tests
+
+class TestShell(tests.BaseTest):
+
+    def setUp(self):
+        self.calls = []
+        def main(app):
+            self.calls.append((app.params.verbose, app.params.mode,
+                app.params.names))
+            app.stdout.write(u"%d\n" % len(self.calls))
+            return app.params.verbose
+        self.stdout, self.stderr = StringIO(), StringIO()
+        self.app = CommandLineApp(main, name="test", exit_after_main=False,
+            stdout=self.stdout, stderr=self.stderr)
+        self.app.add_param("-v", "--verbose", default=0, action="count")
+        self.app.add_param("-m", "--mode", default="fast",
+            choices=["fast", "slow"])
+        self.app.add_param("names", nargs="*")
+
+    def shell(self, lines):
+        return Shell(self.app, stdin=StringIO(lines), stdout=self.stdout)
+
+    def test_cmdloop(self):
+        shell = self.shell(u"-v a b\n\n# comment\n-m slow\n-vv\n")
+        shell.cmdloop()
+        self.assertEqual(self.calls, [
+            (1, "fast", ["a", "b"]), (0, "slow", []), (2, "fast", [])])
+        self.assertEqual(shell.status, 2)
+        self.assertEqual(self.stdout.getvalue(), u"test> 1\n" +
+            u"test> " * 3 + u"2\ntest> 3\ntest> \n")
+
+    def test_exit(self):
+        shell = self.shell(u"a\nexit\nb\n")
+        shell.cmdloop()
+        self.assertEqual(len(self.calls), 1)
+
+    def test_errors(self):
+        shell = self.shell(u"-m medium\n")
+        shell.cmdloop()
+        self.assertEqual(shell.status, 2)
+        self.assertTrue("invalid choice" in self.stderr.getvalue())
+
+        shell = self.shell(u"'a\n-h\n")
+        shell.cmdloop()
+        self.assertTrue("quotation" in self.stderr.getvalue())
+        self.assertTrue("usage:" in self.stdout.getvalue())
+        self.assertEqual(shell.status, 0)
+        self.assertEqual(self.calls, [])
+
+    def test_app_state(self):
+        self.app.params = "kept"
+        self.shell(u"a\n").cmdloop()
+        self.assertEqual(self.app.params, "kept")
+        self.assertTrue(self.app.stdout is self.stdout)
+
+    def test_complete(self):
+        shell = self.shell(u"")
+        complete = shell.completedefault
+        self.assertEqual(complete("--", "-v --", 3, 5), ["--help", "--mode",
+            "--verbose"])
+        self.assertEqual(complete("s", "-m s", 3, 4), ["slow"])
+        self.assertEqual(complete("", "-m ", 3, 3), ["fast", "slow"])
+
+        tmpdir = mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, "dir"))
+            open(os.path.join(tmpdir, "file"), "w").close()
+            prefix = os.path.join(tmpdir, "")
+            self.assertEqual(shell.completenames(prefix, prefix, 0,
+                len(prefix)), [prefix + "dir" + os.sep, prefix + "file"])
+        finally:
+            rmtree(tmpdir)
+
+    def test_repl(self):
+        self.app.stdin = StringIO(u"-v\n-v x\n")
+        self.assertEqual(self.app.repl(history=False), 1)
+        self.assertEqual(len(self.calls), 2)
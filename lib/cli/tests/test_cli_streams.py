@@ -0,0 +1,442 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import io
+import os
+import stat
+import threading
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli.app import Abort, Application, CommandLineApp
+from cli.streams import AtomicFile, OutputFiles, OutputWriter, \
+    PrefetchReader, UMASK, WRITESIZE, copyfile, iterrecords, splitstream
+from cli.util import StringIO
+
+from cli import tests
+
+class TestSplitStream(tests.BaseTest):
+
+    def test_split(self):
+        stream = StringIO(u"foo\nbar\nbaz")
+        self.assertEqual(list(splitstream(stream)), ["foo", "bar", "baz"])
+
+    def test_split_across_reads(self):
+        stream = StringIO(u"foo\0barbaz\0\0qux\0")
+        self.assertEqual(list(splitstream(stream, "\0", size=4)),
+            ["foo", "barbaz", "", "qux"])
+
+class TestIterRecords(tests.BaseTest):
+    data = b"a\nbb\n\nccc\n" + b"x" * 50 + b"\nlast"
+    records = [b"a", b"bb", b"", b"ccc", b"x" * 50, b"last"]
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "records")
+        f = open(self.path, "wb")
+        f.write(self.data)
+        f.close()
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def collect(self, source, **kwargs):
+        return list(iterrecords(source, size=4, **kwargs))
+
+    def test_stream(self):
+        self.assertEqual(self.collect(io.BytesIO(self.data)), self.records)
+        self.assertEqual(self.collect(StringIO(self.data.decode("ascii"))),
+            [r.decode("ascii") for r in self.records])
+
+    def test_file(self):
+        for mmap in (True, False):
+            self.assertEqual(self.collect(self.path, mmap=mmap), self.records)
+            stream = open(self.path, "rb")
+            stream.readline()
+            self.assertEqual(self.collect(stream, mmap=mmap),
+                self.records[1:])
+            stream.close()
+
+    def test_separator(self):
+        self.assertEqual(self.collect(io.BytesIO(self.data), sep=b"cc"),
+            [b"a\nbb\n\n", self.data[8:]])
+        self.assertEqual(self.collect(io.BytesIO(b"a\n")), [b"a"])
+        self.assertEqual(self.collect(self.path, sep=b"xxxx"),
+            self.data.split(b"xxxx"))
+        self.assertEqual(self.collect(io.BytesIO(b"")), [])
+        self.assertRaises(ValueError, self.collect, io.BytesIO(b""), sep=b"")
+
+    def test_application(self):
+        @Application(exit_after_main=False, stdin=io.BytesIO(self.data))
+        def app(app):
+            return len(list(app.iter_records()))
+
+        self.assertEqual(app.run(), 6)
+
+class TestCopyFile(tests.BaseTest):
+    data = b"".join(("line %d\n" % i).encode("ascii") for i in range(1000))
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "source")
+        self.output = os.path.join(self.tmpdir, "output")
+        f = open(self.path, "wb")
+        f.write(self.data)
+        f.close()
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def copied(self, source, **kwargs):
+        output = open(self.output, "wb")
+        try:
+            count = copyfile(source, output, size=1000, **kwargs)
+        finally:
+            output.close()
+        f = open(self.output, "rb")
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        self.assertEqual(count, len(data))
+        return data
+
+    def test_file(self):
+        self.assertEqual(self.copied(self.path), self.data)
+        self.assertEqual(self.copied(self.path, offset=7, count=2000),
+            self.data[7:2007])
+        self.assertEqual(self.copied(self.path, offset=len(self.data) + 1),
+            b"")
+
+    def test_position(self):
+        # A file output takes the sendfile path, a BytesIO the buffered one.
+        for to_file in (True, False):
+            output = io.BytesIO()
+            if to_file:
+                output = open(self.output, "wb")
+            source = open(self.path, "rb")
+            try:
+                source.read(5)
+                self.assertEqual(copyfile(source, output, offset=2, count=10),
+                    10)
+                self.assertEqual(source.read(3), self.data[17:20])
+                if not to_file:
+                    self.assertEqual(output.getvalue(), self.data[7:17])
+            finally:
+                source.close()
+                output.close()
+        f = open(self.output, "rb")
+        try:
+            self.assertEqual(f.read(), self.data[7:17])
+        finally:
+            f.close()
+
+    def test_pipe(self):
+        read, write = os.pipe()
+        os.write(write, self.data[:4096])
+        os.close(write)
+        source = os.fdopen(read, "rb")
+        try:
+            self.assertEqual(self.copied(source), self.data[:4096])
+        finally:
+            source.close()
+
+    def test_streams(self):
+        output = io.BytesIO()
+        self.assertEqual(copyfile(io.BytesIO(self.data), output, offset=3,
+            count=10), 10)
+        self.assertEqual(output.getvalue(), self.data[3:13])
+
+        output = StringIO()
+        copyfile(self.path, output, count=2, size=1)
+        self.assertEqual(output.getvalue(), "li")
+
+    def test_application(self):
+        @Application(exit_after_main=False, stdout=StringIO())
+        def app(app):
+            app.copy_file(self.path, count=7)
+
+        app.run()
+        self.assertEqual(app.stdout.getvalue(), "line 0\n")
+
+    def test_buffered(self):
+        def run(stdout):
+            @Application(exit_after_main=False, stdout=stdout, buffered=True)
+            def app(app):
+                app.stdout.write(u"head\n")
+                app.copy_file(self.path, count=7)
+                app.stdout.write(u"tail\n")
+
+            self.assertEqual(app.run(), 0)
+
+        stdout = StringIO()
+        run(stdout)
+        self.assertEqual(stdout.getvalue(), "head\nline 0\ntail\n")
+
+        stdout = io.open(self.output, "w")
+        try:
+            run(stdout)
+        finally:
+            stdout.close()
+        f = open(self.output)
+        try:
+            self.assertEqual(f.read(), "head\nline 0\ntail\n")
+        finally:
+            f.close()
+
+class TestPrefetchReader(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.tmpdir, "file%d" % i)
+            f = open(path, "wb")
+            f.write(("file %d\n" % i).encode("ascii") * (i * 10 + 1))
+            f.close()
+            self.paths.append(path)
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def test_order(self):
+        for budget in (0, 40, 1 << 20):
+            reader = PrefetchReader(self.paths, ahead=2, budget=budget)
+            names, lines = [], []
+            for input in reader:
+                names.append(input.name)
+                lines.append(list(input))
+            self.assertEqual(names, self.paths)
+            for i, contents in enumerate(lines):
+                self.assertEqual(contents,
+                    [("file %d\n" % i).encode("ascii")] * (i * 10 + 1))
+            self.assertEqual(reader.used, 0)
+
+    def test_stdin(self):
+        stdin = io.BytesIO(b"a\nb\n")
+        reader = PrefetchReader(["-", self.paths[0]], stdin=stdin)
+        self.assertEqual([list(input.records()) for input in reader],
+            [[b"a", b"b"], [b"file 0"]])
+        self.assertFalse(stdin.closed)
+
+    def test_error(self):
+        missing = os.path.join(self.tmpdir, "missing")
+        reader = iter(PrefetchReader([self.paths[0], missing]))
+        self.assertEqual(next(reader).read(), b"file 0\n")
+        self.assertRaises(IOError, next, reader)
+
+    def test_paths_error(self):
+        def paths():
+            yield self.paths[0]
+            raise ValueError("Just testing.")
+        reader = iter(PrefetchReader(paths()))
+        self.assertEqual(next(reader).read(), b"file 0\n")
+        self.assertRaises(ValueError, next, reader)
+
+    def test_dead_thread(self):
+        reader = PrefetchReader(self.paths)
+        reader.prefetch = lambda: None
+        self.assertRaises(RuntimeError, list, reader)
+
+    def test_application(self):
+        contents = []
+        @Application(exit_after_main=False)
+        def app(app):
+            for input in app.iter_files(self.paths, budget=0):
+                contents.append(input.read())
+                break
+
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(contents, [b"file 0\n"])
+        self.assertEqual(app.cleanups, [])
+
+class TestAtomicFile(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "output")
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def read(self, path=None):
+        f = open(path or self.path, "rb")
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_commit(self):
+        output = AtomicFile(self.path, "wb")
+        output.write(b"data")
+        self.assertEqual(os.listdir(self.tmpdir),
+            [os.path.basename(output.temp)])
+        output.commit()
+        self.assertEqual(os.listdir(self.tmpdir), ["output"])
+        self.assertEqual(self.read(), b"data")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode) & 0o600,
+            0o600)
+
+    def test_replace(self):
+        with AtomicFile(self.path) as output:
+            output.write(u"old")
+        os.chmod(self.path, 0o640)
+        with AtomicFile(self.path, sync=False) as output:
+            output.write(u"new")
+            self.assertEqual(self.read(), b"old")
+        self.assertEqual(self.read(), b"new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+    def test_umask(self):
+        # Creating a file mustn't touch the process-wide umask.
+        umask = os.umask
+        os.umask = None
+        try:
+            with AtomicFile(self.path) as output:
+                output.write(u"new")
+        finally:
+            os.umask = umask
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode),
+            0o666 & ~UMASK)
+
+    def test_discard(self):
+        try:
+            with AtomicFile(self.path, "wb") as output:
+                output.write(b"partial")
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_group(self):
+        for sync in ("file", "batch", None):
+            files = OutputFiles(sync)
+            paths = [os.path.join(self.tmpdir, "%s-%d" % (sync, i))
+                for i in range(3)]
+            for path in paths:
+                with files.open(path, "wb") as output:
+                    output.write(path.encode("utf-8"))
+            self.assertFalse(any(os.path.exists(path) for path in paths))
+            files.close()
+            for path in paths:
+                self.assertEqual(self.read(path), path.encode("utf-8"))
+        self.assertEqual(len(os.listdir(self.tmpdir)), 9)
+
+        self.assertRaises(ValueError, OutputFiles, "always")
+
+    def test_app(self):
+        for returned, exists in ((None, True), (Abort(2), False),
+                (ValueError(), False)):
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            def main(app):
+                output = app.open_output(self.path)
+                output.write(u"result")
+                if isinstance(returned, Exception):
+                    raise returned
+            app = Application(main, exit_after_main=False, sync="batch",
+                reraise=(), stderr=StringIO())
+            app.run()
+            self.assertEqual(os.path.exists(self.path), exists)
+            self.assertEqual(app.outputs, None)
+            self.assertEqual(len(os.listdir(self.tmpdir)), int(exists))
+
+class TestOutputWriter(tests.BaseTest):
+
+    def test_buffering(self):
+        stream = StringIO()
+        writer = OutputWriter(stream, size=8)
+        writer.write(u"abc\n")
+        self.assertEqual(stream.getvalue(), "")
+        writer.write(u"defgh\n")
+        self.assertEqual(stream.getvalue(), "abc\ndefgh\n")
+        writer.writelines([u"i\n", u"j\n"])
+        self.assertEqual(stream.getvalue(), "abc\ndefgh\n")
+        writer.flush()
+        self.assertEqual(stream.getvalue(), "abc\ndefgh\ni\nj\n")
+
+    def test_binary(self):
+        raw = io.BytesIO()
+        stream = io.TextIOWrapper(raw, encoding="utf-8")
+        writer = OutputWriter(stream)
+        writer.write(u"text\n")
+        writer.write(b"bytes\n")
+        writer.write(u"\xe9\n")
+        writer.flush()
+        self.assertEqual(raw.getvalue(), u"text\nbytes\n\xe9\n".encode("utf-8"))
+
+        stream = StringIO()
+        writer = OutputWriter(stream)
+        writer.write(b"bytes\n")
+        writer.flush()
+        self.assertEqual(stream.getvalue(), "bytes\n")
+
+    def test_threads(self):
+        for shared in (True, False):
+            stream = StringIO()
+            writer = OutputWriter(stream, size=100, shared=shared)
+            def work(name):
+                for i in range(200):
+                    writer.write(u"%s %d %s\n" % (name, i, name * 10))
+            threads = [threading.Thread(target=work, args=(name,))
+                for name in "abcd"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            writer.flush()
+
+            lines = stream.getvalue().splitlines()
+            self.assertEqual(len(lines), 800)
+            for name in "abcd":
+                numbers = [int(line.split()[1]) for line in lines
+                    if line.startswith(name)]
+                self.assertEqual(numbers, list(range(200)))
+            for line in lines:
+                name = line[0]
+                self.assertEqual(line.split()[2], name * 10)
+
+    def test_application(self):
+        for returned in (None, Abort(2)):
+            @Application(exit_after_main=False, stdout=StringIO(),
+                buffered=True)
+            def app(app):
+                app.stdout.write(u"main\n")
+                app.add_cleanup(app.stdout.write, u"cleanup\n")
+                if isinstance(returned, Exception):
+                    raise returned
+
+            stream = app.stdout.stream
+            self.assertEqual(app.stdout.size, WRITESIZE)
+            app.run()
+            self.assertEqual(stream.getvalue(), "main\ncleanup\n")
+
+    def test_help(self):
+        @CommandLineApp(exit_after_main=False, stdout=StringIO(),
+            buffered=True, argv=["test", "--help"])
+        def app(app):
+            pass
+
+        stream = app.stdout.stream
+        try:
+            app.run()
+        except Abort, e:
+            self.assertEqual(e.status, 0)
+        else:
+            self.fail("--help didn't abort")
+        self.assertTrue(stream.getvalue().startswith("usage: app"))
@@ -16,10 +16,9 @@ OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
 """
 
+import os
 import sys
 
-from cli.profiler import Stats, fmtsec, update_wrapper
-
 try:
     import io
     BaseStringIO = io.StringIO
@@ -27,11 +26,31 @@ except (ImportError, AttributeError):
     import StringIO
     BaseStringIO = StringIO.StringIO
 
+class update_wrapper(object):
+    assignments = ('__module__', '__name__', '__doc__')
+    updates = ('__dict__',)
+
+    def __call__(self, wrapper, wrapped):
+        """Update callable wrapper so it looks like callable wrapped.
+    
+        Based on functools.update_wrapper (used only for compatibility on
+        Python <= 2.5).
+        """
+        for attr in self.assignments:
+            setattr(wrapper, attr, getattr(wrapped, attr))
+        for attr in self.updates:
+            getattr(wrapper, attr).update(getattr(wrapper, attr, {}))
+    
+        return wrapper
+
+update_wrapper = update_wrapper()
 
 class StringIO(BaseStringIO):
     
     def write(self, s):
-        BaseStringIO.write(self, unicode(s))
+        if not isinstance(s, unicode):
+            s = unicode(s)
+        BaseStringIO.write(self, s)
 
 def trim(string):
     """Trim whitespace from strings.
@@ -86,3 +105,25 @@ def ismethodof(method, obj):
     mainobj = getattr(method, "im_self",
         getattr(method, "__self__", None))
     return isinstance(mainobj, cls)
+
+_environ_indexes = {}
+
+def environ_index(prefix='', environ=None):
+    """Return a dictionary of the environment variables starting with *prefix*.
+
+    If *environ* is ``None``, :data:`os.environ` is scanned once per process
+    for each *prefix* and the result is reused by later calls (so changes to
+    the environment made after the first call are not seen). Otherwise, the
+    *environ* mapping is scanned on every call.
+    """
+    cache = environ is None
+    if cache:
+        index = _environ_indexes.get(prefix)
+        if index is not None:
+            return index
+        environ = os.environ
+
+    index = dict((k, v) for k, v in environ.items() if k.startswith(prefix))
+    if cache:
+        _environ_indexes[prefix] = index
+    return index